@@ -3,6 +3,8 @@ from google.cloud.bigquery import ScalarQueryParameter, QueryJobConfig, ArrayQue
 from typing import Optional, List
 from datetime import date, timedelta
 import concurrent.futures
+from segment_cache import segment_cache, segment_key, sum_segments
+from circuit_breaker import ContextThreadPoolExecutor
 
 FIXED_REJECTION_ROWS = [
     ("ASSEMBLY", "BLACK GLUE"),
@@ -94,6 +96,42 @@ def build_where_clause(start_date: Optional[date], end_date: Optional[date], siz
     where_clause_str = f"WHERE {' AND '.join(where_conditions)}" if where_conditions else ""
     return where_clause_str, query_parameters
 
+# Vendor breakdowns come back as maps keyed by vendor; these vendors are also
+# exposed under the flat keys the dashboard has always read
+LEGACY_VENDOR_KEYS = {
+    '3DE TECH': ('de_tech_stage_rejection', 'deTechVendorRejections'),
+    'IHC': ('ihc_stage_rejection', 'ihcVendorRejections'),
+}
+VENDOR_TOP_REJECTIONS = 10
+
+# Every section fetch_analysis_data returns, in the order of its queries
+ANALYSIS_SECTIONS = [
+    'kpis', 'acceptedVsRejected', 'rejectionBreakdown', 'rejectionTrend',
+    'topVqcRejections', 'topFtRejections', 'topCsRejections', 'vendorRejections',
+] + [chart_key for _, chart_key in LEGACY_VENDOR_KEYS.values()]
+
+def split_vendor_rollup(rows: List[dict]) -> dict:
+    # GROUP BY ROLLUP(vendor) rows -> the grand-total row, with the per-vendor
+    # stage rejections under vendor_stage_rejection (and the legacy keys)
+    if not rows:
+        return {}
+    kpis, by_vendor = {}, {}
+    for row in rows:
+        row = dict(row)
+        if row.pop('is_total'):
+            row.pop('vendor', None)
+            kpis = row
+        else:
+            by_vendor[row['vendor']] = row['total_rejected'] or 0
+    kpis['vendor_stage_rejection'] = by_vendor
+    for vendor, (kpi_key, _) in LEGACY_VENDOR_KEYS.items():
+        # NULL like the other sums when nothing matched the filters
+        kpis[kpi_key] = by_vendor.get(vendor, None if kpis.get('total_rejected') is None else 0)
+    return kpis
+
+KPI_KEYS = ["total_inward", "qc_accepted", "testing_accepted", "total_rejected", "moved_to_inventory", "work_in_progress"]
+REPORT_KPI_KEYS = ["output", "accepted", "rejected"]
+
 def fetch_kpi_data(client: bigquery.Client, start_date: Optional[date], end_date: Optional[date], sizes: Optional[List[str]], skus: Optional[List[str]], line: Optional[str], stage: Optional[str], vendor: str, project_id: str, dataset_id: str, compare: bool = False):
     overview_table = f"`{project_id}.{dataset_id}.dash_overview`"
     overview_stage = stage if stage in ['VQC', 'FT', 'CS'] else 'VQC'
@@ -105,18 +143,38 @@ def fetch_kpi_data(client: bigquery.Client, start_date: Optional[date], end_date
 
     where_clause_str, query_parameters = build_where_clause(target_start, target_end, sizes, skus, 'event_date', 'sku', 'size', line, overview_stage, vendor)
 
-    query = f"""
-        SELECT
+    kpi_columns = """
             SUM(total_inward) AS total_inward,
             SUM(qc_accepted) AS qc_accepted,
             SUM(testing_accepted) AS testing_accepted,
             SUM(total_rejection) AS total_rejected,
             SUM(moved_to_inventory) AS moved_to_inventory,
             SUM(work_in_progress) AS work_in_progress
+    """
+
+    query = f"""
+        SELECT {kpi_columns}
         FROM {overview_table}
         {where_clause_str}
     """
-    
+
+    # All KPIs are additive, so closed days come from the segment cache and only
+    # the hot window is re-queried.
+    if target_start and target_end:
+        def fetch_days(range_start, range_end):
+            day_where, day_params = build_where_clause(range_start, range_end, sizes, skus, 'event_date', 'sku', 'size', line, overview_stage, vendor)
+            day_query = f"SELECT event_date, {kpi_columns} FROM {overview_table} {day_where} GROUP BY event_date"
+            job = client.query(day_query, job_config=QueryJobConfig(query_parameters=day_params))
+            return {row['event_date']: {k: v for k, v in dict(row).items() if k != 'event_date'} for row in job.result()}
+
+        try:
+            key = segment_key(overview_table, overview_stage, vendor, sizes or [], skus or [], line)
+            segments = segment_cache.fetch('kpis', key, target_start, target_end, fetch_days)
+            return sum_segments(segments.values(), KPI_KEYS)
+        except Exception as e:
+            print(f"Error in fetch_kpi_data (compare={compare}): {e}")
+            return {k: 0 for k in KPI_KEYS}
+
     try:
         job_config = QueryJobConfig(query_parameters=query_parameters)
         query_job = client.query(query, job_config=job_config)
@@ -145,7 +203,7 @@ def fetch_wip_charts_data(client: bigquery.Client, start_date: Optional[date], e
         return [dict(row) for row in job.result()]
 
     try:
-        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        with ContextThreadPoolExecutor(max_workers=2) as executor:
             vqc_future = executor.submit(execute_bq, vqc_wip_query, vqc_params)
             ft_future = executor.submit(execute_bq, ft_wip_query, ft_params)
             return {
@@ -156,7 +214,24 @@ def fetch_wip_charts_data(client: bigquery.Client, start_date: Optional[date], e
         print(f"Error in fetch_wip_charts_data: {e}")
         return {"vqc_wip_sku_wise": [], "ft_wip_sku_wise": []}
 
-def fetch_analysis_data(client: bigquery.Client, table: str, start_date: Optional[date] = None, end_date: Optional[date] = None, sizes: Optional[List[str]] = None, skus: Optional[List[str]] = None, date_column: str = 'vqc_inward_date', sku_column: str = 'sku', size_column: str = 'size', line: Optional[str] = None, stage: Optional[str] = None, vendor: Optional[str] = None, compare: bool = False):
+def fetch_analysis_data(client: bigquery.Client, table: str, start_date: Optional[date] = None, end_date: Optional[date] = None, sizes: Optional[List[str]] = None, skus: Optional[List[str]] = None, date_column: str = 'vqc_inward_date', sku_column: str = 'sku', size_column: str = 'size', line: Optional[str] = None, stage: Optional[str] = None, vendor: Optional[str] = None, compare: bool = False, sections: Optional[List[str]] = None, days: Optional[List[date]] = None):
+    data = dict(iter_analysis_sections(client, table, start_date, end_date, sizes, skus, date_column, sku_column, size_column, line, stage, vendor, compare, sections, days))
+    # The comparison only needs the KPI row
+    return data.get('kpis', {}) if compare else data
+
+def add_others(chart: List[dict], total) -> List[dict]:
+    # Appends what the chart's top reasons leave of `total`, so percentages add up
+    if chart and total:
+        others_val = total - sum(item['value'] for item in chart)
+        if others_val > 0:
+            chart.append({"name": "Others", "value": int(others_val)})
+    return chart
+
+def iter_analysis_sections(client: bigquery.Client, table: str, start_date: Optional[date] = None, end_date: Optional[date] = None, sizes: Optional[List[str]] = None, skus: Optional[List[str]] = None, date_column: str = 'vqc_inward_date', sku_column: str = 'sku', size_column: str = 'size', line: Optional[str] = None, stage: Optional[str] = None, vendor: Optional[str] = None, compare: bool = False, sections: Optional[List[str]] = None, days: Optional[List[date]] = None):
+    # Yields (key, data) for each fetch_analysis_data section as soon as its
+    # query completes. Charts that get an "Others" slice wait for the KPI row.
+    # `sections` limits the output (and the queries run) to those keys, and
+    # `days` limits rejectionTrend to those days (a delta for a client).
     target_start, target_end = start_date, end_date
     if compare and start_date and end_date:
         target_start = start_date - timedelta(days=30)
@@ -174,27 +249,29 @@ def fetch_analysis_data(client: bigquery.Client, table: str, start_date: Optiona
         overview_table = overview_base 
 
     stage_rejection_expr = "(stage_rt_conversion_count + stage_wabi_sabi_count + stage_scrap_count)"
+    # One pass for the totals and every vendor's stage rejections
     kpi_query = f"""
     SELECT
+        GROUPING(vendor) = 1 AS is_total,
+        vendor,
         SUM({stage_rejection_expr}) AS total_rejected,
-        SUM(IF(vendor = '3DE TECH', {stage_rejection_expr}, 0)) AS de_tech_stage_rejection,
-        SUM(IF(vendor = 'IHC', {stage_rejection_expr}, 0)) AS ihc_stage_rejection,
         SUM(vqc_rejection) AS vqc_rejection,
         SUM(ft_rejection) AS ft_rejection,
         SUM(cs_rejection) AS cs_rejection
     FROM {overview_table}
     {overview_where}
+    GROUP BY ROLLUP(vendor)
     """
 
     if compare:
         job_config = QueryJobConfig(query_parameters=overview_params)
         try:
             query_job = client.query(kpi_query, job_config=job_config)
-            res = list(query_job.result())
-            return res[0] if res else {}
+            yield "kpis", split_vendor_rollup(list(query_job.result()))
         except Exception as e:
             print(f"Error in fetch_analysis_data comparison: {e}")
-            return {}
+            yield "kpis", {}
+        return
 
     accepted_col = 'qc_accepted'
     if overview_stage == 'FT':
@@ -220,12 +297,17 @@ def fetch_analysis_data(client: bigquery.Client, table: str, start_date: Optiona
     SELECT 'SCRAP' as name, SUM(stage_scrap_count) as value FROM {overview_table} {overview_where}
     """
 
+    trend_where, trend_params = overview_where, overview_params
+    if days is not None:
+        trend_where = f"{overview_where + ' AND ' if overview_where else 'WHERE '}event_date IN UNNEST(@trend_days)"
+        trend_params = overview_params + [ArrayQueryParameter("trend_days", "DATE", [str(d) for d in days])]
+
     rejection_trend_query = f"""
     SELECT
         FORMAT_DATE('%Y-%m-%d', event_date) AS day,
         SUM({stage_rejection_expr}) AS rejected
     FROM {overview_table}
-    {overview_where}
+    {trend_where}
     GROUP BY day
     ORDER BY day
     """
@@ -251,12 +333,13 @@ def fetch_analysis_data(client: bigquery.Client, table: str, start_date: Optiona
     SELECT vqc_reason AS name, SUM(count) AS value FROM {rejection_table} {rej_where_clause_str + " AND " if rej_where_clause_str else "WHERE "}stage = 'CS' GROUP BY 1 ORDER BY value DESC LIMIT 5
     """
 
-    de_tech_vendor_rejections_query = f"""
-    SELECT vqc_reason as name, SUM(count) as value FROM {rejection_table} {rej_where_clause_str + " AND " if rej_where_clause_str else "WHERE "} vendor = '3DE TECH' AND stage = 'VQC' GROUP BY 1 ORDER BY value DESC LIMIT 10
-    """
-
-    ihc_vendor_rejections_query = f"""
-    SELECT vqc_reason as name, SUM(count) as value FROM {rejection_table} {rej_where_clause_str + " AND " if rej_where_clause_str else "WHERE "} vendor = 'IHC' AND stage = 'VQC' GROUP BY 1 ORDER BY value DESC LIMIT 10
+    # Top VQC reasons of every vendor in one grouped scan
+    vendor_rejections_query = f"""
+    SELECT vendor, vqc_reason AS name, SUM(count) AS value
+    FROM {rejection_table} {rej_where_clause_str + " AND " if rej_where_clause_str else "WHERE "}stage = 'VQC'
+    GROUP BY vendor, name
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY vendor ORDER BY value DESC) <= {VENDOR_TOP_REJECTIONS}
+    ORDER BY vendor, value DESC
     """
 
     def execute_query_parallel(query, params=None):
@@ -274,50 +357,82 @@ def fetch_analysis_data(client: bigquery.Client, table: str, start_date: Optiona
         (kpi_query, overview_params, "kpis"),
         (accepted_vs_rejected_query, overview_params, "acceptedVsRejected"),
         (rejection_breakdown_query, overview_params, "rejectionBreakdown"),
-        (rejection_trend_query, overview_params, "rejectionTrend"),
+        (rejection_trend_query, trend_params, "rejectionTrend"),
         (top_vqc_rejections_query, query_parameters, "topVqcRejections"),
         (top_ft_rejections_query, query_parameters, "topFtRejections"),
         (top_cs_rejections_query, query_parameters, "topCsRejections"),
-        (de_tech_vendor_rejections_query, query_parameters, "deTechVendorRejections"),
-        (ihc_vendor_rejections_query, query_parameters, "ihcVendorRejections"),
+        (vendor_rejections_query, query_parameters, "vendorRejections"),
     ]
 
-    results = {}
-    with concurrent.futures.ThreadPoolExecutor(max_workers=len(queries)) as executor:
+    def wanted(key):
+        return sections is None or key in sections
+
+    needed = {key for _, _, key in queries if wanted(key)}
+    if any(wanted(chart_key) for _, chart_key in LEGACY_VENDOR_KEYS.values()):
+        needed.add("vendorRejections")
+    if needed & {"topVqcRejections", "topFtRejections", "topCsRejections", "vendorRejections"}:
+        # Totals for the "Others" slices
+        needed.add("kpis")
+    queries = [query for query in queries if query[2] in needed]
+    if not queries:
+        return
+
+    def with_others(key, data, kpis):
+        if key == "vendorRejections":
+            for vendor, total in kpis.get("vendor_stage_rejection", {}).items():
+                add_others(data.get(vendor), total)
+            yield key, data
+            for vendor, (_, chart_key) in LEGACY_VENDOR_KEYS.items():
+                yield chart_key, data.get(vendor, [])
+        else:
+            total_key = {"topVqcRejections": "vqc_rejection", "topFtRejections": "ft_rejection", "topCsRejections": "cs_rejection"}[key]
+            yield key, add_others(data, kpis.get(total_key, 0))
+
+    kpis = None
+    waiting = {}
+    with ContextThreadPoolExecutor(max_workers=len(queries)) as executor:
         future_to_key = {executor.submit(execute_query_parallel, q, p): k for q, p, k in queries}
         for future in concurrent.futures.as_completed(future_to_key):
             key = future_to_key[future]
             try:
                 data = future.result()
                 if key == "kpis":
-                    results[key] = data[0] if data else {}
-                else:
-                    results[key] = data
+                    data = split_vendor_rollup(data)
+                elif key == "vendorRejections":
+                    by_vendor = {}
+                    for row in data:
+                        by_vendor.setdefault(row['vendor'], []).append({"name": row['name'], "value": row['value']})
+                    data = by_vendor
             except Exception as e:
                 print(f"Query {key} generated an exception: {e}")
-                results[key] = {} if key == "kpis" else []
-
-    # Post-process to add "Others" category to rejection charts for accurate percentage calculation
-    if results.get('kpis'):
-        k = results['kpis']
-        
-        # Map chart keys to their respective total rejection KPI keys
-        rejection_mapping = {
-            "topVqcRejections": k.get("vqc_rejection", 0),
-            "topFtRejections": k.get("ft_rejection", 0),
-            "topCsRejections": k.get("cs_rejection", 0),
-            "deTechVendorRejections": k.get("de_tech_stage_rejection", 0),
-            "ihcVendorRejections": k.get("ihc_stage_rejection", 0)
-        }
-
-        for chart_key, total_val in rejection_mapping.items():
-            if chart_key in results and results[chart_key] and total_val:
-                current_sum = sum(item['value'] for item in results[chart_key])
-                others_val = (total_val or 0) - current_sum
-                if others_val > 0:
-                    results[chart_key].append({"name": "Others", "value": int(others_val)})
+                data = {} if key in ("kpis", "vendorRejections") else []
+
+            if key == "kpis":
+                kpis = data
+                ready = [(key, data)]
+                for waiting_key, waiting_data in waiting.items():
+                    ready.extend(with_others(waiting_key, waiting_data, kpis))
+                waiting.clear()
+            elif key in ("topVqcRejections", "topFtRejections", "topCsRejections", "vendorRejections"):
+                if kpis is None:
+                    waiting[key] = data
+                    continue
+                ready = with_others(key, data, kpis)
+            else:
+                ready = [(key, data)]
+            for ready_key, ready_data in ready:
+                if wanted(ready_key):
+                    yield ready_key, ready_data
 
-    return results
+def report_kpi_exprs(stage: str) -> tuple:
+    # (output, accepted, rejected) aggregates over dash_overview for a stage
+    if stage == 'VQC':
+        return "SUM(total_inward)", "SUM(qc_accepted)", "SUM(vqc_rejection)"
+    if stage == 'FT':
+        return "SUM(total_inward)", "SUM(testing_accepted)", "SUM(ft_rejection)"
+    if stage == 'CS':
+        return "SUM(total_inward)", "SUM(moved_to_inventory)", "SUM(cs_rejection)"
+    return "SUM(total_inward)", "SUM(total_accepted)", "SUM(total_rejection)"
 
 def fetch_report_data(client: bigquery.Client, ring_status_table: str, rejection_analysis_table: str, start_date: Optional[date], end_date: Optional[date], stage: str, vendor: str, sizes: Optional[List[str]] = None, skus: Optional[List[str]] = None, line: Optional[str] = None, compare: bool = False):
     target_start, target_end = start_date, end_date
@@ -335,19 +450,7 @@ def fetch_report_data(client: bigquery.Client, ring_status_table: str, rejection
     overview_stage = stage if stage in ['VQC', 'FT', 'CS'] else 'VQC'
     overview_where, overview_params = build_where_clause(target_start, target_end, sizes, skus, 'event_date', 'sku', 'size', line, overview_stage, vendor)
     
-    output_expr = "SUM(total_inward)"
-    accepted_expr = "SUM(total_accepted)" 
-    rejected_expr = "SUM(total_rejection)"
-    
-    if stage == 'VQC':
-        accepted_expr = "SUM(qc_accepted)"
-        rejected_expr = "SUM(vqc_rejection)"
-    elif stage == 'FT':
-        accepted_expr = "SUM(testing_accepted)"
-        rejected_expr = "SUM(ft_rejection)"
-    elif stage == 'CS': 
-        accepted_expr = "SUM(moved_to_inventory)"
-        rejected_expr = "SUM(cs_rejection)"
+    output_expr, accepted_expr, rejected_expr = report_kpi_exprs(stage)
 
     kpi_query = f"""
         SELECT 
@@ -357,13 +460,36 @@ def fetch_report_data(client: bigquery.Client, ring_status_table: str, rejection
         FROM {overview_table}
         {overview_where}
     """
+
+    use_segments = bool(target_start and target_end)
+    filter_key = segment_key(stage, vendor, sizes or [], skus or [], line)
+
+    def fetch_kpi_days(range_start, range_end):
+        day_where, day_params = build_where_clause(range_start, range_end, sizes, skus, 'event_date', 'sku', 'size', line, overview_stage, vendor)
+        day_query = f"""
+            SELECT 
+                event_date,
+                {output_expr} as output,
+                {accepted_expr} as accepted,
+                {rejected_expr} as rejected
+            FROM {overview_table}
+            {day_where}
+            GROUP BY event_date
+        """
+        job = client.query(day_query, job_config=QueryJobConfig(query_parameters=day_params))
+        return {row['event_date']: {k: row[k] for k in REPORT_KPI_KEYS} for row in job.result()}
+
+    def run_kpi_query():
+        if use_segments:
+            segments = segment_cache.fetch('report_kpis', (overview_table,) + filter_key, target_start, target_end, fetch_kpi_days)
+            return sum_segments(segments.values(), REPORT_KPI_KEYS)
+        job = client.query(kpi_query, job_config=QueryJobConfig(query_parameters=overview_params))
+        res = list(job.result())
+        return dict(res[0]) if res else {}
     
     if compare:
-        job_config_kpi = QueryJobConfig(query_parameters=overview_params)
         try:
-            job = client.query(kpi_query, job_config=job_config_kpi)
-            res = list(job.result())
-            return dict(res[0]) if res else {"output": 0, "accepted": 0, "rejected": 0}
+            return run_kpi_query() or {"output": 0, "accepted": 0, "rejected": 0}
         except Exception as e:
             print(f"Comparison KPI Error in Report: {e}")
             return {"output": 0, "accepted": 0, "rejected": 0}
@@ -382,32 +508,71 @@ def fetch_report_data(client: bigquery.Client, ring_status_table: str, rejection
         GROUP BY 1, 2, 3
         ORDER BY 2, 4 DESC
     """
+
+    def fetch_rejection_days(range_start, range_end):
+        day_where, day_params = build_where_clause(range_start, range_end, sizes, skus, 'date', 'sku', 'size', line, stage=stage, vendor=vendor)
+        day_query = f"""
+            SELECT 
+                date,
+                status,
+                rejection_category,
+                vqc_reason as reason,
+                SUM(count) as value
+            FROM {rejection_analysis_table}
+            {day_where}
+            GROUP BY 1, 2, 3, 4
+        """
+        job = client.query(day_query, job_config=QueryJobConfig(query_parameters=day_params))
+        by_day = {}
+        for row in job.result():
+            by_day.setdefault(row['date'], []).append({k: row[k] for k in ('status', 'rejection_category', 'reason', 'value')})
+        return by_day
+
+    def run_rejection_query():
+        if not use_segments:
+            job = client.query(rejection_query, job_config=QueryJobConfig(query_parameters=rejection_query_parameters))
+            return [dict(row) for row in job.result()]
+
+        segments = segment_cache.fetch('report_rejections', (rejection_analysis_table,) + filter_key, target_start, target_end, fetch_rejection_days)
+        merged = {}
+        for day_rows in segments.values():
+            for r in day_rows or []:
+                group = (r['status'], r['rejection_category'], r['reason'])
+                merged[group] = merged.get(group, 0) + (r['value'] or 0)
+        rows = [
+            {"status": status, "rejection_category": cat, "reason": reason, "value": value}
+            for (status, cat, reason), value in merged.items()
+        ]
+        # Same ordering as the single-range query: category (NULLs first), then value desc
+        rows.sort(key=lambda r: (r['rejection_category'] is not None, r['rejection_category'] or '', -r['value']))
+        return rows
     
     kpis = {}
     try:
-        job_config_kpi = QueryJobConfig(query_parameters=overview_params)
-        job = client.query(kpi_query, job_config=job_config_kpi)
-        res = list(job.result())
+        res = run_kpi_query()
         if res:
-            kpis = dict(res[0])
-            kpis = {k: (v if v is not None else 0) for k, v in kpis.items()}
+            kpis = {k: (v if v is not None else 0) for k, v in res.items()}
     except Exception as e:
         print(f"KPI Query Error: {e}")
         kpis = {"output": 0, "accepted": 0, "rejected": 0}
 
-    # Initialize status KPIs
-    kpis['rt_conversion'] = 0
-    kpis['wabi_sabi'] = 0
-    kpis['scrap'] = 0
-        
     rejections = []
     try:
-        job_config_rejection = QueryJobConfig(query_parameters=rejection_query_parameters)
-        job = client.query(rejection_query, job_config=job_config_rejection)
-        rejections = [dict(row) for row in job.result()]
+        rejections = run_rejection_query()
     except Exception as e:
         print(f"Rejection Query Error: {e}")
 
+    return {
+        "kpis": kpis,
+        "rejections": summarize_report_rejections(rejections, kpis)
+    }
+
+def summarize_report_rejections(rejections: List[dict], kpis: dict) -> dict:
+    # Adds the status totals to kpis and groups reasons by rejection category
+    kpis['rt_conversion'] = 0
+    kpis['wabi_sabi'] = 0
+    kpis['scrap'] = 0
+
     grouped_rejections = {}
     for r in rejections:
         # Aggregate status counts into kpis
@@ -430,13 +595,132 @@ def fetch_report_data(client: bigquery.Client, ring_status_table: str, rejection
             existing["value"] += val
         else:
             grouped_rejections[cat].append({"name": r['reason'], "value": val})
-        
-    return {
-        "kpis": kpis,
-        "rejections": grouped_rejections
-    }
 
-def get_rejection_report_data(client: bigquery.Client, rejection_analysis_table: str, start_date: date, end_date: date, stage: str, vendor: Optional[str] = 'all', sizes: Optional[List[str]] = None, skus: Optional[List[str]] = None, line: Optional[str] = None, download: bool = False):
+    return grouped_rejections
+
+COMPARE_DIMENSIONS = ['sku', 'size', 'line', 'vendor']
+COMPARE_MAX_VALUES = 50
+COMPARE_TOP_REJECTIONS = 10
+
+def fetch_comparison_data(client: bigquery.Client, ring_status_table: str, rejection_analysis_table: str, dimension: str, values: List[str], start_date: Optional[date], end_date: Optional[date], stage: str, vendor: str = 'all', sizes: Optional[List[str]] = None, skus: Optional[List[str]] = None, line: Optional[str] = None):
+    # fetch_report_data's KPIs (current and previous 30 days) and rejections for
+    # every value of one dimension, from one grouped query per table
+    if dimension not in COMPARE_DIMENSIONS:
+        raise ValueError(f"Unknown comparison dimension: {dimension}")
+    values = list(dict.fromkeys(values))
+
+    # The compared dimension is filtered to the requested values instead
+    if dimension == 'sku':
+        skus = None
+    elif dimension == 'size':
+        sizes = None
+    elif dimension == 'line':
+        line = None
+    else:
+        vendor = None
+    value_param = ArrayQueryParameter("compare_values", "STRING", values)
+
+    parts = ring_status_table.replace('`', '').split('.')
+    if len(parts) >= 2:
+        overview_table = f"`{'.'.join(parts[:-1])}.dash_overview`"
+    else:
+        overview_table = "`production-dashboard-482014.dashboard_data.dash_overview`"
+
+    overview_stage = stage if stage in ['VQC', 'FT', 'CS'] else 'VQC'
+    overview_where, overview_params = build_where_clause(None, None, sizes, skus, 'event_date', 'sku', 'size', line, overview_stage, vendor)
+    overview_conditions = [overview_where[len("WHERE "):]] if overview_where else []
+    overview_conditions.append(f"{dimension} IN UNNEST(@compare_values)")
+    overview_params.append(value_param)
+
+    if start_date and end_date:
+        # Both periods in one scan; a day in both (ranges over 30 days) counts in each
+        periods = """,
+            UNNEST([
+                STRUCT('current' AS name, @start_date AS start_day, @end_date AS end_day),
+                STRUCT('previous' AS name, @previous_start AS start_day, @previous_end AS end_day)
+            ]) AS period"""
+        period_expr = "period.name"
+        # The constant range lets BigQuery prune partitions; the join condition alone cannot
+        overview_conditions.append("event_date BETWEEN @previous_start AND @end_date")
+        overview_conditions.append("event_date BETWEEN period.start_day AND period.end_day")
+        overview_params += [
+            ScalarQueryParameter("start_date", "DATE", str(start_date)),
+            ScalarQueryParameter("end_date", "DATE", str(end_date)),
+            ScalarQueryParameter("previous_start", "DATE", str(start_date - timedelta(days=30))),
+            ScalarQueryParameter("previous_end", "DATE", str(end_date - timedelta(days=30))),
+        ]
+    else:
+        periods, period_expr = "", "'current'"
+
+    output_expr, accepted_expr, rejected_expr = report_kpi_exprs(stage)
+    kpi_query = f"""
+        SELECT
+            {dimension} AS compare_value,
+            {period_expr} AS period,
+            {output_expr} as output,
+            {accepted_expr} as accepted,
+            {rejected_expr} as rejected
+        FROM {overview_table}{periods}
+        WHERE {' AND '.join(overview_conditions)}
+        GROUP BY 1, 2
+    """
+
+    rejection_where, rejection_params = build_where_clause(start_date, end_date, sizes, skus, 'date', 'sku', 'size', line, stage=stage, vendor=vendor)
+    rejection_query = f"""
+        SELECT
+            {dimension} AS compare_value,
+            status,
+            rejection_category,
+            vqc_reason as reason,
+            SUM(count) as value
+        FROM {rejection_analysis_table}
+        {rejection_where + " AND " if rejection_where else "WHERE "}{dimension} IN UNNEST(@compare_values)
+        GROUP BY 1, 2, 3, 4
+        ORDER BY 1, 3, 5 DESC
+    """
+    rejection_params.append(value_param)
+
+    def run_query(query, params):
+        return [dict(row) for row in client.query(query, job_config=QueryJobConfig(query_parameters=params)).result()]
+
+    with ContextThreadPoolExecutor(max_workers=2) as executor:
+        kpi_future = executor.submit(run_query, kpi_query, overview_params)
+        rejection_future = executor.submit(run_query, rejection_query, rejection_params)
+        kpi_rows, rejection_rows = kpi_future.result(), rejection_future.result()
+
+    empty = {"output": 0, "accepted": 0, "rejected": 0}
+    periods_by_value = {}
+    for row in kpi_rows:
+        periods_by_value.setdefault(row['compare_value'], {})[row['period']] = {
+            k: (row[k] if row[k] is not None else 0) for k in REPORT_KPI_KEYS
+        }
+    rejections_by_value = {}
+    for row in rejection_rows:
+        rejections_by_value.setdefault(row['compare_value'], []).append(row)
+
+    results = []
+    for value in values:
+        by_period = periods_by_value.get(value, {})
+        kpis = dict(by_period.get('current', empty))
+        rows = rejections_by_value.get(value, [])
+        reason_totals = {}
+        for r in rows:
+            reason_totals[r['reason']] = reason_totals.get(r['reason'], 0) + (r['value'] or 0)
+        top = sorted(reason_totals.items(), key=lambda item: -item[1])[:COMPARE_TOP_REJECTIONS]
+        results.append({
+            "value": value,
+            "kpis": kpis,
+            # Without a date range the comparison period is the same as the current one
+            "comparison_kpis": dict(by_period.get('previous', empty)) if start_date and end_date else dict(kpis),
+            "rejections": summarize_report_rejections(rows, kpis),
+            "topRejections": [{"name": name, "value": total} for name, total in top],
+        })
+
+    return {"dimension": dimension, "values": results}
+
+def get_rejection_report_data(client: bigquery.Client, rejection_analysis_table: str, start_date: date, end_date: date, stage: str, vendor: Optional[str] = 'all', sizes: Optional[List[str]] = None, skus: Optional[List[str]] = None, line: Optional[str] = None, download: bool = False, days: Optional[List[date]] = None):
+    # `days`, when set, limits the per-date table columns to those days (a
+    # delta for a client); kpis and row totals still cover the whole range.
     where_conditions = []
     query_parameters = []
 
@@ -479,10 +763,27 @@ def get_rejection_report_data(client: bigquery.Client, rejection_analysis_table:
         ORDER BY date
     """
     
+    def fetch_days(range_start, range_end):
+        day_params = [p for p in query_parameters if p.name not in ('start_date', 'end_date')] + [
+            ScalarQueryParameter("start_date", "DATE", str(range_start)),
+            ScalarQueryParameter("end_date", "DATE", str(range_end)),
+        ]
+        job = client.query(query, job_config=QueryJobConfig(query_parameters=day_params))
+        by_day = {}
+        for row in job.result():
+            by_day.setdefault(row['date'], []).append(dict(row))
+        return by_day
+
     try:
-        job_config = QueryJobConfig(query_parameters=query_parameters)
-        job = client.query(query, job_config=job_config)
-        rows = [dict(row) for row in job.result()]
+        if start_date and end_date:
+            # The query is already grouped by date, so each day is its own segment
+            key = segment_key(rejection_analysis_table, stage, vendor, sizes or [], skus or [], line)
+            segments = segment_cache.fetch('rejection_report', key, start_date, end_date, fetch_days)
+            rows = [row for day in sorted(segments) for row in (segments[day] or [])]
+        else:
+            job_config = QueryJobConfig(query_parameters=query_parameters)
+            job = client.query(query, job_config=job_config)
+            rows = [dict(row) for row in job.result()]
         
         if download:
             return {"table_data": rows}
@@ -533,6 +834,9 @@ def get_rejection_report_data(client: bigquery.Client, rejection_analysis_table:
 
     table_rows = []
     sorted_dates = sorted(list(all_dates))
+    if days is not None:
+        # Touched days without rows now read 0, so they are sent as well
+        sorted_dates = sorted(d.strftime('%Y-%m-%d') for d in days)
 
     for stage, rejection_type in FIXED_REJECTION_ROWS:
         row = {
@@ -698,8 +1002,9 @@ def get_category_report_data(client: bigquery.Client, rejection_analysis_table:
     }
 
 def get_forecast_data(client: bigquery.Client, start_date: date, end_date: date, vendor: Optional[str] = 'all', sizes: Optional[List[str]] = None, skus: Optional[List[str]] = None, line: Optional[str] = None):
-    # The new view created by the ML pipeline
+    # The new view created by the ML pipeline, and its long-format reasons table
     forecast_view = "`production-dashboard-482014.dashboard_data.forecast_7day_view`"
+    forecast_reasons = "`production-dashboard-482014.dashboard_data.forecast_7day_reasons`"
     
     # We use a broader where clause for the view since it only has 7 days of data
     # Filters: SKU, Size, Vendor, Line
@@ -728,7 +1033,11 @@ def get_forecast_data(client: bigquery.Client, start_date: date, end_date: date,
     kpi_query = f"""
         SELECT 
             AVG(forecasted_yield_pct) as forecasted_yield,
+            AVG(yield_lower_pct) as forecasted_yield_lower,
+            AVG(yield_upper_pct) as forecasted_yield_upper,
             SUM(forecasted_good_units) as forecasted_good_units,
+            SUM(good_units_lower) as forecasted_good_units_lower,
+            SUM(good_units_upper) as forecasted_good_units_upper,
             SUM(forecasted_rejection_units) as forecasted_rejection_units,
             AVG(model_confidence_pct) as model_confidence
         FROM {forecast_view}
@@ -740,6 +1049,8 @@ def get_forecast_data(client: bigquery.Client, start_date: date, end_date: date,
         SELECT 
             FORMAT_DATE('%a, %d %b', forecast_date) as day,
             AVG(forecasted_yield_pct) as predicted_yield,
+            AVG(yield_lower_pct) as yield_lower,
+            AVG(yield_upper_pct) as yield_upper,
             SUM(forecasted_good_units) as good_units,
             SUM(forecasted_rejection_units) as rejection_units,
             AVG(rf_yield_pct) as rf_yield,
@@ -752,15 +1063,9 @@ def get_forecast_data(client: bigquery.Client, start_date: date, end_date: date,
 
     # 3. Top Predicted Rejection Reasons (Aggregated)
     rejection_reasons_query = f"""
-        SELECT reason, AVG(prob) as probability
-        FROM (
-            SELECT top_rejection_reason_1 as reason, rejection_prob_1_pct as prob FROM {forecast_view} {where_clause}
-            UNION ALL
-            SELECT top_rejection_reason_2 as reason, rejection_prob_2_pct as prob FROM {forecast_view} {where_clause}
-            UNION ALL
-            SELECT top_rejection_reason_3 as reason, rejection_prob_3_pct as prob FROM {forecast_view} {where_clause}
-        )
-        WHERE reason != 'N/A'
+        SELECT reason, AVG(ROUND(probability * 100, 2)) as probability
+        FROM {forecast_reasons}
+        {where_clause}
         GROUP BY 1
         ORDER BY 2 DESC
         LIMIT 10
@@ -771,7 +1076,9 @@ def get_forecast_data(client: bigquery.Client, start_date: date, end_date: date,
         SELECT 
             sku, vendor, size, line,
             forecasted_yield_pct,
+            yield_lower_pct, yield_upper_pct,
             forecasted_good_units,
+            good_units_lower, good_units_upper,
             forecasted_rejection_units,
             model_confidence_pct,
             top_rejection_reason_1, rejection_prob_1_pct,
@@ -796,7 +1103,11 @@ def get_forecast_data(client: bigquery.Client, start_date: date, end_date: date,
         return {
             "kpis": {
                 "forecasted_yield": round(kpis.get('forecasted_yield', 0), 1),
+                "forecasted_yield_lower": round(kpis.get('forecasted_yield_lower') or 0, 1),
+                "forecasted_yield_upper": round(kpis.get('forecasted_yield_upper') or 0, 1),
                 "forecasted_good_units": int(kpis.get('forecasted_good_units', 0)),
+                "forecasted_good_units_lower": int(kpis.get('forecasted_good_units_lower') or 0),
+                "forecasted_good_units_upper": int(kpis.get('forecasted_good_units_upper') or 0),
                 "forecasted_rejection_units": int(kpis.get('forecasted_rejection_units', 0)),
                 "model_confidence": round(kpis.get('model_confidence', 0), 1)
             },
@@ -0,0 +1,123 @@
+# =============================================================================
+# bench_replica.py — Compare /search and /kpi-data latency: replica vs BigQuery
+# Run: python bench_replica.py --rows 3000000 [--bigquery]
+#
+# Generates a synthetic master_station_data snapshot with realistic cardinalities
+# (rows arrive in inward-date order, as the ETL appends them),
+# loads it into the embedded replica and times the same execute_search /
+# get_kpi_data calls the API serves. With --bigquery the identical calls are
+# repeated against the live table for comparison (needs ADC credentials).
+# =============================================================================
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import date
+
+import duckdb
+
+import main
+from replica import MasterReplica
+
+SYNTHETIC_MASTER_SQL = """
+COPY (
+    SELECT
+        DATE '2025-06-01' + CAST(i * 270 // {rows} AS INTEGER)               AS vqc_inward_date,
+        ['PRODUCTION', 'PRODUCTION', 'RT', 'WABI SABI'][1 + i % 4]          AS line,
+        printf('UH%010d', i)                                                 AS serial_number,
+        CASE WHEN i % 23 = 0 THEN 'SCRAP' WHEN i % 41 = 0 THEN 'RT CONVERSION'
+             WHEN i % 53 = 0 THEN 'WABI SABI' ELSE 'ACCEPTED' END            AS vqc_status,
+        CASE WHEN i % 23 = 0 THEN ['MICRO BUBBLES', 'DENT ON RESIN', 'SIDE SCRATCH'][1 + i % 3] END AS vqc_reason,
+        DATE '2025-06-03' + CAST(i * 270 // {rows} AS INTEGER)               AS ft_inward_date,
+        CASE WHEN i % 31 = 0 THEN 'REJECTED' ELSE 'ACCEPTED' END             AS ft_status,
+        CASE WHEN i % 31 = 0 THEN ['BATTERY ISSUE', 'NOT CHARGING', 'SENSOR ISSUE'][1 + i % 3] END AS ft_reason,
+        CASE WHEN i % 5 <> 0 THEN DATE '2025-06-05' + CAST(i * 270 // {rows} AS INTEGER) END AS cs_comp_date,
+        CASE WHEN i % 5 <> 0 THEN CASE WHEN i % 97 = 0 THEN 'REJECTED' ELSE 'ACCEPTED' END END AS cs_status,
+        CASE WHEN i % 97 = 0 THEN 'SCRATCHES ON SHELL' END                   AS cs_reason,
+        CAST(5 + i % 10 AS VARCHAR)                                          AS size,
+        printf('SKU%02d', i % 40)                                            AS sku,
+        printf('CTPF%06d', i // 400)                                         AS ctpf_mo,
+        printf('AIR%06d', i // 650)                                          AS air_mo,
+        printf('%03d', i % 300)                                              AS pcb,
+        ['3DE TECH', 'IHC'][1 + i % 2]                                       AS vendor,
+        TIMESTAMP '2025-06-01' + INTERVAL (i * 270 // {rows}) DAY            AS last_updated_at
+    FROM range({rows}) t(i)
+) TO '{path}' (FORMAT PARQUET)
+"""
+
+
+def build_replica(rows: int, directory: str) -> MasterReplica:
+    path = os.path.join(directory, "snapshot-synthetic.parquet")
+    if not os.path.exists(path):
+        print(f"Generating {rows:,} synthetic rows into {path}...")
+        duckdb.connect().execute(SYNTHETIC_MASTER_SQL.format(rows=rows, path=path))
+    replica = MasterReplica(directory)
+    started = time.perf_counter()
+    replica.load()
+    print(f"Replica loaded in {time.perf_counter() - started:.2f}s")
+    return replica
+
+
+def scenarios(rows: int):
+    serials = ",".join(f"UH{i:010d}" for i in range(0, rows, max(rows // 500, 1)))
+    search_defaults = dict(
+        page=1, limit=100, serial_numbers=None, stage='All', vendor=None, vqc_status=None,
+        rejection_reasons=None, mo_numbers=None, sizes=None, skus=None,
+        start_date=None, end_date=None, line=None, download=False, fields=None,
+    )
+    kpi_defaults = dict(
+        page=1, limit=100, start_date=date(2025, 9, 1), end_date=date(2025, 9, 30), sizes=None,
+        skus=None, download=False, date_column='vqc_inward_date', stage=None, line=None, fields=None,
+    )
+    return [
+        ("search: 500 serials", main.execute_search, {**search_defaults, "serial_numbers": serials}),
+        ("search: MO numbers", main.execute_search, {**search_defaults, "mo_numbers": "CTPF000120,AIR000077"}),
+        ("search: date+vendor+status", main.execute_search, {
+            **search_defaults, "stage": 'VQC', "vendor": 'IHC', "vqc_status": ['SCRAP', 'RT CONVERSION'],
+            "start_date": date(2025, 8, 1), "end_date": date(2025, 10, 31),
+        }),
+        ("search: reasons, all stages", main.execute_search, {
+            **search_defaults, "rejection_reasons": ['MICRO BUBBLES', 'NOT CHARGING'], "skus": ['SKU01', 'SKU07'],
+        }),
+        ("kpi-data: total_rejected", main.get_kpi_data, {**kpi_defaults, "kpi_name": 'total_rejected'}),
+        ("kpi-data: work_in_progress", main.get_kpi_data, {**kpi_defaults, "kpi_name": 'work_in_progress'}),
+    ]
+
+
+def time_calls(label: str, fn, kwargs: dict, repeats: int):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        asyncio.run(fn(**kwargs))
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), max(timings)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=3_000_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--dir", default=os.path.join(tempfile.gettempdir(), "bench_replica"))
+    parser.add_argument("--bigquery", action="store_true", help="Also time the live BigQuery path")
+    args = parser.parse_args()
+
+    os.makedirs(args.dir, exist_ok=True)
+    replica = build_replica(args.rows, args.dir)
+
+    print(f"\n{'scenario':32} {'replica p50':>12} {'max':>9} {'bigquery p50':>14} {'max':>9}")
+    for label, fn, kwargs in scenarios(args.rows):
+        main.replica = replica
+        rep_p50, rep_max = time_calls(label, fn, kwargs, args.repeats)
+        bq = "-"
+        if args.bigquery and main.client:
+            main.replica = None
+            bq_p50, bq_max = time_calls(label, fn, kwargs, args.repeats)
+            bq = f"{bq_p50:11.1f}ms {bq_max:7.1f}ms"
+        print(f"{label:32} {rep_p50:10.1f}ms {rep_max:7.1f}ms {bq:>25}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,248 @@
+import concurrent.futures
+import contextlib
+import contextvars
+import os
+import threading
+import time
+from typing import Optional
+
+from google.api_core import exceptions as api_exceptions
+
+# Consecutive upstream failures (timeouts, quota/rate limits, 5xx) that open
+# the circuit, and how long it then stays open before recovery is probed. The
+# cooldown doubles after every failed probe, up to the maximum.
+BQ_BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BQ_BREAKER_FAILURE_THRESHOLD", 5))
+BQ_BREAKER_COOLDOWN_SECONDS = float(os.environ.get("BQ_BREAKER_COOLDOWN_SECONDS", 30))
+BQ_BREAKER_MAX_COOLDOWN_SECONDS = float(os.environ.get("BQ_BREAKER_MAX_COOLDOWN_SECONDS", 300))
+# Successful probes needed to close the circuit again. While half open the
+# number of queries let through at once doubles with every success (1, 2, 4...).
+BQ_BREAKER_PROBE_SUCCESSES = int(os.environ.get("BQ_BREAKER_PROBE_SUCCESSES", 3))
+# Seconds a request waits for a query job before counting it as failed and
+# cancelling it
+BQ_QUERY_TIMEOUT_SECONDS = float(os.environ.get("BQ_QUERY_TIMEOUT_SECONDS", 30))
+# The same for bulk reads: /search and /kpi-data downloads and the background
+# pulls of the master and forecast tables
+BQ_DOWNLOAD_TIMEOUT_SECONDS = float(os.environ.get("BQ_DOWNLOAD_TIMEOUT_SECONDS", 600))
+
+TIMEOUT_ERRORS = (
+    TimeoutError,
+    concurrent.futures.TimeoutError,
+    api_exceptions.DeadlineExceeded,
+    api_exceptions.RetryError,
+)
+
+UPSTREAM_ERRORS = TIMEOUT_ERRORS + (
+    api_exceptions.ServerError,
+    api_exceptions.TooManyRequests,
+)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+def is_upstream_failure(exc: Exception) -> bool:
+    # Quota and rate limit errors come back as 400/403 with a reason in the text;
+    # other client errors (bad SQL, missing table) mean BigQuery is answering.
+    if isinstance(exc, UPSTREAM_ERRORS):
+        return True
+    message = str(exc).lower()
+    return any(marker in message for marker in ("quota", "rate limit", "ratelimitexceeded", "timed out"))
+
+
+# Failed or refused queries of one computation (a dashboard view). The fetch
+# helpers return empty fallbacks when a query fails, so a view is only cached
+# if its own tracker stayed at zero; other requests' failures do not count.
+class QueryFailures:
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self):
+        with self._lock:
+            self.count += 1
+
+
+_current_failures: "contextvars.ContextVar[Optional[QueryFailures]]" = contextvars.ContextVar("query_failures", default=None)
+
+
+@contextlib.contextmanager
+def track_failures(failures: Optional[QueryFailures] = None):
+    # Counts the failures of the queries sent inside the block (and by
+    # ContextThreadPoolExecutor workers it starts) in `failures`
+    failures = failures or QueryFailures()
+    token = _current_failures.set(failures)
+    try:
+        yield failures
+    finally:
+        _current_failures.reset(token)
+
+
+# ThreadPoolExecutor whose tasks run in a copy of the submitting thread's
+# context, so queries sent from worker threads count toward its tracker.
+class ContextThreadPoolExecutor(concurrent.futures.ThreadPoolExecutor):
+    def submit(self, fn, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = BQ_BREAKER_FAILURE_THRESHOLD,
+                 cooldown_seconds: float = BQ_BREAKER_COOLDOWN_SECONDS,
+                 max_cooldown_seconds: float = BQ_BREAKER_MAX_COOLDOWN_SECONDS,
+                 probe_successes: int = BQ_BREAKER_PROBE_SUCCESSES):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown_seconds
+        self.max_cooldown = max_cooldown_seconds
+        self.probe_successes = probe_successes
+        self.state = self.CLOSED
+        self.cooldown = cooldown_seconds
+        # Bumped on every state change; queries report with the generation
+        # they were admitted in, and late reports from an earlier one are
+        # ignored so they cannot close or reopen the circuit.
+        self.generation = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._successes = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: str):
+        self.state = state
+        self.generation += 1
+
+    def _open(self, now: float):
+        self._set_state(self.OPEN)
+        self._opened_at = now
+        print(f"BigQuery circuit open for {self.cooldown:.0f}s")
+
+    def allow(self) -> Optional[int]:
+        # The generation a query is admitted in, or None if it is refused
+        with self._lock:
+            if self.state == self.CLOSED:
+                return self.generation
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now - self._opened_at < self.cooldown:
+                    return None
+                self._set_state(self.HALF_OPEN)
+                self._successes = 0
+                self._in_flight = 0
+            if self._in_flight >= 2 ** self._successes:
+                return None
+            self._in_flight += 1
+            return self.generation
+
+    def record(self, generation: int, exc: Exception = None):
+        # Outcome of a query that allow() admitted in `generation`; exc is None
+        # on success
+        with self._lock:
+            if generation != self.generation:
+                return
+            failed = exc is not None and is_upstream_failure(exc)
+            if self.state == self.HALF_OPEN:
+                self._in_flight = max(self._in_flight - 1, 0)
+                if failed:
+                    self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                    self._open(time.monotonic())
+                else:
+                    self._successes += 1
+                    if self._successes >= self.probe_successes:
+                        self._set_state(self.CLOSED)
+                        self._failures = 0
+                        self.cooldown = self.base_cooldown
+                        print("BigQuery circuit closed")
+            elif self.state == self.CLOSED:
+                # Other errors (bad SQL, missing table) neither count toward
+                # opening nor break a run of consecutive upstream failures
+                if failed:
+                    self._failures += 1
+                    if self._failures >= self.failure_threshold:
+                        self._open(time.monotonic())
+                elif exc is None:
+                    self._failures = 0
+
+
+# A BigQuery query job whose outcome is reported to the breaker (and a failure
+# to the tracker of the computation that sent it) once, the first time its
+# result is waited for. A job that times out is cancelled, so it stops using
+# slots nobody will read. Callers pass a longer `timeout` to result() for bulk
+# reads.
+class GuardedJob:
+    def __init__(self, job, breaker: CircuitBreaker, timeout: float, generation: int,
+                 failures: Optional[QueryFailures] = None):
+        self._job = job
+        self._breaker = breaker
+        self._timeout = timeout
+        self._generation = generation
+        self._failures = failures
+        self._reported = False
+
+    def _report(self, exc: Exception = None):
+        if not self._reported:
+            self._reported = True
+            self._breaker.record(self._generation, exc)
+            if exc is not None and self._failures is not None:
+                self._failures.add()
+
+    def result(self, *args, **kwargs):
+        kwargs.setdefault("timeout", self._timeout)
+        try:
+            rows = self._job.result(*args, **kwargs)
+        except Exception as e:
+            if isinstance(e, TIMEOUT_ERRORS):
+                self._cancel()
+            self._report(e)
+            raise
+        self._report()
+        return rows
+
+    def _cancel(self):
+        try:
+            self._job.cancel()
+        except Exception as e:
+            print(f"BigQuery job cancel error: {e}")
+
+    def to_arrow(self, *args, **kwargs):
+        if not self._reported:
+            self.result()
+        return self._job.to_arrow(*args, **kwargs)
+
+    def to_dataframe(self, *args, **kwargs):
+        if not self._reported:
+            self.result()
+        return self._job.to_dataframe(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._job, name)
+
+
+# bigquery.Client whose queries go through the circuit breaker: while it is open
+# client.query raises CircuitOpenError without contacting BigQuery, and every
+# job waits at most `timeout` seconds for its result unless the caller passes
+# its own.
+class GuardedClient:
+    def __init__(self, client, breaker: CircuitBreaker, timeout: float = BQ_QUERY_TIMEOUT_SECONDS):
+        self._client = client
+        self.breaker = breaker
+        self.timeout = timeout
+
+    def query(self, *args, **kwargs):
+        failures = _current_failures.get()
+        generation = self.breaker.allow()
+        if generation is None:
+            if failures is not None:
+                failures.add()
+            raise CircuitOpenError("BigQuery circuit is open after repeated failures; query not sent")
+        try:
+            job = self._client.query(*args, **kwargs)
+        except Exception as e:
+            self.breaker.record(generation, e)
+            if failures is not None:
+                failures.add()
+            raise
+        return GuardedJob(job, self.breaker, self.timeout, generation, failures)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
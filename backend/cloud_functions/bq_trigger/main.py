@@ -12,13 +12,45 @@ def bq_trigger_handler(event, context=None):
     print(f"Triggered by ETL completion signal. Updating live summary tables...")
     
     try:
+        # Master rows up to this point are all in the rebuilt tables
+        rebuilt_through = master_watermark()
         update_dash_overview()
         update_rejection_analysis()
         update_wip_sku_wise()
+        update_mo_summary()
+        record_rebuild(rebuilt_through)
         print("Successfully updated all live summary tables.")
     except Exception as e:
         print(f"Error during update: {e}")
 
+def master_watermark():
+    sql = """
+    SELECT MAX(last_updated_at) AS watermark
+    FROM `production-dashboard-482014.dashboard_data.master_station_data`
+    """
+    rows = list(client.query(sql).result())
+    return rows[0]["watermark"] if rows else None
+
+def record_rebuild(rebuilt_through):
+    """
+    Completion marker the dashboard backends watch: they invalidate their caches
+    and notify clients only once the summary tables match the master table.
+    `rebuilt_through` is the master watermark the rebuild covers. The marker has
+    its own table so writing it never looks like an ETL run to the log sink.
+    """
+    sql = """
+    CREATE TABLE IF NOT EXISTS `production-dashboard-482014.dashboard_data.summary_rebuild_log` (
+        rebuilt_at DATETIME NOT NULL,
+        rebuilt_through DATETIME
+    );
+    INSERT INTO `production-dashboard-482014.dashboard_data.summary_rebuild_log` (rebuilt_at, rebuilt_through)
+    VALUES (CURRENT_DATETIME(), @rebuilt_through);
+    """
+    job_config = bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ScalarQueryParameter("rebuilt_through", "DATETIME", rebuilt_through)
+    ])
+    client.query(sql, job_config=job_config).result()
+
 def update_dash_overview():
     sql = """
     CREATE OR REPLACE TABLE `production-dashboard-482014.dashboard_data.dash_overview`
@@ -69,18 +101,6 @@ def update_dash_overview():
             UPPER(cs_status) = 'REJECTED'
         ) AS total_rejection,
         
-        COUNTIF(vendor = '3DE TECH' AND (
-            UPPER(vqc_status) IN ('SCRAP', 'WABI SABI', 'RT CONVERSION') OR 
-            UPPER(ft_status) IN ('REJECTED', 'AESTHETIC SCRAP', 'FUNCTIONAL BUT REJECTED', 'SCRAP', 'SHELL RELATED', 'WABI SABI', 'FUNCTIONAL REJECTION') OR
-            UPPER(cs_status) = 'REJECTED'
-        )) AS `3de_tech_rejection`,
-        
-        COUNTIF(vendor = 'IHC' AND (
-            UPPER(vqc_status) IN ('SCRAP', 'WABI SABI', 'RT CONVERSION') OR 
-            UPPER(ft_status) IN ('REJECTED', 'AESTHETIC SCRAP', 'FUNCTIONAL BUT REJECTED', 'SCRAP', 'SHELL RELATED', 'WABI SABI', 'FUNCTIONAL REJECTION') OR
-            UPPER(cs_status) = 'REJECTED'
-        )) AS ihc_rejection,
-        
         -- Individual stage rejection counts for that cohort
         COUNTIF(UPPER(vqc_status) IN ('SCRAP', 'WABI SABI', 'RT CONVERSION')) AS vqc_rejection,
         COUNTIF(UPPER(ft_status) IN ('REJECTED', 'AESTHETIC SCRAP', 'FUNCTIONAL BUT REJECTED', 'SCRAP', 'SHELL RELATED', 'WABI SABI', 'FUNCTIONAL REJECTION')) AS ft_rejection,
@@ -148,6 +168,98 @@ def update_wip_sku_wise():
     query_job = client.query(sql)
     query_job.result()
 
+def update_mo_summary():
+    sql = """
+    CREATE OR REPLACE TABLE `production-dashboard-482014.dashboard_data.mo_summary`
+    CLUSTER BY mo_number
+    AS
+    WITH mo_units AS (
+        -- Each ring counts once under its CTPF MO and once under its AIR MO
+        SELECT
+            mo.mo_number,
+            mo.mo_type,
+            vqc_inward_date,
+            ft_inward_date,
+            cs_comp_date,
+            vqc_status,
+            vqc_reason,
+            ft_status,
+            ft_reason,
+            cs_status,
+            cs_reason,
+            vendor,
+            sku,
+            size,
+            -- Same WIP rules as wip_sku_wise
+            (
+                (UPPER(vqc_status) NOT IN ('SCRAP', 'WABI SABI', 'RT CONVERSION') OR vqc_status IS NULL) AND
+                (UPPER(ft_status) NOT IN ('REJECTED', 'AESTHETIC SCRAP', 'FUNCTIONAL BUT REJECTED', 'SCRAP', 'SHELL RELATED', 'WABI SABI', 'FUNCTIONAL REJECTION') OR ft_status IS NULL) AND
+                (UPPER(cs_status) != 'REJECTED' OR cs_status IS NULL) AND
+                (cs_status != 'ACCEPTED' OR cs_status IS NULL)
+            ) AS is_wip
+        FROM `production-dashboard-482014.dashboard_data.master_station_data`,
+        UNNEST([
+            STRUCT(TRIM(ctpf_mo) AS mo_number, 'CTPF' AS mo_type),
+            STRUCT(TRIM(air_mo) AS mo_number, 'AIR' AS mo_type)
+        ]) AS mo
+        WHERE mo.mo_number IS NOT NULL AND mo.mo_number != ''
+    ),
+    reason_counts AS (
+        SELECT mo_number, mo_type, entry.stage, entry.reason, COUNT(*) AS count
+        FROM mo_units,
+        UNNEST([
+            STRUCT('VQC' AS stage, vqc_reason AS reason),
+            STRUCT('FT' AS stage, ft_reason AS reason),
+            STRUCT('CS' AS stage, cs_reason AS reason)
+        ]) AS entry
+        WHERE entry.reason IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+    ),
+    top_reasons AS (
+        SELECT
+            mo_number,
+            mo_type,
+            ARRAY_AGG(STRUCT(stage, reason, count) ORDER BY count DESC, reason LIMIT 10) AS top_reasons
+        FROM reason_counts
+        GROUP BY 1, 2
+    )
+    SELECT
+        u.mo_number,
+        u.mo_type,
+        COUNT(*) AS total_units,
+        STRING_AGG(DISTINCT u.vendor, ', ') AS vendors,
+        STRING_AGG(DISTINCT u.sku, ', ') AS skus,
+        STRING_AGG(DISTINCT u.size, ', ') AS sizes,
+
+        -- Date span
+        MIN(u.vqc_inward_date) AS first_inward_date,
+        MAX(COALESCE(u.cs_comp_date, u.ft_inward_date, u.vqc_inward_date)) AS last_activity_date,
+
+        -- VQC
+        COUNTIF(u.vqc_status = 'ACCEPTED') AS vqc_accepted,
+        COUNTIF(UPPER(u.vqc_status) IN ('SCRAP', 'WABI SABI', 'RT CONVERSION')) AS vqc_rejected,
+        COUNTIF(u.is_wip AND u.ft_inward_date IS NULL AND u.cs_comp_date IS NULL) AS vqc_wip,
+
+        -- FT
+        COUNTIF(UPPER(u.ft_status) = 'ACCEPTED') AS ft_accepted,
+        COUNTIF(UPPER(u.ft_status) IN ('REJECTED', 'AESTHETIC SCRAP', 'FUNCTIONAL BUT REJECTED', 'SCRAP', 'SHELL RELATED', 'WABI SABI', 'FUNCTIONAL REJECTION')) AS ft_rejected,
+        COUNTIF(u.is_wip AND u.ft_inward_date IS NOT NULL AND u.cs_comp_date IS NULL) AS ft_wip,
+
+        -- CS
+        COUNTIF(u.cs_status = 'ACCEPTED') AS cs_accepted,
+        COUNTIF(UPPER(u.cs_status) = 'REJECTED') AS cs_rejected,
+        COUNTIF(u.is_wip AND u.cs_comp_date IS NOT NULL) AS cs_wip,
+
+        COUNTIF(u.is_wip) AS work_in_progress,
+        SAFE_DIVIDE(COUNTIF(u.cs_status = 'ACCEPTED'), COUNT(*)) AS yield,
+        ANY_VALUE(r.top_reasons) AS top_reasons
+    FROM mo_units u
+    LEFT JOIN top_reasons r USING (mo_number, mo_type)
+    GROUP BY 1, 2;
+    """
+    query_job = client.query(sql)
+    query_job.result()
+
 def update_rejection_analysis():
     sql = """
     CREATE OR REPLACE TABLE `production-dashboard-482014.dashboard_data.rejection_analysis`
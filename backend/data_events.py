@@ -0,0 +1,103 @@
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from datetime import date
+from typing import FrozenSet, List, Optional, Set, Tuple
+
+# Seconds between SSE comment lines on an idle /events stream, so proxies and
+# load balancers do not close it.
+EVENTS_KEEPALIVE_SECONDS = int(os.environ.get("EVENTS_KEEPALIVE_SECONDS", 25))
+# How long a browser waits before reconnecting a dropped stream
+EVENTS_RETRY_MS = int(os.environ.get("EVENTS_RETRY_MS", 10000))
+# ETL runs whose touched days are remembered for delta requests; clients on an
+# older version get a full response.
+EVENTS_HISTORY = int(os.environ.get("EVENTS_HISTORY", 100))
+
+
+def format_sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def version_key(version) -> Optional[str]:
+    # The version as clients see it: ISO 8601, like the JSON responses
+    if version is None:
+        return None
+    return version.isoformat() if hasattr(version, "isoformat") else str(version)
+
+
+# Fans the data version seen by the instance's one etl_metadata watcher out to
+# every connected /events client. The watcher publishes from its thread; each
+# client waits on an asyncio.Queue on the server's event loop. The days each
+# run touched are kept so a client can ask for what changed since its version.
+class VersionBroadcaster:
+    def __init__(self, keepalive_seconds: int = EVENTS_KEEPALIVE_SECONDS, history: int = EVENTS_HISTORY):
+        self.keepalive_seconds = keepalive_seconds
+        self.version = None
+        # Latest successful ETL run in etl_metadata, as the watcher last read it.
+        # `version` follows it once the summary tables have been rebuilt.
+        self.etl_version = None
+        self._history: "deque[Tuple[str, Optional[FrozenSet[date]]]]" = deque(maxlen=history)
+        self._subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        self._lock = threading.Lock()
+
+    def publish(self, version, touched_days: Optional[Set[date]] = None) -> bool:
+        # Returns whether the version changed (and clients were notified).
+        # `touched_days` are the event dates the new run changed; None if unknown.
+        with self._lock:
+            if version == self.version:
+                return False
+            self.version = version
+            self._history.append((version_key(version), None if touched_days is None else frozenset(touched_days)))
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, version)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                pass
+        return True
+
+    def touched_since(self, since: str) -> Optional[Set[date]]:
+        # Days changed by every run after version `since`, or None when that
+        # version is not in the history (or a run's days are unknown)
+        with self._lock:
+            keys = [key for key, _ in self._history]
+            if since not in keys:
+                return None
+            touched = set()
+            for _, days in list(self._history)[keys.index(since) + 1:]:
+                if days is None:
+                    return None
+                touched |= days
+            return touched
+
+    def _subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def _unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers = [(loop, q) for loop, q in self._subscribers if q is not queue]
+
+    async def stream(self):
+        # SSE body: the current version on connect, then a `data-updated`
+        # event whenever the watcher sees a new one.
+        queue = self._subscribe()
+        try:
+            yield f"retry: {EVENTS_RETRY_MS}\n" + format_sse("data-version", {"version": version_key(self.version)})
+            while True:
+                try:
+                    version = await asyncio.wait_for(queue.get(), self.keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse("data-updated", {"version": version_key(version)})
+        finally:
+            self._unsubscribe(queue)
+
+    def __len__(self):
+        return len(self._subscribers)
@@ -0,0 +1,192 @@
+import os
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # The store is optional; without pyarrow /forecast queries BigQuery
+    pa = None
+    pc = None
+    pq = None
+
+# How often a request may check forecast_7day for a new generated_at before
+# reusing the in-memory copy.
+FORECAST_STORE_CHECK_SECONDS = int(os.environ.get("FORECAST_STORE_CHECK_SECONDS", 60))
+
+# Percentages the forecast_7day_view derives from the raw table
+PCT_COLUMNS = {
+    "forecasted_yield_pct": "forecasted_yield_rate",
+    "yield_lower_pct": "yield_lower",
+    "yield_upper_pct": "yield_upper",
+    "rf_yield_pct": "rf_yield_prediction",
+    "xgb_yield_pct": "xgb_yield_prediction",
+    "model_confidence_pct": "model_confidence",
+    "rejection_prob_1_pct": "rejection_prob_1",
+    "rejection_prob_2_pct": "rejection_prob_2",
+    "rejection_prob_3_pct": "rejection_prob_3",
+}
+
+DETAILED_COLUMNS = [
+    "sku", "vendor", "size", "line",
+    "forecasted_yield_pct",
+    "yield_lower_pct", "yield_upper_pct",
+    "forecasted_good_units",
+    "good_units_lower", "good_units_upper",
+    "forecasted_rejection_units",
+    "model_confidence_pct",
+    "top_rejection_reason_1", "rejection_prob_1_pct",
+    "top_rejection_reason_2", "rejection_prob_2_pct",
+    "top_rejection_reason_3", "rejection_prob_3_pct",
+]
+
+
+def forecast_store_available() -> bool:
+    return pa is not None
+
+
+def _artifact_path(directory: str, name: str) -> str:
+    return os.path.join(directory, f"{name}.parquet")
+
+
+def read_forecast_artifact(directory: str):
+    # forecast.parquet and forecast_reasons.parquet as written by ml/train.py
+    return pq.read_table(_artifact_path(directory, "forecast")), pq.read_table(_artifact_path(directory, "forecast_reasons"))
+
+
+def forecast_artifact_version(directory: str):
+    generated_at = pq.read_table(_artifact_path(directory, "forecast"), columns=["generated_at"])["generated_at"]
+    return pc.max(generated_at).as_py()
+
+
+def _pct(column):
+    # ROUND(x * 100, 2) as BigQuery does it (halves away from zero)
+    return pc.round(pc.multiply(column, 100.0), 2, round_mode="half_towards_infinity")
+
+
+def _sum(table, column) -> int:
+    return int(pc.sum(table[column]).as_py() or 0)
+
+
+def _mean(table, column) -> float:
+    return pc.mean(table[column]).as_py() or 0
+
+
+# In-memory copy of forecast_7day and its long-format reasons table. Both are
+# written in full by every ml/train.py run, so they are loaded whole and only
+# reloaded when generated_at changes. Every /forecast section is then a
+# filter and a group-by over a few thousand rows.
+class ForecastStore:
+    def __init__(self, load_tables: Callable[[], Tuple["pa.Table", "pa.Table"]], current_version: Callable[[], object],
+                 check_seconds: int = FORECAST_STORE_CHECK_SECONDS):
+        self._load_tables = load_tables
+        self._current_version = current_version
+        self.check_seconds = check_seconds
+        self.version = None
+        self._tables = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._tables is not None
+
+    def refresh(self, force: bool = False):
+        now = time.monotonic()
+        with self._lock:
+            if self.ready and not force and now - self._checked_at < self.check_seconds:
+                return
+            self._checked_at = now
+
+        version = self._current_version()
+        if self.ready and not force and version == self.version:
+            return
+
+        forecast, reasons = self._load_tables()
+        for name, source in PCT_COLUMNS.items():
+            forecast = forecast.append_column(name, _pct(forecast[source]))
+        forecast = forecast.append_column(
+            "forecasted_rejection_units",
+            pc.subtract(forecast["predicted_batch_qty"], forecast["forecasted_good_units"]))
+        reasons = reasons.append_column("probability_pct", _pct(reasons["probability"]))
+        with self._lock:
+            self._tables = (forecast, reasons)
+            self.version = version
+        print(f"Forecast store loaded: {forecast.num_rows} rows, {reasons.num_rows} reasons (version={version})")
+
+    @staticmethod
+    def _filter(table: "pa.Table", vendor: Optional[str], sizes: Optional[List[str]], skus: Optional[List[str]],
+                line: Optional[str]) -> "pa.Table":
+        conditions = []
+        if vendor and vendor.lower() != 'all':
+            conditions.append(pc.equal(table["vendor"], vendor))
+        if sizes:
+            conditions.append(pc.is_in(table["size"], value_set=pa.array(sizes, pa.string())))
+        if skus:
+            conditions.append(pc.is_in(table["sku"], value_set=pa.array(skus, pa.string())))
+        if line:
+            conditions.append(pc.equal(table["line"], line))
+        if not conditions:
+            return table
+        mask = conditions[0]
+        for condition in conditions[1:]:
+            mask = pc.and_(mask, condition)
+        return table.filter(mask)
+
+    def summary(self, vendor: Optional[str] = 'all', sizes: Optional[List[str]] = None,
+                skus: Optional[List[str]] = None, line: Optional[str] = None) -> dict:
+        # Same response as analysis.get_forecast_data
+        self.refresh()
+        forecast, reasons = self._tables
+        forecast = self._filter(forecast, vendor, sizes, skus, line)
+        reasons = self._filter(reasons, vendor, sizes, skus, line)
+
+        trend = forecast.group_by("forecast_date").aggregate([
+            ("forecasted_yield_pct", "mean"), ("yield_lower_pct", "mean"), ("yield_upper_pct", "mean"),
+            ("forecasted_good_units", "sum"), ("forecasted_rejection_units", "sum"),
+            ("rf_yield_pct", "mean"), ("xgb_yield_pct", "mean"),
+        ]).sort_by("forecast_date")
+        yield_trend = [
+            {
+                "day": row["forecast_date"].strftime('%a, %d %b'),
+                "predicted_yield": row["forecasted_yield_pct_mean"],
+                "yield_lower": row["yield_lower_pct_mean"],
+                "yield_upper": row["yield_upper_pct_mean"],
+                "good_units": row["forecasted_good_units_sum"],
+                "rejection_units": row["forecasted_rejection_units_sum"],
+                "rf_yield": row["rf_yield_pct_mean"],
+                "xgb_yield": row["xgb_yield_pct_mean"],
+            }
+            for row in trend.to_pylist()
+        ]
+
+        top_reasons = (
+            reasons.group_by("reason").aggregate([("probability_pct", "mean")])
+            .sort_by([("probability_pct_mean", "descending")])
+            .slice(0, 10)
+        )
+
+        # Stable sort, so ties keep table order
+        lowest = pc.sort_indices(forecast["forecasted_yield_pct"])[:50]
+        detailed = forecast.take(lowest).select(DETAILED_COLUMNS)
+
+        return {
+            "kpis": {
+                "forecasted_yield": round(_mean(forecast, "forecasted_yield_pct"), 1),
+                "forecasted_yield_lower": round(_mean(forecast, "yield_lower_pct"), 1),
+                "forecasted_yield_upper": round(_mean(forecast, "yield_upper_pct"), 1),
+                "forecasted_good_units": _sum(forecast, "forecasted_good_units"),
+                "forecasted_good_units_lower": _sum(forecast, "good_units_lower"),
+                "forecasted_good_units_upper": _sum(forecast, "good_units_upper"),
+                "forecasted_rejection_units": _sum(forecast, "forecasted_rejection_units"),
+                "model_confidence": round(_mean(forecast, "model_confidence_pct"), 1),
+            },
+            "yieldTrend": yield_trend,
+            "topPredictedRejections": [
+                {"name": row["reason"], "value": round(row["probability_pct_mean"], 1)}
+                for row in top_reasons.to_pylist()
+            ],
+            "detailedForecast": detailed.to_pylist(),
+        }
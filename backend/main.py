@@ -1,25 +1,47 @@
 import os
+import json
+import queue
+import time
+import threading
+import concurrent.futures
+from functools import partial
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Query, Depends, status, Body
+from fastapi import FastAPI, HTTPException, Query, Depends, status, Body, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from google.cloud import bigquery
 from google.cloud.bigquery import ScalarQueryParameter, QueryJobConfig, ArrayQueryParameter
+from google.api_core.exceptions import NotFound
 from pydantic_settings import BaseSettings
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import date, timedelta
 from analysis import (
     fetch_analysis_data, 
+    iter_analysis_sections,
     build_where_clause, 
     fetch_report_data, 
     get_rejection_report_data, 
     get_category_report_data, 
     get_forecast_data,
+    fetch_comparison_data,
+    ANALYSIS_SECTIONS,
+    COMPARE_DIMENSIONS,
+    COMPARE_MAX_VALUES,
     fetch_kpi_data,
     fetch_wip_charts_data
 )
 from auth import verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, get_password_hash
+from replica import MasterReplica, replica_available, fetch_master_changes, REPLICA_TABLE
+from serial_index import SerialIndex, serial_index_available
+from mo_index import MOIndex
+from forecast_store import ForecastStore, forecast_store_available, read_forecast_artifact, forecast_artifact_version
+from data_events import VersionBroadcaster, version_key
+from segment_cache import segment_cache
+from response_cache import ResponseCache, request_key
+from circuit_breaker import BQ_DOWNLOAD_TIMEOUT_SECONDS, CircuitBreaker, ContextThreadPoolExecutor, GuardedClient, QueryFailures, track_failures
 
 # Load environment variables from .env file
 load_dotenv()
@@ -31,6 +53,30 @@ class Settings(BaseSettings):
     RING_STATUS_TABLE_ID: str = 'ring_status'
     REJECTION_ANALYSIS_TABLE_ID: str = 'rejection_analysis'
     USERS_TABLE_ID: str = 'users'
+    # Embedded DuckDB/Parquet replica of the master table for /search and /kpi-data
+    REPLICA_ENABLED: bool = False
+    REPLICA_DIR: str = '/tmp/master_replica'
+    # Memory-mapped serial_number -> master row index for /serial and bulk serial search
+    SERIAL_INDEX_ENABLED: bool = False
+    SERIAL_INDEX_DIR: str = '/tmp/serial_index'
+    # How often the instance's single watcher checks etl_metadata; new runs
+    # sync the master stores and are pushed to /events clients
+    MASTER_SYNC_INTERVAL_SECONDS: int = 60
+    # Incremental syncs only upsert changed rows, so rows deleted or re-keyed in
+    # the master table stay in the local copies until a full pull this often
+    MASTER_FULL_RESYNC_SECONDS: int = 86400
+    # Without a summary_rebuild_log marker (bq_trigger not yet redeployed), a new
+    # ETL run is only acted on (cache invalidation, /events, pre-warming) this
+    # long after it is seen, once the summary tables have been rebuilt
+    SUMMARY_REBUILD_GRACE_SECONDS: int = 600
+    # In-memory copy of the ML forecast for /forecast
+    FORECAST_STORE_ENABLED: bool = True
+    # Directory of the Parquet artifact written by ml/train.py; BigQuery when unset
+    FORECAST_ARTIFACT_DIR: Optional[str] = None
+    # Recompute the default and most requested views after each ETL run
+    PREWARM_ENABLED: bool = True
+    PREWARM_TOP_K: int = 20
+    PREWARM_CONCURRENCY: int = 2
 
 settings = Settings()
 
@@ -65,9 +111,16 @@ class SearchRequest(BaseModel):
     end_date: Optional[date] = None
     line: Optional[str] = None
     download: bool = False
+    fields: Optional[List[str]] = None
+
+class SerialLookupRequest(BaseModel):
+    serial_numbers: List[str]
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Set on responses served from the cache past their freshness (seconds old)
+STALE_HEADER = "X-Data-Stale-Seconds"
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -81,11 +134,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=[STALE_HEADER],
 )
 
+# Every query goes through the breaker, so BigQuery incidents fail fast
+bigquery_breaker = CircuitBreaker()
+
 # Initialize BigQuery client
 try:
-    client = bigquery.Client(project=settings.BIGQUERY_PROJECT_ID)
+    client = GuardedClient(bigquery.Client(project=settings.BIGQUERY_PROJECT_ID), bigquery_breaker)
     TABLE = f"`{settings.BIGQUERY_PROJECT_ID}.{settings.BIGQUERY_DATASET_ID}.{settings.BIGQUERY_TABLE_ID}`"
     RING_STATUS_TABLE = f"`{settings.BIGQUERY_PROJECT_ID}.{settings.BIGQUERY_DATASET_ID}.{settings.BIGQUERY_TABLE_ID.replace('master_station_data', 'ring_status')}`"
     REJECTION_ANALYSIS_TABLE = f"`{settings.BIGQUERY_PROJECT_ID}.{settings.BIGQUERY_DATASET_ID}.{settings.REJECTION_ANALYSIS_TABLE_ID}`"
@@ -99,6 +156,230 @@ except Exception as e:
     REJECTION_ANALYSIS_TABLE = f"`{settings.BIGQUERY_PROJECT_ID}.{settings.BIGQUERY_DATASET_ID}.{settings.REJECTION_ANALYSIS_TABLE_ID}`"
     USERS_TABLE = f"`{settings.BIGQUERY_PROJECT_ID}.{settings.BIGQUERY_DATASET_ID}.users`"
 
+ETL_METADATA_TABLE = f"`{settings.BIGQUERY_PROJECT_ID}.{settings.BIGQUERY_DATASET_ID}.etl_metadata`"
+# One row per summary table rebuild, appended by bq_trigger once it completes
+SUMMARY_REBUILD_TABLE = f"`{settings.BIGQUERY_PROJECT_ID}.{settings.BIGQUERY_DATASET_ID}.summary_rebuild_log`"
+MO_SUMMARY_TABLE = f"`{settings.BIGQUERY_PROJECT_ID}.{settings.BIGQUERY_DATASET_ID}.mo_summary`"
+FORECAST_TABLE = f"`{settings.BIGQUERY_PROJECT_ID}.{settings.BIGQUERY_DATASET_ID}.forecast_7day`"
+FORECAST_REASONS_TABLE = f"`{settings.BIGQUERY_PROJECT_ID}.{settings.BIGQUERY_DATASET_ID}.forecast_7day_reasons`"
+
+replica = MasterReplica(settings.REPLICA_DIR) if settings.REPLICA_ENABLED and replica_available() else None
+serial_index = SerialIndex(settings.SERIAL_INDEX_DIR) if settings.SERIAL_INDEX_ENABLED and serial_index_available() else None
+
+SERIAL_LOOKUP_MAX = 10000
+
+# Columns of master_station_data that /search and /kpi-data may project
+MASTER_COLUMNS = [
+    'vqc_inward_date', 'line', 'serial_number', 'vqc_status', 'vqc_reason',
+    'ft_inward_date', 'ft_status', 'ft_reason', 'cs_comp_date', 'cs_status', 'cs_reason',
+    'size', 'sku', 'ctpf_mo', 'air_mo', 'pcb', 'vendor', 'last_updated_at',
+]
+# What the Search grid renders; used for pages when no fields are requested.
+# Downloads without fields keep every column, as they always have.
+DEFAULT_FIELDS = [
+    'serial_number', 'vendor', 'size', 'sku', 'line',
+    'vqc_status', 'vqc_reason', 'ft_status', 'ft_reason', 'cs_status', 'cs_reason',
+    'ctpf_mo', 'air_mo', 'vqc_inward_date', 'ft_inward_date', 'cs_comp_date',
+]
+
+def resolve_fields(fields: Optional[List[str]], download: bool = False) -> List[str]:
+    # Accepts repeated ?fields= values as well as comma-separated lists
+    requested = [f.strip() for item in fields or [] for f in item.split(',') if f.strip()]
+    unknown = [f for f in requested if f not in MASTER_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(requested)) or (MASTER_COLUMNS if download else DEFAULT_FIELDS)
+
+def fetch_etl_version():
+    query = f"""
+        SELECT last_sync_attempt as last_updated 
+        FROM {ETL_METADATA_TABLE} 
+        WHERE status = 'SUCCESS' 
+        ORDER BY last_sync_attempt DESC 
+        LIMIT 1
+    """
+    results = list(client.query(query).result())
+    return results[0]['last_updated'] if results and results[0]['last_updated'] else None
+
+def fetch_rebuild_marker():
+    # (version, master watermark covered) of the latest summary table rebuild
+    # recorded by bq_trigger, or (None, None) if it has never recorded one
+    query = f"""
+        SELECT rebuilt_at, rebuilt_through
+        FROM {SUMMARY_REBUILD_TABLE}
+        ORDER BY rebuilt_at DESC
+        LIMIT 1
+    """
+    try:
+        results = list(client.query(query).result())
+    except NotFound:
+        # bq_trigger creates the table with its first marker
+        return None, None
+    if not results:
+        return None, None
+    return results[0]['rebuilt_at'], results[0]['rebuilt_through']
+
+def fetch_touched_days(since, until=None):
+    # Event dates (the dates dash_overview, rejection_analysis and wip_sku_wise
+    # are keyed by) of master rows changed after the `since` watermark (and up
+    # to `until`, the watermark the summary rebuild covered), and the new
+    # watermark. With no watermark yet only the watermark is read.
+    if since is None:
+        if until is not None:
+            return None, until
+        results = list(client.query(f"SELECT MAX(last_updated_at) AS watermark FROM {TABLE}").result())
+        return None, results[0]['watermark'] if results else None
+    params = [ScalarQueryParameter("since", "DATETIME", since)]
+    bound = ""
+    if until is not None:
+        params.append(ScalarQueryParameter("until", "DATETIME", until))
+        bound = "AND last_updated_at <= @until"
+    query = f"""
+        SELECT day, MAX(last_updated_at) AS watermark
+        FROM {TABLE}, UNNEST([vqc_inward_date, ft_inward_date, cs_comp_date]) AS day
+        WHERE last_updated_at > @since {bound} AND day IS NOT NULL
+        GROUP BY day
+    """
+    rows = list(client.query(query, job_config=QueryJobConfig(query_parameters=params)).result())
+    if until is not None:
+        return {row['day'] for row in rows}, max(until, since)
+    return {row['day'] for row in rows}, max([row['watermark'] for row in rows], default=since)
+
+def fetch_mo_summary():
+    return [dict(row) for row in client.query(f"SELECT * FROM {MO_SUMMARY_TABLE}").result()]
+
+def fetch_mo_summary_version():
+    # mo_summary is rebuilt by bq_trigger after the ETL run, so the ETL's own
+    # row can predate it; use the rebuild marker, or the table's last-modified
+    # time until the trigger records one.
+    version, _ = fetch_rebuild_marker()
+    if version is not None:
+        return version
+    return client.get_table(MO_SUMMARY_TABLE.strip('`')).modified
+
+mo_index = MOIndex(fetch_mo_summary, fetch_mo_summary_version)
+data_events = VersionBroadcaster()
+response_cache = ResponseCache()
+
+def fetch_forecast_version():
+    # Every ml/train.py run rewrites the whole table with one generated_at
+    if settings.FORECAST_ARTIFACT_DIR:
+        return forecast_artifact_version(settings.FORECAST_ARTIFACT_DIR)
+    results = list(client.query(f"SELECT MAX(generated_at) AS generated_at FROM {FORECAST_TABLE}").result())
+    return results[0]['generated_at'] if results else None
+
+def fetch_forecast_tables():
+    if settings.FORECAST_ARTIFACT_DIR:
+        return read_forecast_artifact(settings.FORECAST_ARTIFACT_DIR)
+    jobs = [client.query(f"SELECT * FROM {table}") for table in (FORECAST_TABLE, FORECAST_REASONS_TABLE)]
+    for job in jobs:
+        job.result(timeout=BQ_DOWNLOAD_TIMEOUT_SECONDS)
+    return tuple(job.to_arrow() for job in jobs)
+
+forecast_store = (ForecastStore(fetch_forecast_tables, fetch_forecast_version)
+                  if settings.FORECAST_STORE_ENABLED and forecast_store_available() else None)
+
+def master_stores():
+    return [store for store in (replica, serial_index) if store is not None]
+
+def full_resync_due() -> bool:
+    return any(store.ready and time.monotonic() - store.loaded_at >= settings.MASTER_FULL_RESYNC_SECONDS
+               for store in master_stores())
+
+def sync_master_stores(version=None):
+    # One incremental pull feeds every local copy of the master table; a store
+    # that has not loaded yet, or is due its periodic resync, forces a full pull.
+    stores = master_stores()
+    watermarks = [store.watermark for store in stores]
+    since = None if any(not store.ready or w is None for store, w in zip(stores, watermarks)) else min(watermarks)
+    if full_resync_due():
+        since = None
+    changes = fetch_master_changes(client, TABLE, since)
+    for store in stores:
+        store.apply_changes(changes, full=since is None)
+        store.synced_version = version
+
+def data_watch_loop():
+    # The instance's one etl_metadata watcher. etl_metadata is tiny, so checking
+    # it is cheap. A new successful ETL run syncs the master stores; cached days
+    # are invalidated and /events clients told only once bq_trigger has rebuilt
+    # the summary tables from it (its summary_rebuild_log marker), as the cache and
+    # clients read those tables. The master table is only read incrementally,
+    # by last_updated_at, up to the watermark the rebuild covered.
+    watermark = None
+    seen_version, seen_at = None, 0.0
+    while True:
+        try:
+            etl_version = fetch_etl_version()
+            data_events.etl_version = etl_version
+            if full_resync_due() or any(not store.ready or etl_version != store.synced_version for store in master_stores()):
+                sync_master_stores(etl_version)
+            version, rebuilt_through = fetch_rebuild_marker()
+            settled = True
+            if version is None:
+                # No marker to wait for: give the rebuild time to finish
+                version = etl_version
+                if version != seen_version:
+                    seen_version, seen_at = version, time.monotonic()
+                settled = data_events.version is None or time.monotonic() - seen_at >= settings.SUMMARY_REBUILD_GRACE_SECONDS
+            if settled and version != data_events.version:
+                try:
+                    touched, watermark = fetch_touched_days(watermark, rebuilt_through)
+                except Exception as e:
+                    print(f"Touched days error: {e}")
+                    touched = None
+                # Cached closed days the run rewrote are stale; unknown means all
+                segment_cache.invalidate(touched)
+                data_events.publish(version, touched)
+                if settings.PREWARM_ENABLED:
+                    threading.Thread(target=prewarm_views, args=(version,), daemon=True).start()
+        except Exception as e:
+            print(f"Data watch error: {e}")
+        time.sleep(settings.MASTER_SYNC_INTERVAL_SECONDS)
+
+def delta_days(since: Optional[str], start_date: Optional[date], end_date: Optional[date]) -> Optional[List[date]]:
+    # Days in [start_date, end_date] the ETL changed after the client's version
+    # `since`; None when the client needs a full response.
+    if since is None:
+        return None
+    touched = data_events.touched_since(since)
+    if touched is None:
+        return None
+    return sorted(d for d in touched if (start_date is None or d >= start_date) and (end_date is None or d <= end_date))
+
+def delta_info(since: Optional[str], days: Optional[List[date]]) -> dict:
+    # Added to responses of requests that pass `since`
+    return {"version": version_key(data_events.version), "delta": None if days is None else {"since": since, "days": days}}
+
+@app.on_event("startup")
+def start_data_watch():
+    if not client:
+        return
+    for store in master_stores():
+        try:
+            store.load()
+        except Exception as e:
+            print(f"{type(store).__name__} load error: {e}")
+    threading.Thread(target=data_watch_loop, daemon=True).start()
+
+def run_master_query(query: str, query_parameters: list, use_replica: bool = False, download: bool = False):
+    # Downloads return every matching row, so they get the bulk timeout
+    if use_replica:
+        return replica.query(query, query_parameters)
+    query_job = client.query(query, job_config=QueryJobConfig(query_parameters=query_parameters))
+    timeout = BQ_DOWNLOAD_TIMEOUT_SECONDS if download else client.timeout
+    return [dict(row) for row in query_job.result(timeout=timeout)]
+
+def lookup_serials(serial_numbers: List[str]) -> dict:
+    if serial_index is not None and serial_index.ready:
+        return serial_index.get_many(serial_numbers)
+    use_replica = replica is not None and replica.ready
+    if not client and not use_replica:
+        raise HTTPException(status_code=500, detail="BigQuery client not initialized")
+    query = f"SELECT * FROM {REPLICA_TABLE if use_replica else TABLE} WHERE serial_number IN UNNEST(@serial_numbers)"
+    rows = run_master_query(query, [ArrayQueryParameter("serial_numbers", "STRING", serial_numbers)], use_replica)
+    return {row['serial_number']: row for row in rows}
+
 @app.get("/forecast")
 async def get_forecast(
     start_date: Optional[date] = None, 
@@ -108,9 +389,11 @@ async def get_forecast(
     skus: Optional[List[str]] = Query(None, alias="sku"),
     line: Optional[str] = None
 ):
-    if not client:
+    if not client and not settings.FORECAST_ARTIFACT_DIR:
         raise HTTPException(status_code=500, detail="BigQuery client not initialized")
     try:
+        if forecast_store is not None:
+            return forecast_store.summary(vendor, sizes, skus, line)
         data = get_forecast_data(client, start_date, end_date, vendor, sizes, skus, line)
         return data
     except Exception as e:
@@ -182,6 +465,7 @@ async def get_analysis(start_date: Optional[date] = None, end_date: Optional[dat
 
 @app.get("/report-data")
 async def get_report(
+    response: Response,
     start_date: Optional[date] = None, 
     end_date: Optional[date] = None, 
     stage: str = Query('VQC', description="Stage: VQC, FT, or WABI SABI"),
@@ -193,29 +477,58 @@ async def get_report(
     if not client:
         raise HTTPException(status_code=500, detail="BigQuery client not initialized")
     
-    import concurrent.futures
+    params = dict(start_date=start_date, end_date=end_date, stage=stage, vendor=vendor, sizes=sizes, skus=skus, line=line)
     try:
-        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-            data_future = executor.submit(
-                fetch_report_data, client, RING_STATUS_TABLE, REJECTION_ANALYSIS_TABLE, 
-                start_date, end_date, stage, vendor, sizes, skus, line
-            )
-            compare_future = executor.submit(
-                fetch_report_data, client, RING_STATUS_TABLE, REJECTION_ANALYSIS_TABLE, 
-                start_date, end_date, stage, vendor, sizes, skus, line, compare=True
-            )
-            
-            result = data_future.result()
-            compare_result = compare_future.result()
-            
-            # If compare_future returns full dict (because it's the same function), we only need its 'kpis'
-            comparison_kpis = compare_result if isinstance(compare_result, dict) and 'kpis' not in compare_result else compare_result.get('kpis', {})
-            
-            result['comparison_kpis'] = comparison_kpis
-            return result
+        return cached_view("report-data", params, response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting report data: {e}")
 
+def compute_report(start_date, end_date, stage, vendor, sizes, skus, line):
+    with ContextThreadPoolExecutor(max_workers=2) as executor:
+        data_future = executor.submit(
+            fetch_report_data, client, RING_STATUS_TABLE, REJECTION_ANALYSIS_TABLE, 
+            start_date, end_date, stage, vendor, sizes, skus, line
+        )
+        compare_future = executor.submit(
+            fetch_report_data, client, RING_STATUS_TABLE, REJECTION_ANALYSIS_TABLE, 
+            start_date, end_date, stage, vendor, sizes, skus, line, compare=True
+        )
+        
+        result = data_future.result()
+        compare_result = compare_future.result()
+        
+        # If compare_future returns full dict (because it's the same function), we only need its 'kpis'
+        comparison_kpis = compare_result if isinstance(compare_result, dict) and 'kpis' not in compare_result else compare_result.get('kpis', {})
+        
+        result['comparison_kpis'] = comparison_kpis
+        return result
+
+@app.get("/compare")
+async def get_comparison(
+    dimension: str = Query(..., description="Dimension to compare: sku, size, line or vendor"),
+    values: List[str] = Query(..., alias="value", description="Values of the dimension to compare"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    stage: str = Query('VQC', description="Stage: VQC, FT, or WABI SABI"),
+    vendor: str = Query('all', description="Vendor name"),
+    sizes: Optional[List[str]] = Query(None, alias="size"),
+    skus: Optional[List[str]] = Query(None, alias="sku"),
+    line: Optional[str] = None
+):
+    if dimension not in COMPARE_DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"dimension must be one of: {', '.join(COMPARE_DIMENSIONS)}")
+    # Repeated ?value= and comma-separated lists both work
+    values = [v.strip() for item in values for v in item.split(',') if v.strip()]
+    if not values or len(values) > COMPARE_MAX_VALUES:
+        raise HTTPException(status_code=400, detail=f"Pass between 1 and {COMPARE_MAX_VALUES} values")
+    if not client:
+        raise HTTPException(status_code=500, detail="BigQuery client not initialized")
+    try:
+        return fetch_comparison_data(client, RING_STATUS_TABLE, REJECTION_ANALYSIS_TABLE, dimension, values,
+                                     start_date, end_date, stage, vendor, sizes, skus, line)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting comparison data: {e}")
+
 @app.get("/rejection-report-data")
 async def get_rejection_report(
     start_date: Optional[date] = None, 
@@ -225,21 +538,27 @@ async def get_rejection_report(
     sizes: Optional[List[str]] = Query(None, alias="size"),
     skus: Optional[List[str]] = Query(None, alias="sku"),
     line: Optional[str] = None,
-    download: bool = False
+    download: bool = False,
+    since: Optional[str] = Query(None, description="Data version the client holds; only the date columns changed since are returned")
 ):
     if not client:
         raise HTTPException(status_code=500, detail="BigQuery client not initialized")
     try:
-        data = get_rejection_report_data(client, REJECTION_ANALYSIS_TABLE, start_date, end_date, stage, vendor, sizes, skus, line)
         if download:
+            data = get_rejection_report_data(client, REJECTION_ANALYSIS_TABLE, start_date, end_date, stage, vendor, sizes, skus, line)
             # Flatten/prepare data for CSV if needed, or just return the table_data which is already row-based
             return {"data": data.get('table_data', [])}
-        return data
+        days = delta_days(since, start_date, end_date)
+        if days is not None and not days:
+            return delta_info(since, days)
+        data = get_rejection_report_data(client, REJECTION_ANALYSIS_TABLE, start_date, end_date, stage, vendor, sizes, skus, line, days=days)
+        return {**data, **delta_info(since, days)} if since is not None else data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting rejection report data: {e}")
 
 @app.get("/category-report-data")
 async def get_category_report(
+    response: Response,
     start_date: Optional[date] = None, 
     end_date: Optional[date] = None, 
     vendor: str = Query('all', description="Vendor name"),
@@ -251,15 +570,213 @@ async def get_category_report(
     if not client:
         raise HTTPException(status_code=500, detail="BigQuery client not initialized")
     try:
-        data = get_category_report_data(client, REJECTION_ANALYSIS_TABLE, start_date, end_date, vendor, sizes, skus, line, download=download)
         if download:
-             return {"data": data}
-        return data
+            data = get_category_report_data(client, REJECTION_ANALYSIS_TABLE, start_date, end_date, vendor, sizes, skus, line, download=download)
+            return {"data": data}
+        return cached_view("category-report-data", dict(start_date=start_date, end_date=end_date, vendor=vendor, sizes=sizes, skus=skus, line=line), response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting category report data: {e}")
 
+def compute_category_report(start_date, end_date, vendor, sizes, skus, line):
+    return get_category_report_data(client, REJECTION_ANALYSIS_TABLE, start_date, end_date, vendor, sizes, skus, line)
+
+HOME_SUMMARY_SECTIONS = ["kpis", "comparison_kpis", "charts", "analysis", "comparison_analysis_kpis"]
+# Values /home-summary?include= accepts; "analysis.<part>" selects single analysis sections
+HOME_SUMMARY_INCLUDES = HOME_SUMMARY_SECTIONS + [f"analysis.{part}" for part in ANALYSIS_SECTIONS]
+
+def home_summary_plan(start_date, end_date, sizes, skus, date_column, stage, line, vendor, include=None, days=None):
+    # (key, fetch, sections) for each /home-summary section. `sections`, when
+    # set, yields the section's parts one at a time for the streaming response.
+    # `include` keeps only the listed sections, so nothing else is queried, and
+    # `days` (a delta) limits rejectionTrend to those days.
+    analysis_parts = None
+    if include is not None and "analysis" not in include:
+        analysis_parts = [part for part in ANALYSIS_SECTIONS if f"analysis.{part}" in include]
+    if days is not None and not days:
+        # Nothing in the range changed
+        return []
+    analysis_args = (client, TABLE, start_date, end_date, sizes, skus, date_column, 'sku', 'size', line, stage, vendor)
+    plan = [
+        ("kpis", partial(fetch_kpi_data, client, start_date, end_date, sizes, skus, line, stage, vendor,
+                         settings.BIGQUERY_PROJECT_ID, settings.BIGQUERY_DATASET_ID), None),
+        # Comparison data (previous month)
+        ("comparison_kpis", partial(fetch_kpi_data, client, start_date, end_date, sizes, skus, line, stage, vendor,
+                                    settings.BIGQUERY_PROJECT_ID, settings.BIGQUERY_DATASET_ID, compare=True), None),
+        ("charts", partial(fetch_wip_charts_data, client, start_date, end_date, sizes, skus, line,
+                           settings.BIGQUERY_PROJECT_ID, settings.BIGQUERY_DATASET_ID), None),
+        ("analysis", partial(fetch_analysis_data, *analysis_args, sections=analysis_parts, days=days),
+         partial(iter_analysis_sections, *analysis_args, sections=analysis_parts, days=days)),
+        # Comparison data for analysis specific kpis
+        ("comparison_analysis_kpis", partial(fetch_analysis_data, *analysis_args, compare=True), None),
+    ]
+    if include is None:
+        return plan
+    return [entry for entry in plan if entry[0] in include or (entry[0] == "analysis" and analysis_parts)]
+
+def stream_sections(plan, preamble=None, on_done=None):
+    # NDJSON: the `preamble` messages, then one {"key", "data"} line per section
+    # (or {"key", "error"}) in the order they finish, then {"key": "done"}.
+    # Sections with parts are sent as "<key>.<part>". `on_done` gets the
+    # sections' query failures and the assembled response when every section
+    # succeeded.
+    finished = queue.Queue()
+    failures = QueryFailures()
+
+    def run(key, fetch, sections):
+        try:
+            with track_failures(failures):
+                if sections is None:
+                    finished.put({"key": key, "data": fetch()})
+                else:
+                    for part, data in sections():
+                        finished.put({"key": f"{key}.{part}", "data": data})
+        except Exception as e:
+            print(f"Section {key} error: {e}")
+            finished.put({"key": key, "error": str(e)})
+        finally:
+            finished.put(None)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(len(plan), 1))
+    try:
+        for message in preamble or []:
+            yield json.dumps(jsonable_encoder(message)) + "\n"
+        for key, fetch, sections in plan:
+            executor.submit(run, key, fetch, sections)
+        remaining = len(plan)
+        result, failed = {}, False
+        while remaining:
+            message = finished.get()
+            if message is None:
+                remaining -= 1
+                continue
+            if "error" in message:
+                failed = True
+            elif "." in message["key"]:
+                key, part = message["key"].split(".", 1)
+                result.setdefault(key, {})[part] = message["data"]
+            else:
+                result[message["key"]] = message["data"]
+            yield json.dumps(jsonable_encoder(message)) + "\n"
+        yield json.dumps({"key": "done"}) + "\n"
+        if on_done and not failed:
+            on_done(failures, result)
+    finally:
+        # A client that disconnects early leaves the queries to finish on their own
+        executor.shutdown(wait=False)
+
+def stream_result(result):
+    # A finished /home-summary response in the streaming format
+    for key, data in result.items():
+        parts = data.items() if key == "analysis" else [(None, data)]
+        for part, part_data in parts:
+            message = {"key": key if part is None else f"{key}.{part}", "data": part_data}
+            yield json.dumps(jsonable_encoder(message)) + "\n"
+    yield json.dumps({"key": "done"}) + "\n"
+
+def run_plan(plan) -> dict:
+    with ContextThreadPoolExecutor(max_workers=max(len(plan), 1)) as executor:
+        futures = {key: executor.submit(fetch) for key, fetch, _ in plan}
+        # Explicitly wait for and extract results to ensure they are serializable dicts
+        return {key: future.result() for key, future in futures.items()}
+
+def compute_home_summary(start_date, end_date, sizes, skus, date_column, stage, line, vendor):
+    return run_plan(home_summary_plan(start_date, end_date, sizes, skus, date_column, stage, line, vendor))
+
+VIEW_COMPUTERS = {
+    "home-summary": compute_home_summary,
+    "report-data": compute_report,
+    "category-report-data": compute_category_report,
+}
+
+def cache_if_clean(endpoint: str, params: dict, version, failures: QueryFailures, result):
+    # The fetch helpers return empty fallbacks when a query fails, so a result
+    # is only kept if none of its own queries failed (or were refused)
+    if not failures.count:
+        response_cache.put(endpoint, params, version, result)
+
+def compute_view(endpoint: str, params: dict, version):
+    with track_failures() as failures:
+        result = VIEW_COMPUTERS[endpoint](**params)
+    cache_if_clean(endpoint, params, version, failures, result)
+    return result
+
+refreshing = set()
+refreshing_lock = threading.Lock()
+
+def refresh_view(endpoint: str, params: dict, version):
+    # Recomputes a view in the background; one refresh per view at a time
+    key = request_key(endpoint, params)
+    with refreshing_lock:
+        if key in refreshing:
+            return
+        refreshing.add(key)
+
+    def run():
+        try:
+            compute_view(endpoint, params, version)
+        except Exception as e:
+            print(f"Refresh {endpoint} error: {e}")
+        finally:
+            with refreshing_lock:
+                refreshing.discard(key)
+
+    threading.Thread(target=run, daemon=True).start()
+
+def cached_view(endpoint: str, params: dict, response: Optional[Response] = None):
+    # The endpoint's response for the current data version. On a miss the last
+    # good response, if any, is served at once (stale-while-revalidate) with
+    # its age in STALE_HEADER while a background refresh runs.
+    version = data_events.version
+    cached = response_cache.get(endpoint, params, version)
+    if cached is not None:
+        return cached
+    stale = response_cache.get_stale(endpoint, params)
+    if stale is not None:
+        refresh_view(endpoint, params, version)
+        if response is not None:
+            response.headers[STALE_HEADER] = str(int(stale[1]))
+        return stale[0]
+    return compute_view(endpoint, params, version)
+
+def default_views(today: date) -> list:
+    # What the dashboard opens with: month to date (plus the 3 days the date
+    # picker adds), production line, every vendor, size and SKU
+    start_date, end_date = today.replace(day=1), today + timedelta(days=3)
+    common = dict(start_date=start_date, end_date=end_date, sizes=None, skus=None, line='PRODUCTION')
+    views = [("home-summary", dict(common, date_column='vqc_inward_date', stage='VQC', vendor='all'))]
+    views += [("report-data", dict(common, stage=stage, vendor='all')) for stage in ('VQC', 'FT', 'CS')]
+    views.append(("category-report-data", dict(common, vendor='all')))
+    return views
+
+prewarm_lock = threading.Lock()
+
+def prewarm_views(version):
+    # Recomputes the default views and the most requested ones for `version`
+    # on a small pool, so the first user after an ETL run hits the cache. Only
+    # started for a version whose summary tables have been rebuilt.
+    with prewarm_lock:
+        views = {}
+        for endpoint, params in default_views(date.today()) + response_cache.top_requests(settings.PREWARM_TOP_K):
+            views.setdefault(request_key(endpoint, params), (endpoint, params))
+
+        def warm(endpoint, params):
+            if data_events.version != version:
+                return  # A newer run superseded this one
+            if response_cache.get(endpoint, params, version, record=False) is not None:
+                return
+            try:
+                compute_view(endpoint, params, version)
+            except Exception as e:
+                print(f"Prewarm {endpoint} error: {e}")
+
+        started = time.monotonic()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=settings.PREWARM_CONCURRENCY) as executor:
+            list(executor.map(lambda view: warm(*view), views.values()))
+        print(f"Prewarmed {len(views)} views in {time.monotonic() - started:.1f}s (version={version})")
+
 @app.get("/home-summary")
 async def get_home_summary(
+    response: Response,
     start_date: Optional[date] = None, 
     end_date: Optional[date] = None, 
     sizes: Optional[List[str]] = Query(None, alias="size"), 
@@ -267,51 +784,52 @@ async def get_home_summary(
     date_column: str = 'vqc_inward_date', 
     stage: Optional[str] = None, 
     line: Optional[str] = None, 
-    vendor: str = Query('all', description="Vendor name")
+    vendor: str = Query('all', description="Vendor name"),
+    stream: bool = Query(False, description="Stream sections as NDJSON as they complete"),
+    include: Optional[List[str]] = Query(None, description="Sections to compute, e.g. kpis,charts,analysis.rejectionTrend (default: all)"),
+    since: Optional[str] = Query(None, description="Data version the client holds; rejectionTrend then only has the days changed since")
 ):
+    # Repeated ?include= and comma-separated lists both work
+    include = {v.strip() for item in include or [] for v in item.split(',') if v.strip()} or None
+    if include is not None:
+        unknown = include - set(HOME_SUMMARY_INCLUDES)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown sections: {', '.join(sorted(unknown))}. Valid: {', '.join(HOME_SUMMARY_INCLUDES)}")
     if not client:
         raise HTTPException(status_code=500, detail="BigQuery client not initialized")
 
-    import concurrent.futures
+    # Only whole responses are cached (and pre-warmed)
+    if include is None and since is None:
+        params = dict(start_date=start_date, end_date=end_date, sizes=sizes, skus=skus, date_column=date_column, stage=stage, line=line, vendor=vendor)
+        if stream:
+            version = data_events.version
+            cached = response_cache.get("home-summary", params, version)
+            if cached is not None:
+                return StreamingResponse(stream_result(cached), media_type="application/x-ndjson")
+            stale = response_cache.get_stale("home-summary", params)
+            if stale is not None:
+                refresh_view("home-summary", params, version)
+                return StreamingResponse(stream_result(stale[0]), media_type="application/x-ndjson",
+                                         headers={STALE_HEADER: str(int(stale[1]))})
+            plan = home_summary_plan(**params)
+            on_done = partial(cache_if_clean, "home-summary", params, version)
+            return StreamingResponse(stream_sections(plan, on_done=on_done), media_type="application/x-ndjson")
+        try:
+            return cached_view("home-summary", params, response)
+        except Exception as e:
+            print(f"Home Summary Error: {e}")
+            raise HTTPException(status_code=500, detail=f"Error generating home summary: {str(e)}")
+
+    days = delta_days(since, start_date, end_date)
+    plan = home_summary_plan(start_date, end_date, sizes, skus, date_column, stage, line, vendor, include, days)
+    delta = delta_info(since, days) if since is not None else None
+    if stream:
+        preamble = [{"key": "delta", "data": delta}] if delta else None
+        return StreamingResponse(stream_sections(plan, preamble), media_type="application/x-ndjson")
+
     try:
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            kpi_future = executor.submit(
-                fetch_kpi_data, client, start_date, end_date, sizes, skus, line, stage, vendor, 
-                settings.BIGQUERY_PROJECT_ID, settings.BIGQUERY_DATASET_ID
-            )
-            # Fetch comparison data (previous month)
-            compare_future = executor.submit(
-                fetch_kpi_data, client, start_date, end_date, sizes, skus, line, stage, vendor, 
-                settings.BIGQUERY_PROJECT_ID, settings.BIGQUERY_DATASET_ID, compare=True
-            )
-            chart_future = executor.submit(
-                fetch_wip_charts_data, client, start_date, end_date, sizes, skus, line, 
-                settings.BIGQUERY_PROJECT_ID, settings.BIGQUERY_DATASET_ID
-            )
-            analysis_future = executor.submit(
-                fetch_analysis_data, client, TABLE, start_date, end_date, sizes, skus, 
-                date_column, 'sku', 'size', line, stage, vendor
-            )
-            # Fetch comparison data for analysis specific kpis
-            compare_analysis_future = executor.submit(
-                fetch_analysis_data, client, TABLE, start_date, end_date, sizes, skus, 
-                date_column, 'sku', 'size', line, stage, vendor, compare=True
-            )
-            
-            # Explicitly wait for and extract results to ensure they are serializable dicts
-            kpi_results = kpi_future.result()
-            compare_results = compare_future.result()
-            chart_results = chart_future.result()
-            analysis_results = analysis_future.result()
-            compare_analysis_results = compare_analysis_future.result()
-            
-            return {
-                "kpis": kpi_results,
-                "comparison_kpis": compare_results,
-                "charts": chart_results,
-                "analysis": analysis_results,
-                "comparison_analysis_kpis": compare_analysis_results
-            }
+        result = run_plan(plan)
+        return {**result, **delta} if delta else result
     except Exception as e:
         print(f"Home Summary Error: {e}")
         raise HTTPException(status_code=500, detail=f"Error generating home summary: {str(e)}")
@@ -323,10 +841,17 @@ async def get_kpis(start_date: Optional[date] = None, end_date: Optional[date] =
     return fetch_kpi_data(client, start_date, end_date, sizes, skus, line, stage, vendor, settings.BIGQUERY_PROJECT_ID, settings.BIGQUERY_DATASET_ID)
 
 @app.get("/charts")
-async def get_chart_data(start_date: Optional[date] = None, end_date: Optional[date] = None, sizes: Optional[List[str]] = Query(None, alias="size"), skus: Optional[List[str]] = Query(None, alias="sku"), date_column: str = 'vqc_inward_date', stage: Optional[str] = None, line: Optional[str] = None):
+async def get_chart_data(start_date: Optional[date] = None, end_date: Optional[date] = None, sizes: Optional[List[str]] = Query(None, alias="size"), skus: Optional[List[str]] = Query(None, alias="sku"), date_column: str = 'vqc_inward_date', stage: Optional[str] = None, line: Optional[str] = None, since: Optional[str] = None):
     if not client:
         raise HTTPException(status_code=500, detail="BigQuery client not initialized")
-    return fetch_wip_charts_data(client, start_date, end_date, sizes, skus, line, settings.BIGQUERY_PROJECT_ID, settings.BIGQUERY_DATASET_ID)
+    if since is None:
+        return fetch_wip_charts_data(client, start_date, end_date, sizes, skus, line, settings.BIGQUERY_PROJECT_ID, settings.BIGQUERY_DATASET_ID)
+    # The charts are per-SKU totals over the range: resent only if a day in it changed
+    days = delta_days(since, start_date, end_date)
+    if days is not None and not days:
+        return delta_info(since, days)
+    return {**fetch_wip_charts_data(client, start_date, end_date, sizes, skus, line, settings.BIGQUERY_PROJECT_ID, settings.BIGQUERY_DATASET_ID),
+            **delta_info(since, days)}
 
 @app.get("/skus")
 async def get_skus(table: str = 'master_station_data'):
@@ -391,21 +916,13 @@ async def get_last_updated():
     if not client:
         raise HTTPException(status_code=500, detail="BigQuery client not initialized")
     
+    # The watcher already holds the latest etl_metadata version
+    if data_events.etl_version is not None:
+        return {"last_updated_at": data_events.etl_version}
+
     # Updated to use etl_metadata table for more accurate sync tracking
-    metadata_table = f"`{settings.BIGQUERY_PROJECT_ID}.{settings.BIGQUERY_DATASET_ID}.etl_metadata`"
-    query = f"""
-        SELECT last_sync_attempt as last_updated 
-        FROM {metadata_table} 
-        WHERE status = 'SUCCESS' 
-        ORDER BY last_sync_attempt DESC 
-        LIMIT 1
-    """
     try:
-        job_config = QueryJobConfig(query_parameters=[])
-        query_job = client.query(query, job_config=job_config)
-        results = list(query_job.result())
-        last_updated = results[0]['last_updated'] if results and results[0]['last_updated'] else None
-        return {"last_updated_at": last_updated}
+        return {"last_updated_at": fetch_etl_version()}
     except Exception as e:
         # Fallback to MAX(last_updated_at) from main table if metadata table query fails
         print(f"Error querying etl_metadata: {e}. Falling back to master table.")
@@ -418,20 +935,44 @@ async def get_last_updated():
         except Exception as fallback_e:
             raise HTTPException(status_code=500, detail=f"Error querying BigQuery for last updated time: {fallback_e}")
 
+@app.get("/events")
+async def get_events():
+    # Server-Sent Events: `data-version` on connect, then `data-updated` with
+    # the new etl_metadata version after each ETL run
+    if not client:
+        raise HTTPException(status_code=500, detail="BigQuery client not initialized")
+    return StreamingResponse(data_events.stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/predict-serial")
 async def predict_serial(serial_number: str):
     if not client:
         raise HTTPException(status_code=500, detail="BigQuery client not initialized")
     
-    query = f"""
-    WITH input_data AS (
+    # Resolve the unit from the serial index when we can, so the prediction
+    # query doesn't have to scan the master table for a single key.
+    query_parameters = [ScalarQueryParameter("serial_number", "STRING", serial_number)]
+    known = serial_index.get(serial_number) if serial_index is not None and serial_index.ready else None
+    if known:
+        input_source = """
+        SELECT @vendor as vendor, @sku as sku, @size as size, @line as line, SUBSTR(@serial_number, 8, 3) as pcb,
+               EXTRACT(DAYOFWEEK FROM CURRENT_DATE()) as day_of_week,
+               EXTRACT(MONTH FROM CURRENT_DATE()) as month
+        """
+        for col in ('vendor', 'sku', 'size', 'line'):
+            query_parameters.append(ScalarQueryParameter(col, "STRING", known.get(col)))
+    else:
+        input_source = f"""
         SELECT vendor, sku, size, line, SUBSTR(serial_number, 8, 3) as pcb,
                EXTRACT(DAYOFWEEK FROM CURRENT_DATE()) as day_of_week,
                EXTRACT(MONTH FROM CURRENT_DATE()) as month
         FROM {TABLE}
         WHERE serial_number = @serial_number
         LIMIT 1
-    )
+        """
+
+    query = f"""
+    WITH input_data AS ({input_source})
     SELECT 
         (SELECT p.prob FROM ML.PREDICT(MODEL `{settings.BIGQUERY_PROJECT_ID}.{settings.BIGQUERY_DATASET_ID}.model_vqc_prediction`, (SELECT * FROM input_data)), UNNEST(predicted_is_vqc_rejected_probs) as p WHERE p.label = 1) as vqc_risk,
         (SELECT p.prob FROM ML.PREDICT(MODEL `{settings.BIGQUERY_PROJECT_ID}.{settings.BIGQUERY_DATASET_ID}.model_ft_prediction`, (SELECT * FROM input_data)), UNNEST(predicted_is_ft_rejected_probs) as p WHERE p.label = 1) as ft_risk,
@@ -439,9 +980,7 @@ async def predict_serial(serial_number: str):
     """
     
     try:
-        job_config = QueryJobConfig(query_parameters=[
-            ScalarQueryParameter("serial_number", "STRING", serial_number)
-        ])
+        job_config = QueryJobConfig(query_parameters=query_parameters)
         results = list(client.query(query, job_config=job_config).result())
         if not results or results[0]['vqc_risk'] is None:
             # Try to infer from SKU/Vendor if serial not found in master yet
@@ -478,12 +1017,54 @@ async def predict_serial(serial_number: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/kpi-data/{kpi_name}")
-async def get_kpi_data(kpi_name: str, page: int = 1, limit: int = 100, start_date: Optional[date] = None, end_date: Optional[date] = None, sizes: Optional[List[str]] = Query(None, alias="size"), skus: Optional[List[str]] = Query(None, alias="sku"), download: bool = False, date_column: str = 'vqc_inward_date', stage: Optional[str] = None, line: Optional[str] = None):
+@app.get("/serial/{serial_number}")
+async def get_serial(serial_number: str):
+    try:
+        row = lookup_serials([serial_number]).get(serial_number)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error looking up serial number: {e}")
+    if row is None:
+        raise HTTPException(status_code=404, detail="Serial number not found in master data")
+    return row
+
+@app.post("/serial/lookup")
+async def lookup_serial_numbers(request: SerialLookupRequest):
+    serial_numbers = list(dict.fromkeys(sn.strip() for sn in request.serial_numbers if sn and sn.strip()))
+    if len(serial_numbers) > SERIAL_LOOKUP_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {SERIAL_LOOKUP_MAX} serial numbers per lookup")
+    try:
+        found = lookup_serials(serial_numbers) if serial_numbers else {}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error looking up serial numbers: {e}")
+    return {
+        "data": [found[sn] for sn in serial_numbers if sn in found],
+        "missing": [sn for sn in serial_numbers if sn not in found],
+    }
+
+@app.get("/mo/{mo_number}")
+async def get_mo_summary(mo_number: str):
     if not client:
         raise HTTPException(status_code=500, detail="BigQuery client not initialized")
+    try:
+        rows = mo_index.get(mo_number)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading MO summary: {e}")
+    if not rows:
+        raise HTTPException(status_code=404, detail="MO number not found")
+    return {"mo_number": mo_number.strip(), "data": rows}
 
-    table_to_use = TABLE
+@app.get("/kpi-data/{kpi_name}")
+async def get_kpi_data(kpi_name: str, page: int = 1, limit: int = 100, start_date: Optional[date] = None, end_date: Optional[date] = None, sizes: Optional[List[str]] = Query(None, alias="size"), skus: Optional[List[str]] = Query(None, alias="sku"), download: bool = False, date_column: str = 'vqc_inward_date', stage: Optional[str] = None, line: Optional[str] = None, fields: Optional[List[str]] = Query(None)):
+    select_fields = resolve_fields(fields, download)
+    use_replica = replica is not None and replica.ready
+    if not client and not use_replica:
+        raise HTTPException(status_code=500, detail="BigQuery client not initialized")
+
+    table_to_use = REPLICA_TABLE if use_replica else TABLE
     sku_col = 'sku'
     size_col = 'size'
     date_col = date_column
@@ -518,12 +1099,10 @@ async def get_kpi_data(kpi_name: str, page: int = 1, limit: int = 100, start_dat
     else:
         full_where_clause = f"WHERE {kpi_where_condition}"
     
-    select_clause = "*"
+    select_clause = ", ".join(select_fields)
 
     offset = (page - 1) * limit
 
-    job_config = QueryJobConfig(query_parameters=query_parameters)
-
     if download:
         data_query = f"""
             SELECT {select_clause}
@@ -542,17 +1121,14 @@ async def get_kpi_data(kpi_name: str, page: int = 1, limit: int = 100, start_dat
 
     try:
         if download:
-            data_job = client.query(data_query, job_config=job_config)
-            data = [dict(row) for row in data_job.result()]
+            data = run_master_query(data_query, query_parameters, use_replica, download=True)
             return {"data": data}
         else:
             count_query = f"SELECT COUNT(DISTINCT serial_number) as total FROM {table_to_use} {full_where_clause}"
-            count_job = client.query(count_query, job_config=job_config)
-            total_rows = list(count_job.result())[0]['total']
+            total_rows = run_master_query(count_query, query_parameters, use_replica)[0]['total']
             total_pages = (total_rows + limit - 1) // limit
 
-            data_job = client.query(data_query, job_config=job_config)
-            data = [dict(row) for row in data_job.result()]
+            data = run_master_query(data_query, query_parameters, use_replica)
 
             return {
                 "data": data,
@@ -579,10 +1155,11 @@ async def search_data_get(
     end_date: Optional[date] = None,
     line: Optional[str] = None,
     download: bool = False,
+    fields: Optional[List[str]] = Query(None),
 ):
     return await execute_search(
         page, limit, serial_numbers, stage, vendor, vqc_status, 
-        rejection_reasons, mo_numbers, sizes, skus, start_date, end_date, line, download
+        rejection_reasons, mo_numbers, sizes, skus, start_date, end_date, line, download, fields
     )
 
 @app.post("/search")
@@ -591,7 +1168,7 @@ async def search_data_post(request: SearchRequest):
         request.page, request.limit, request.serial_numbers, request.stage, 
         request.vendor, request.vqc_status, request.rejection_reasons, 
         request.mo_numbers, request.sizes, request.skus, request.start_date, 
-        request.end_date, request.line, request.download
+        request.end_date, request.line, request.download, request.fields
     )
 
 async def execute_search(
@@ -609,12 +1186,11 @@ async def execute_search(
     end_date: Optional[date],
     line: Optional[str],
     download: bool,
+    fields: Optional[List[str]] = None,
 ):
-    if not client:
-        raise HTTPException(status_code=500, detail="BigQuery client not initialized")
+    select_fields = resolve_fields(fields, download)
 
-    # Determine Table and Date Column
-    table_to_use = TABLE
+    # Determine Date Column
     date_column = 'vqc_inward_date' # Default
     sku_column = 'sku'
     size_column = 'size'
@@ -623,7 +1199,33 @@ async def execute_search(
         date_column = 'ft_inward_date'
     elif stage == 'CS':
         date_column = 'cs_comp_date'
-    
+
+    # Serial-only searches are answered from the serial index without a query
+    only_serials = serial_numbers and not any([
+        start_date and end_date, vendor and vendor.lower() != 'all', vqc_status,
+        rejection_reasons, mo_numbers, sizes, skus, line,
+    ])
+    if only_serials and serial_index is not None and serial_index.ready:
+        sn_list = list(dict.fromkeys(sn.strip() for sn in serial_numbers.split(',') if sn.strip()))
+        rows = list(serial_index.get_many(sn_list).values())
+        # Same order as ORDER BY {date_column} DESC: newest first, NULLs last
+        rows.sort(key=lambda r: (r.get(date_column) is not None, r.get(date_column) or date.min), reverse=True)
+        rows = [{f: r.get(f) for f in select_fields} for r in rows]
+        if download:
+            return {"data": rows}
+        offset = (page - 1) * limit
+        return {
+            "data": rows[offset:offset + limit],
+            "total_pages": (len(rows) + limit - 1) // limit,
+            "current_page": page,
+            "total_records": len(rows)
+        }
+
+    use_replica = replica is not None and replica.ready
+    if not client and not use_replica:
+        raise HTTPException(status_code=500, detail="BigQuery client not initialized")
+    table_to_use = REPLICA_TABLE if use_replica else TABLE
+
     # Unified Query Construction
     conditions = []
     query_parameters = []
@@ -699,16 +1301,23 @@ async def execute_search(
     # Construct WHERE clause
     where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
 
-    select_clause = "*"
+    select_clause = ", ".join(select_fields)
+
+    # On the replica, resolve a serial number list through the index before
+    # sorting; otherwise DuckDB plans the ORDER BY as a full-width table scan.
+    data_prefix, data_source = "", f"FROM {table_to_use} {where_clause}"
+    if use_replica and any(p.name == "serial_numbers" for p in query_parameters):
+        data_prefix = f"WITH matched AS MATERIALIZED (SELECT * FROM {table_to_use} {where_clause})"
+        data_source = "FROM matched"
 
     # Pagination
     offset = (page - 1) * limit
 
     if download:
         data_query = f"""
+            {data_prefix}
             SELECT {select_clause}
-            FROM {table_to_use}
-            {where_clause}
+            {data_source}
             ORDER BY {date_column} DESC
         """
         # No LIMIT/OFFSET for download
@@ -718,9 +1327,9 @@ async def execute_search(
         
         # Data Query
         data_query = f"""
+            {data_prefix}
             SELECT {select_clause}
-            FROM {table_to_use}
-            {where_clause}
+            {data_source}
             ORDER BY {date_column} DESC
             LIMIT @limit OFFSET @offset
         """
@@ -729,21 +1338,16 @@ async def execute_search(
 
     try:
         if download:
-            job_config_data = QueryJobConfig(query_parameters=query_parameters)
-            data_job = client.query(data_query, job_config=job_config_data)
-            data = [dict(row) for row in data_job.result()]
+            data = run_master_query(data_query, query_parameters, use_replica, download=True)
             return {"data": data}
         else:
             # Execute Count
-            job_config_count = QueryJobConfig(query_parameters=[p for p in query_parameters if p.name not in ['limit', 'offset']])
-            count_job = client.query(count_query, job_config=job_config_count)
-            total_rows = list(count_job.result())[0]['total']
+            count_parameters = [p for p in query_parameters if p.name not in ['limit', 'offset']]
+            total_rows = run_master_query(count_query, count_parameters, use_replica)[0]['total']
             total_pages = (total_rows + limit - 1) // limit
 
             # Execute Data
-            job_config_data = QueryJobConfig(query_parameters=query_parameters)
-            data_job = client.query(data_query, job_config=job_config_data)
-            data = [dict(row) for row in data_job.result()]
+            data = run_master_query(data_query, query_parameters, use_replica)
 
             return {
                 "data": data,
@@ -0,0 +1,57 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# How often a lookup may check for a rebuilt mo_summary before reusing the
+# in-memory copy.
+MO_INDEX_CHECK_SECONDS = int(os.environ.get("MO_INDEX_CHECK_SECONDS", 60))
+
+
+def normalize_mo(mo_number: str) -> str:
+    return mo_number.strip().upper()
+
+
+# In-memory copy of the ETL-maintained mo_summary table keyed by MO number.
+# The table has one row per MO (and MO type), so the whole thing is loaded and
+# only reloaded once current_version reports that it has been rebuilt.
+class MOIndex:
+    def __init__(self, load_rows: Callable[[], List[dict]], current_version: Callable[[], object],
+                 check_seconds: int = MO_INDEX_CHECK_SECONDS):
+        self._load_rows = load_rows
+        self._current_version = current_version
+        self.check_seconds = check_seconds
+        self.version = None
+        self._rows: Optional[Dict[str, List[dict]]] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._rows is not None
+
+    def refresh(self, force: bool = False):
+        now = time.monotonic()
+        with self._lock:
+            if self.ready and not force and now - self._checked_at < self.check_seconds:
+                return
+            self._checked_at = now
+
+        version = self._current_version()
+        if self.ready and not force and version == self.version:
+            return
+
+        rows: Dict[str, List[dict]] = {}
+        for row in self._load_rows():
+            rows.setdefault(normalize_mo(row["mo_number"]), []).append(row)
+        with self._lock:
+            self._rows = rows
+            self.version = version
+        print(f"MO index loaded: {len(rows)} MO numbers (version={version})")
+
+    def get(self, mo_number: str) -> List[dict]:
+        self.refresh()
+        return self._rows.get(normalize_mo(mo_number), [])
+
+    def __len__(self):
+        return 0 if self._rows is None else len(self._rows)
@@ -0,0 +1,182 @@
+import os
+import re
+import glob
+import threading
+import time
+from datetime import datetime, date
+from typing import Optional, List
+
+from google.cloud.bigquery import ScalarQueryParameter, ArrayQueryParameter, QueryJobConfig
+
+from circuit_breaker import BQ_DOWNLOAD_TIMEOUT_SECONDS
+
+try:
+    import duckdb
+    import pyarrow.parquet as pq
+except ImportError:  # The replica is optional; without these we stay on BigQuery
+    duckdb = None
+    pq = None
+
+# Name the replica table is registered under inside DuckDB. Queries built for
+# BigQuery swap the master table reference for this one.
+REPLICA_TABLE = "master_station_data"
+
+# Number of delta files kept before they are folded back into a single snapshot
+REPLICA_MAX_PARTS = int(os.environ.get("REPLICA_MAX_PARTS", 24))
+
+_UNNEST_PARAM = re.compile(r"IN\s+UNNEST\(@(\w+)\)", re.IGNORECASE)
+_NAMED_PARAM = re.compile(r"@(\w+)")
+
+
+def replica_available() -> bool:
+    return duckdb is not None
+
+
+def _sql_literal(value) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def to_duckdb_query(sql: str, query_parameters: list):
+    # The search/drill-down queries only use a small BigQuery dialect surface:
+    # `x IN UNNEST(@list)` and `@name` parameters. Array parameters are inlined
+    # as literal IN lists, which DuckDB can answer from the serial number index
+    # instead of a semi-join; scalars stay bound parameters.
+    arrays = {p.name: list(p.values) for p in query_parameters if isinstance(p, ArrayQueryParameter)}
+    params = {}
+    for p in query_parameters:
+        if isinstance(p, ScalarQueryParameter):
+            value = p.value
+            if p.type_ == "DATE" and isinstance(value, str):
+                value = date.fromisoformat(value)
+            params[p.name] = value
+
+    def inline_array(match):
+        values = arrays[match.group(1)] or [None]
+        return "IN (" + ", ".join(_sql_literal(v) for v in values) + ")"
+
+    sql = _UNNEST_PARAM.sub(inline_array, sql)
+    sql = _NAMED_PARAM.sub(lambda m: f"${m.group(1)}", sql)
+    return sql, params
+
+
+def fetch_master_changes(client, table: str, since: Optional[datetime] = None):
+    # Everything changed since the watermark (or the whole table when there is
+    # none yet) as an Arrow table. Shared by every local copy of the master table.
+    # A full pull takes longer than a request query, so it gets the bulk timeout.
+    query = f"SELECT * FROM {table}"
+    query_parameters = []
+    if since is not None:
+        query += " WHERE last_updated_at > @since"
+        query_parameters.append(ScalarQueryParameter("since", "DATETIME", since))
+    job = client.query(query, job_config=QueryJobConfig(query_parameters=query_parameters))
+    job.result(timeout=BQ_DOWNLOAD_TIMEOUT_SECONDS)
+    return job.to_arrow()
+
+
+# Local copy of master_station_data kept as Parquet files on disk and queried
+# in-process through DuckDB. The directory holds one compacted snapshot plus
+# incremental delta files pulled by `last_updated_at`; the query table always
+# holds the latest version of each serial number.
+class MasterReplica:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.watermark: Optional[datetime] = None
+        self.synced_version = None
+        # time.monotonic() of the last rebuild from a full copy
+        self.loaded_at: Optional[float] = None
+        self._lock = threading.RLock()
+        self._con = None
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def ready(self) -> bool:
+        return self._con is not None
+
+    def _parts(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, "*.parquet")))
+
+    def load(self):
+        # Rebuild the in-memory table from whatever is already on disk
+        parts = self._parts()
+        if not parts:
+            return
+        con = duckdb.connect()
+        con.execute(f"""
+            CREATE TABLE {REPLICA_TABLE} AS
+            SELECT * EXCLUDE (_rn) FROM (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY serial_number ORDER BY last_updated_at DESC) AS _rn
+                FROM read_parquet($parts, union_by_name = true)
+            )
+            WHERE _rn = 1
+            ORDER BY vqc_inward_date
+        """, {"parts": parts})
+        # Sorted storage lets zone maps skip row groups on date filters; the ART
+        # index turns serial number lookups into point reads.
+        con.execute(f"CREATE INDEX idx_serial_number ON {REPLICA_TABLE} (serial_number)")
+        self._swap(con)
+
+    def _swap(self, con):
+        watermark = con.execute(f"SELECT MAX(last_updated_at) FROM {REPLICA_TABLE}").fetchone()[0]
+        # In-flight cursors keep the previous connection alive until they finish
+        with self._lock:
+            self._con = con
+            self.watermark = watermark
+            self.loaded_at = time.monotonic()
+
+    def apply_changes(self, changes, full: bool = False) -> int:
+        # Upsert a batch from fetch_master_changes by serial number. A full batch
+        # replaces the snapshot outright.
+        if changes.num_rows == 0 and not full:
+            return 0
+
+        stamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+        if full:
+            for path in self._parts():
+                os.remove(path)
+            pq.write_table(changes, os.path.join(self.directory, f"snapshot-{stamp}.parquet"))
+        else:
+            pq.write_table(changes, os.path.join(self.directory, f"delta-{stamp}.parquet"))
+
+        if full or not self.ready:
+            self.load()
+        else:
+            with self._lock:
+                cur = self._con.cursor()
+                cur.register("changes", changes)
+                cur.execute("BEGIN TRANSACTION")
+                cur.execute(f"DELETE FROM {REPLICA_TABLE} WHERE serial_number IN (SELECT serial_number FROM changes)")
+                cur.execute(f"INSERT INTO {REPLICA_TABLE} BY NAME SELECT * FROM changes")
+                cur.execute("COMMIT")
+                cur.unregister("changes")
+                self.watermark = cur.execute(f"SELECT MAX(last_updated_at) FROM {REPLICA_TABLE}").fetchone()[0]
+
+        if len(self._parts()) > REPLICA_MAX_PARTS:
+            self.compact()
+
+        print(f"Replica sync: {changes.num_rows} rows (watermark={self.watermark})")
+        return changes.num_rows
+
+    def sync(self, client, table: str, full: bool = False) -> int:
+        since = None if full else self.watermark
+        return self.apply_changes(fetch_master_changes(client, table, since), full=since is None)
+
+    def compact(self):
+        # Fold snapshot + deltas into a single snapshot file written from the live table
+        with self._lock:
+            old_parts = self._parts()
+            stamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+            path = os.path.join(self.directory, f"snapshot-{stamp}.parquet")
+            self._con.cursor().execute(f"COPY {REPLICA_TABLE} TO '{path}' (FORMAT PARQUET)")
+            for part in old_parts:
+                os.remove(part)
+
+    def query(self, sql: str, query_parameters: Optional[list] = None) -> List[dict]:
+        with self._lock:
+            cur = self._con.cursor()
+        result = cur.execute(*to_duckdb_query(sql, query_parameters or []))
+        columns = [d[0] for d in result.description]
+        return [dict(zip(columns, row)) for row in result.fetchall()]
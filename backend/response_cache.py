@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+# Whole responses kept for the current data version
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 500))
+# The fetch helpers fall back to empty results when a query fails, so entries
+# also expire; a failure is then not served for a whole ETL cycle.
+RESPONSE_CACHE_MAX_AGE_SECONDS = int(os.environ.get("RESPONSE_CACHE_MAX_AGE_SECONDS", 1800))
+# How old a response may be and still be served, flagged as stale, while it is
+# recomputed or while BigQuery is failing
+RESPONSE_CACHE_STALE_SECONDS = int(os.environ.get("RESPONSE_CACHE_STALE_SECONDS", 86400))
+# Recent requests remembered to pick the parameter sets worth pre-warming
+REQUEST_LOG_SIZE = int(os.environ.get("REQUEST_LOG_SIZE", 5000))
+
+
+def request_key(endpoint: str, params: dict) -> tuple:
+    # Lists (sizes, skus) are order-insensitive filters, so normalise them
+    items = []
+    for name, value in sorted(params.items()):
+        if isinstance(value, (list, tuple, set)):
+            value = tuple(sorted(str(v) for v in value))
+        items.append((name, value))
+    return (endpoint,) + tuple(items)
+
+
+# Responses of the dashboard's heavy endpoints keyed by their parameters and
+# tagged with the etl_metadata version they were computed for; an entry from an
+# older version (or older than max_age_seconds) is a miss. Every lookup is also
+# logged so the most requested parameter sets can be recomputed ahead of users
+# after each ETL run. A miss may still have a stale entry: the last good
+# response, kept until it is replaced or older than stale_seconds.
+class ResponseCache:
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, log_size: int = REQUEST_LOG_SIZE,
+                 max_age_seconds: int = RESPONSE_CACHE_MAX_AGE_SECONDS, stale_seconds: int = RESPONSE_CACHE_STALE_SECONDS):
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.stale_seconds = stale_seconds
+        self._entries: "OrderedDict[tuple, Tuple[object, float, object]]" = OrderedDict()
+        self._log: "deque[tuple]" = deque(maxlen=log_size)
+        self._counts: Counter = Counter()
+        self._params: Dict[tuple, Tuple[str, dict]] = {}
+        self._lock = threading.Lock()
+
+    def _record(self, key: tuple, endpoint: str, params: dict):
+        if len(self._log) == self._log.maxlen:
+            oldest = self._log[0]
+            self._counts[oldest] -= 1
+            if not self._counts[oldest]:
+                del self._counts[oldest]
+                del self._params[oldest]
+        self._log.append(key)
+        self._counts[key] += 1
+        self._params[key] = (endpoint, params)
+
+    def get(self, endpoint: str, params: dict, version, record: bool = True):
+        key = request_key(endpoint, params)
+        with self._lock:
+            if record:
+                self._record(key, endpoint, params)
+            entry = self._entries.get(key)
+            if version is None or entry is None or entry[0] != version:
+                return None
+            if time.monotonic() - entry[1] > self.max_age_seconds:
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def get_stale(self, endpoint: str, params: dict) -> Optional[Tuple[object, float]]:
+        # (response, age in seconds) of the last good response, whatever its version
+        with self._lock:
+            entry = self._entries.get(request_key(endpoint, params))
+            if entry is None:
+                return None
+            age = time.monotonic() - entry[1]
+            return None if age > self.stale_seconds else (entry[2], age)
+
+    def put(self, endpoint: str, params: dict, version, value):
+        if version is None:
+            return
+        with self._lock:
+            self._entries[request_key(endpoint, params)] = (version, time.monotonic(), value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def top_requests(self, k: int) -> List[Tuple[str, dict]]:
+        with self._lock:
+            return [self._params[key] for key, _ in self._counts.most_common(k)]
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,110 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Only the most recent days are still being written by the ETL. Anything older
+# than the hot window is treated as closed and its per-day partial is cached
+# until evicted; hot days are always re-fetched from BigQuery.
+SEGMENT_CACHE_HOT_DAYS = int(os.environ.get("SEGMENT_CACHE_HOT_DAYS", 3))
+SEGMENT_CACHE_MAX_ENTRIES = int(os.environ.get("SEGMENT_CACHE_MAX_ENTRIES", 200000))
+
+# Marker for a closed day that had no rows, so it is not fetched again
+_EMPTY = object()
+
+
+def segment_key(*parts) -> tuple:
+    # Lists (sizes, skus) are order-insensitive filters, so normalise them
+    key = []
+    for part in parts:
+        if isinstance(part, (list, tuple, set)):
+            key.append(tuple(sorted(str(p) for p in part)))
+        else:
+            key.append(part)
+    return tuple(key)
+
+
+class SegmentCache:
+    def __init__(self, hot_days: int = SEGMENT_CACHE_HOT_DAYS, max_entries: int = SEGMENT_CACHE_MAX_ENTRIES):
+        self.hot_days = hot_days
+        self.max_entries = max_entries
+        self._segments: "OrderedDict[tuple, object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_closed(self, day: date, today: Optional[date] = None) -> bool:
+        today = today or date.today()
+        return day < today - timedelta(days=self.hot_days)
+
+    def fetch(self, namespace: str, key: tuple, start_date: date, end_date: date,
+              fetch_range: Callable[[date, date], Dict[date, object]]) -> Dict[date, object]:
+        # Returns {day: partial} for every day in [start_date, end_date].
+        # fetch_range(lo, hi) returns the partials for that range keyed by day;
+        # days without data are simply absent and come back as None.
+        days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+        partials = {}
+        missing = []
+
+        with self._lock:
+            for day in days:
+                cache_key = (namespace, key, day)
+                if cache_key in self._segments:
+                    self._segments.move_to_end(cache_key)
+                    value = self._segments[cache_key]
+                    partials[day] = None if value is _EMPTY else value
+                else:
+                    missing.append(day)
+
+        if missing:
+            # One query per run of consecutive missing days (usually just the
+            # hot window), so days cached between runs are not read again
+            fetched = {}
+            for lo, hi in missing_runs(missing):
+                fetched.update(fetch_range(lo, hi))
+            today = date.today()
+            with self._lock:
+                for day in missing:
+                    value = fetched.get(day)
+                    partials[day] = value
+                    if self.is_closed(day, today):
+                        self._segments[(namespace, key, day)] = _EMPTY if value is None else value
+                while len(self._segments) > self.max_entries:
+                    self._segments.popitem(last=False)
+
+        return partials
+
+    def invalidate(self, days: Optional[Iterable[date]] = None):
+        with self._lock:
+            if days is None:
+                self._segments.clear()
+                return
+            days = set(days)
+            for cache_key in [k for k in self._segments if k[2] in days]:
+                del self._segments[cache_key]
+
+    def __len__(self):
+        return len(self._segments)
+
+
+def missing_runs(days: List[date]) -> List[Tuple[date, date]]:
+    # (first, last) of each run of consecutive days in the sorted `days`
+    runs = []
+    for day in days:
+        if runs and day - runs[-1][1] == timedelta(days=1):
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+    return runs
+
+
+def sum_segments(partials: Iterable[Optional[dict]], keys: List[str]) -> dict:
+    totals = {k: 0 for k in keys}
+    for partial in partials:
+        if not partial:
+            continue
+        for k in keys:
+            totals[k] += partial.get(k) or 0
+    return totals
+
+
+segment_cache = SegmentCache()
@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+try:
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # The index is optional; without these lookups go to BigQuery
+    np = None
+    pa = None
+    pc = None
+
+# Changed rows are kept in an in-memory overlay and folded into the sorted file
+# once the overlay grows past this many serials.
+SERIAL_INDEX_MAX_DELTA = int(os.environ.get("SERIAL_INDEX_MAX_DELTA", 50000))
+
+
+def serial_index_available() -> bool:
+    return pa is not None and np is not None
+
+
+# Serial-keyed index over master_station_data. The base is an uncompressed Arrow
+# IPC file sorted by serial_number and memory-mapped, plus a fixed-width key
+# array searched with np.searchsorted, so a lookup is a binary search and a row
+# take regardless of table size. Rows changed by later ETL runs sit in an
+# overlay dict until the next compaction.
+class SerialIndex:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.watermark: Optional[datetime] = None
+        self.synced_version = None
+        # time.monotonic() of the last rebuild from a full copy
+        self.loaded_at: Optional[float] = None
+        self._table = None
+        self._keys = None
+        self._delta: Dict[str, dict] = {}
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def ready(self) -> bool:
+        return self._table is not None
+
+    @property
+    def _data_path(self) -> str:
+        return os.path.join(self.directory, "serial_index.arrow")
+
+    @property
+    def _keys_path(self) -> str:
+        return os.path.join(self.directory, "serial_keys.npy")
+
+    def load(self):
+        if not (os.path.exists(self._data_path) and os.path.exists(self._keys_path)):
+            return
+        table = pa.ipc.open_file(pa.memory_map(self._data_path)).read_all()
+        keys = np.load(self._keys_path, mmap_mode="r")
+        watermark = pc.max(table["last_updated_at"]).as_py() if table.num_rows else None
+        with self._lock:
+            self._table = table
+            self._keys = keys
+            self._delta = {}
+            self.watermark = watermark
+            self.loaded_at = time.monotonic()
+
+    def _write(self, table):
+        table = table.sort_by("serial_number").combine_chunks()
+        keys = np.array([s.encode() for s in table["serial_number"].to_pylist()])
+
+        data_tmp, keys_tmp = self._data_path + ".tmp", self._keys_path + ".tmp.npy"
+        with pa.OSFile(data_tmp, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        np.save(keys_tmp, keys)
+        os.replace(data_tmp, self._data_path)
+        os.replace(keys_tmp, self._keys_path)
+
+    def apply_changes(self, changes, full: bool = False) -> int:
+        if full or not self.ready:
+            self._write(changes)
+            self.load()
+            return changes.num_rows
+
+        with self._lock:
+            for row in changes.to_pylist():
+                self._delta[row["serial_number"]] = row
+            if changes.num_rows:
+                latest = pc.max(changes["last_updated_at"]).as_py()
+                if self.watermark is None or (latest and latest > self.watermark):
+                    self.watermark = latest
+            needs_compaction = len(self._delta) > SERIAL_INDEX_MAX_DELTA
+
+        if needs_compaction:
+            self.compact()
+        return changes.num_rows
+
+    def compact(self):
+        with self._lock:
+            base, delta = self._table, dict(self._delta)
+        if not delta:
+            return
+        delta_table = pa.Table.from_pylist(list(delta.values()), schema=base.schema)
+        keep = pc.invert(pc.is_in(base["serial_number"], value_set=pa.array(list(delta), type=pa.string())))
+        self._write(pa.concat_tables([base.filter(keep), delta_table]))
+
+        table = pa.ipc.open_file(pa.memory_map(self._data_path)).read_all()
+        keys = np.load(self._keys_path, mmap_mode="r")
+        with self._lock:
+            self._table, self._keys = table, keys
+            # Keep anything that changed again while the new file was written
+            self._delta = {k: v for k, v in self._delta.items() if delta.get(k) is not v}
+
+    def get_many(self, serial_numbers: Iterable[str]) -> Dict[str, dict]:
+        serial_numbers = list(serial_numbers)
+        with self._lock:
+            table, keys, delta = self._table, self._keys, self._delta
+            found = {sn: delta[sn] for sn in serial_numbers if sn in delta}
+
+        pending = [sn for sn in serial_numbers if sn not in found]
+        if table is None or not pending or len(keys) == 0:
+            return found
+
+        # Keys longer than the stored width can't match and would be truncated by the cast
+        encoded = [sn.encode() for sn in pending]
+        encoded = [e for e in encoded if len(e) <= keys.dtype.itemsize]
+        if not encoded:
+            return found
+        wanted = np.array(encoded, dtype=keys.dtype)
+        positions = np.searchsorted(keys, wanted)
+        positions = np.minimum(positions, len(keys) - 1)
+        hits = positions[keys[positions] == wanted]
+
+        for row in table.take(pa.array(hits, type=pa.int64())).to_pylist():
+            found.setdefault(row["serial_number"], row)
+        return found
+
+    def get(self, serial_number: str) -> Optional[dict]:
+        return self.get_many([serial_number]).get(serial_number)
+
+    def __len__(self):
+        return 0 if self._table is None else self._table.num_rows
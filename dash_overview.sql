@@ -46,18 +46,6 @@ CREATE OR REPLACE TABLE `production-dashboard-482014.dashboard_data.dash_overvie
             UPPER(cs_status) = 'REJECTED'
         ) AS total_rejection,
         
-        COUNTIF(vendor = '3DE TECH' AND (
-            UPPER(vqc_status) IN ('SCRAP', 'WABI SABI', 'RT CONVERSION') OR 
-            UPPER(ft_status) IN ('REJECTED', 'AESTHETIC SCRAP', 'FUNCTIONAL BUT REJECTED', 'SCRAP', 'SHELL RELATED', 'WABI SABI', 'FUNCTIONAL REJECTION') OR
-            UPPER(cs_status) = 'REJECTED'
-        )) AS `3de_tech_rejection`,
-        
-        COUNTIF(vendor = 'IHC' AND (
-            UPPER(vqc_status) IN ('SCRAP', 'WABI SABI', 'RT CONVERSION') OR 
-            UPPER(ft_status) IN ('REJECTED', 'AESTHETIC SCRAP', 'FUNCTIONAL BUT REJECTED', 'SCRAP', 'SHELL RELATED', 'WABI SABI', 'FUNCTIONAL REJECTION') OR
-            UPPER(cs_status) = 'REJECTED'
-        )) AS ihc_rejection,
-        
         -- Individual stage rejection counts for that cohort
         COUNTIF(UPPER(vqc_status) IN ('SCRAP', 'WABI SABI', 'RT CONVERSION')) AS vqc_rejection,
         COUNTIF(UPPER(ft_status) IN ('REJECTED', 'AESTHETIC SCRAP', 'FUNCTIONAL BUT REJECTED', 'SCRAP', 'SHELL RELATED', 'WABI SABI', 'FUNCTIONAL REJECTION')) AS ft_rejection,
@@ -0,0 +1,199 @@
+# =============================================================================
+# backtest.py — Walk-forward backtest of the yield ensemble, offline
+# Run: python backtest.py --cutoffs 4 --step 7
+#      python backtest.py --parquet master_fixture.parquet --set RF_WEIGHT=0.7 --set XGB_WEIGHT=0.3
+#
+# For each cutoff day, trains on the unit rows up to it (engineer_features →
+# encode_categoricals → train_yield_models), forecasts the next FORECAST_DAYS
+# with build_forecast, and scores the forecast yield against what each combo
+# actually did on those days. Cutoffs run in parallel, one fresh process each,
+# so the reported peak RSS is per cutoff. Exits non-zero when the yield
+# interval covers far fewer actual yields than PREDICTION_INTERVAL.
+#
+# Data is a Parquet file shaped like the load_data query (event_date, line, sku,
+# size, vendor, *_status, *_reason), or the bench_memory synthetic rows.
+# =============================================================================
+
+import argparse
+import ast
+import multiprocessing
+import os
+import resource
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import config
+import train
+from orchestrator import StageTimer, run_job
+
+STEPS = ["load", "features", "encode", "train", "forecast", "score"]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def apply_overrides(overrides: dict):
+    for name, value in overrides.items():
+        if not hasattr(config, name):
+            raise ValueError(f"Unknown config setting: {name}")
+        setattr(config, name, value)
+
+
+def read_rows(path: str, start, end) -> pd.DataFrame:
+    table = pq.read_table(path)
+    days = pc.cast(table["event_date"], pa.date32())
+    keep = pc.and_(pc.greater_equal(days, pa.scalar(start, pa.date32())),
+                   pc.less_equal(days, pa.scalar(end, pa.date32())))
+    return train.arrow_batches_to_frame(table.filter(keep).to_batches(), train.CATEGORICAL_COLS)
+
+
+def actual_yield(rows: pd.DataFrame) -> pd.DataFrame:
+    # Per combo-day yield over the horizon, at the grain the ensemble predicts
+    rows = rows.assign(is_accepted=(rows["cs_status"] == "ACCEPTED").astype(np.int8))
+    actual = (
+        rows.groupby(["event_date", "sku", "vendor", "size", "line"], observed=True)["is_accepted"]
+        .agg(["sum", "count"])
+        .reset_index()
+    )
+    actual["actual_yield"] = actual["sum"] / actual["count"]
+    actual["forecast_date"] = pd.to_datetime(actual["event_date"]).dt.date
+    for col in ["sku", "vendor", "size", "line"]:
+        actual[col] = actual[col].astype(str)
+    return actual[["forecast_date", "sku", "vendor", "size", "line", "actual_yield"]]
+
+
+def run_cutoff(path: str, cutoff: str, train_days, threads: int, overrides: dict):
+    apply_overrides(overrides)
+    cutoff_day = pd.Timestamp(cutoff).date()
+    horizon_end = cutoff_day + timedelta(days=config.FORECAST_DAYS)
+    start = cutoff_day - timedelta(days=train_days - 1) if train_days else pd.Timestamp(config.TRAIN_START_DATE).date()
+    # build_forecast forecasts the days after TRAIN_END_DATE
+    config.TRAIN_END_DATE = cutoff_day.isoformat()
+
+    timer = StageTimer()
+    with timer.stage("load"):
+        rows = read_rows(path, start, horizon_end)
+        in_train = pd.to_datetime(rows["event_date"]).dt.date <= cutoff_day
+        future = actual_yield(rows[~in_train])
+        df = rows[in_train].reset_index(drop=True)
+        del rows
+    with timer.stage("features"):
+        df, batch_daily = train.engineer_features(df)
+    with timer.stage("encode"):
+        df, encoders = train.encode_categoricals(df)
+    with timer.stage("train"):
+        final, _, yield_features, daily = train.train_yield_models(df)
+        models = {job.name: run_job(job, threads)[1] for job in final}
+        offset = train.interval_offset(models.get("xgb_quantile_cal"), daily, yield_features)
+    with timer.stage("forecast"):
+        forecast = train.build_forecast(df, batch_daily, models["rf"], models["xgb"], models["xgb_quantile"], offset,
+                                        None, None, yield_features, None, encoders)
+    with timer.stage("score"):
+        scored = forecast.merge(future, on=["forecast_date", "sku", "vendor", "size", "line"], how="inner")
+        scored["horizon"] = (pd.to_datetime(scored["forecast_date"]) - pd.Timestamp(cutoff_day)).dt.days
+        scored["error"] = (scored["forecasted_yield_rate"] - scored["actual_yield"]).abs()
+        scored["covered"] = scored["actual_yield"].between(scored["yield_lower"], scored["yield_upper"])
+        mae = scored.groupby("horizon")["error"].mean()
+
+    return {
+        "cutoff": cutoff_day.isoformat(),
+        "train_rows": len(df),
+        "scored": len(scored),
+        "mae": float(scored["error"].mean()) if len(scored) else float("nan"),
+        "mae_by_day": {int(h): float(v) for h, v in mae.items()},
+        "coverage": float(scored["covered"].mean()) if len(scored) else float("nan"),
+        "seconds": timer.seconds,
+        "peak_rss": peak_rss_mb(),
+    }
+
+
+def write_synthetic(rows: int, path: str):
+    from bench_memory import synthetic_batches
+    batches = list(synthetic_batches(rows))
+    pq.write_table(pa.Table.from_batches(batches), path)
+
+
+def parse_overrides(pairs):
+    overrides = {}
+    for pair in pairs or []:
+        name, _, value = pair.partition("=")
+        try:
+            overrides[name] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            overrides[name] = value
+    return overrides
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the yield ensemble.")
+    parser.add_argument("--parquet", help="unit-row fixture; synthetic rows when omitted")
+    parser.add_argument("--rows", type=int, default=500_000, help="synthetic rows")
+    parser.add_argument("--cutoffs", type=int, default=4)
+    parser.add_argument("--step", type=int, default=7, help="days between cutoffs")
+    parser.add_argument("--train-days", type=int, help="trailing training window (default: all data before the cutoff)")
+    parser.add_argument("--workers", type=int, help="cutoffs run at once (default: one per cutoff, capped at cores)")
+    parser.add_argument("--set", action="append", metavar="NAME=VALUE", help="config override, e.g. RF_WEIGHT=0.7")
+    parser.add_argument("--min-coverage", type=float,
+                        help="fail when mean interval coverage is below this (default: PREDICTION_INTERVAL - 0.1)")
+    args = parser.parse_args()
+
+    overrides = parse_overrides(args.set)
+    apply_overrides(overrides)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.parquet
+        if path is None:
+            path = os.path.join(tmp, "synthetic.parquet")
+            write_synthetic(args.rows, path)
+
+        last_day = pc.max(pc.cast(pq.read_table(path, columns=["event_date"])["event_date"], pa.date32())).as_py()
+        last_cutoff = last_day - timedelta(days=config.FORECAST_DAYS)
+        cutoffs = [(last_cutoff - timedelta(days=i * args.step)).isoformat() for i in reversed(range(args.cutoffs))]
+
+        cores = os.cpu_count() or 1
+        workers = max(1, min(args.workers or len(cutoffs), cores))
+        threads = max(1, cores // workers)
+        print(f"[BACKTEST] {len(cutoffs)} cutoffs on {workers} worker(s) × {threads} thread(s)"
+              f"{' with ' + str(overrides) if overrides else ''}")
+
+        # A fresh process per cutoff keeps each peak RSS reading separate
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, max_tasks_per_child=1) as pool:
+            futures = [pool.submit(run_cutoff, path, cutoff, args.train_days, threads, overrides)
+                       for cutoff in cutoffs]
+            results = [future.result() for future in futures]
+
+    horizon = range(1, config.FORECAST_DAYS + 1)
+    print(f"\n{'cutoff':10} {'rows':>9} {'MAE':>7} {'cover':>6} " + " ".join(f"{'d' + str(h):>6}" for h in horizon)
+          + " " + " ".join(f"{step:>8}" for step in STEPS) + f" {'peak RSS':>9}")
+    for r in results:
+        print(f"{r['cutoff']:10} {r['train_rows']:>9,} {r['mae']:>7.4f} {r['coverage']:>6.1%} "
+              + " ".join(f"{r['mae_by_day'].get(h, float('nan')):>6.4f}" for h in horizon)
+              + " " + " ".join(f"{r['seconds'][step]:>7.1f}s" for step in STEPS)
+              + f" {r['peak_rss']:>7.0f}MB")
+
+    mean_by_day = [np.nanmean([r["mae_by_day"].get(h, np.nan) for r in results]) for h in horizon]
+    print(f"{'mean':10} {'':>9} {np.nanmean([r['mae'] for r in results]):>7.4f} "
+          f"{np.nanmean([r['coverage'] for r in results]):>6.1%} "
+          + " ".join(f"{v:>6.4f}" for v in mean_by_day)
+          + " " + " ".join(f"{np.mean([r['seconds'][step] for r in results]):>7.1f}s" for step in STEPS)
+          + f" {max(r['peak_rss'] for r in results):>7.0f}MB")
+
+    coverage = np.nanmean([r["coverage"] for r in results])
+    min_coverage = args.min_coverage if args.min_coverage is not None else config.PREDICTION_INTERVAL - 0.1
+    if not coverage >= min_coverage:
+        raise SystemExit(f"[BACKTEST] Interval coverage {coverage:.1%} is below {min_coverage:.0%} "
+                         f"(nominal {config.PREDICTION_INTERVAL:.0%})")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,124 @@
+# =============================================================================
+# bench_inference.py — Native vs compact (array) tree ensembles
+# Run: python bench_inference.py --rows 500000
+#      python bench_inference.py --version v0003      (a registered model version)
+#
+# Trains the yield RF + XGB and the reason classifier on the bench_memory
+# synthetic rows (or takes them from the model registry), exports them with
+# compact_trees, then in a fresh process per mode measures cold-start load
+# time, resident memory added by loading and by scoring, and yield-ensemble
+# rows/sec. The compact run also reports its largest deviation from the native
+# predictions, for the ensemble and for the quantile model's interval bounds.
+# =============================================================================
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+import config
+import train
+from compact_trees import export_ensemble, load_ensemble
+from orchestrator import run_job
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def ensemble(rf_pred, xgb_pred):
+    return config.RF_WEIGHT * rf_pred + config.XGB_WEIGHT * xgb_pred
+
+
+def run_mode(mode: str, directory: str):
+    X = np.load(os.path.join(directory, "X.npy"))
+    baseline_rss = rss_mb()
+
+    started = time.perf_counter()
+    if mode == "native":
+        models = joblib.load(os.path.join(directory, "models.joblib"))
+    else:
+        models = load_ensemble(os.path.join(directory, "compact"))
+    load_seconds = time.perf_counter() - started
+    loaded_rss = rss_mb() - baseline_rss
+
+    started = time.perf_counter()
+    predicted = ensemble(models["rf"].predict(X), models["xgb"].predict(X))
+    rows_per_sec = len(X) / (time.perf_counter() - started)
+
+    deviation = ""
+    if mode == "compact":
+        native = np.load(os.path.join(directory, "native_pred.npy"))
+        deviation = f" max_diff={np.abs(predicted - native).max():.2e}"
+        if "xgb_quantile" in models:
+            bounds = np.load(os.path.join(directory, "native_bounds.npy"))
+            deviation += f" interval_max_diff={np.abs(models['xgb_quantile'].predict(X) - bounds).max():.2e}"
+    print(f"RESULT {mode} load={load_seconds:.2f}s loaded_rss={loaded_rss:.0f}MB "
+          f"scored_rss={rss_mb() - baseline_rss:.0f}MB rows_per_sec={rows_per_sec:,.0f}"
+          f"{deviation}")
+
+
+def prepare(directory: str, rows: int, version):
+    if version:
+        models = joblib.load(os.path.join(config.MODEL_REGISTRY_DIR, version, "models.joblib"))
+    else:
+        from bench_memory import synthetic_batches
+        df = train.arrow_batches_to_frame(synthetic_batches(rows), train.CATEGORICAL_COLS)
+        df, _ = train.engineer_features(df)
+        df, _ = train.encode_categoricals(df)
+        yield_final, _, yield_features, _ = train.train_yield_models(df)
+        clf_final, _, le_reason, clf_features = train.train_rejection_classifier(df)
+        models = {job.name: run_job(job, os.cpu_count() or 1)[1] for job in yield_final + clf_final}
+        models.update(le_reason=le_reason, yield_features=yield_features, clf_features=clf_features)
+    joblib.dump(models, os.path.join(directory, "models.joblib"))
+    export_ensemble(models, os.path.join(directory, "compact"))
+
+    # Score the forecast-sized grid many times over: random rows in the training range
+    rng = np.random.default_rng(0)
+    n_features = len(models["yield_features"])
+    X = rng.random((200_000, n_features)) * 50
+    np.save(os.path.join(directory, "X.npy"), X)
+    np.save(os.path.join(directory, "native_pred.npy"),
+            ensemble(models["rf"].predict(X), models["xgb"].predict(X)))
+    if "xgb_quantile" in models:
+        np.save(os.path.join(directory, "native_bounds.npy"), models["xgb_quantile"].predict(X))
+    native_mb = os.path.getsize(os.path.join(directory, "models.joblib")) / 1e6
+    compact_mb = sum(os.path.getsize(os.path.join(root, name))
+                     for root, _, names in os.walk(os.path.join(directory, "compact")) for name in names) / 1e6
+    return native_mb, compact_mb
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--version", help="registered model version to benchmark instead of training")
+    parser.add_argument("--mode", choices=["native", "compact"], help=argparse.SUPPRESS)
+    parser.add_argument("--dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.dir)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        native_mb, compact_mb = prepare(directory, args.rows, args.version)
+        print(f"\non disk: native {native_mb:.1f}MB, compact {compact_mb:.1f}MB")
+        print(f"{'mode':8} {'load':>7} {'RSS loaded':>11} {'RSS scored':>11} {'rows/sec':>12} {'max diff':>9} "
+              f"{'interval diff':>13}")
+        for mode in ["native", "compact"]:
+            out = subprocess.run([sys.executable, __file__, "--mode", mode, "--dir", directory],
+                                 capture_output=True, text=True, check=True).stdout
+            result = dict(part.split("=") for part in out.split("RESULT ", 1)[1].split()[1:])
+            print(f"{mode:8} {result['load']:>7} {result['loaded_rss']:>11} {result['scored_rss']:>11} "
+                  f"{result['rows_per_sec']:>12} {result.get('max_diff', ''):>9} "
+                  f"{result.get('interval_max_diff', ''):>13}")
+
+
+if __name__ == "__main__":
+    main_cli()
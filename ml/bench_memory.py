@@ -0,0 +1,107 @@
+# =============================================================================
+# bench_memory.py — Peak RSS of data loading + feature engineering
+# Run: python bench_memory.py --rows 5000000
+#
+# Builds a synthetic master_station_data window as Arrow record batches (the
+# shape the Storage Read API returns), then in a fresh process per mode loads
+# it either as plain string columns (what `to_dataframe()` produced) or through
+# train.arrow_batches_to_frame (categoricals), runs engineer_features and
+# encode_categoricals, and reports the peak resident set size.
+# =============================================================================
+
+import argparse
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pyarrow as pa
+
+import config
+import train
+
+BATCH_ROWS = 100_000
+
+SKUS     = [f"SKU{i:03d}" for i in range(60)]
+VENDORS  = ["3DE TECH", "IHC"]
+SIZES    = [str(s) for s in range(5, 15)]
+LINES    = ["PRODUCTION", "RT"]
+REASONS  = ["MICRO BUBBLES", "DENT ON RESIN", "SIDE SCRATCH", "BLACK GLUE",
+            "NOT CHARGING", "BATTERY ISSUE", "SENSOR ISSUE", "SCRATCHES ON SHELL"]
+
+
+def synthetic_batches(rows: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    start = np.datetime64(config.TRAIN_START_DATE)
+    span = (np.datetime64(config.TRAIN_END_DATE) - start).astype(int) + 1
+
+    def pick(values, idx, mask=None):
+        return pa.array(np.asarray(values, dtype=object)[idx], mask=mask, type=pa.string())
+
+    for offset in range(0, rows, BATCH_ROWS):
+        n = min(BATCH_ROWS, rows - offset)
+        # Rows arrive in inward-date order, as the query's ORDER BY returns them
+        days = (np.arange(offset, offset + n) * span // rows).astype("timedelta64[D]")
+        u = rng.random(n)
+        vqc_rej = u < 0.07
+        ft_rej  = u > 0.95
+        pending = rng.random(n) < 0.1
+        yield pa.RecordBatch.from_arrays([
+            pa.array(start + days, type=pa.date32()),
+            pick(LINES, rng.integers(0, len(LINES), n)),
+            pick(SKUS, rng.integers(0, len(SKUS), n)),
+            pick(SIZES, rng.integers(0, len(SIZES), n)),
+            pick(VENDORS, rng.integers(0, len(VENDORS), n)),
+            pick(["ACCEPTED", "SCRAP"], vqc_rej.astype(int)),
+            pick(["ACCEPTED", "REJECTED"], ft_rej.astype(int), mask=vqc_rej),
+            pick(["ACCEPTED"], np.zeros(n, dtype=int), mask=vqc_rej | ft_rej | pending),
+            pick(REASONS, rng.integers(0, 4, n), mask=~vqc_rej),
+            pick(REASONS, rng.integers(4, 7, n), mask=~ft_rej),
+            pick(REASONS, np.full(n, 7), mask=np.ones(n, dtype=bool)),
+        ], names=["event_date", "line", "sku", "size", "vendor", "vqc_status", "ft_status",
+                  "cs_status", "vqc_reason", "ft_reason", "cs_reason"])
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_mode(mode: str, rows: int):
+    started = time.perf_counter()
+    batches = synthetic_batches(rows)
+    if mode == "strings":
+        df = pa.Table.from_batches(batches).to_pandas()
+        for col in train.CATEGORICAL_COLS & set(df.columns):
+            df[col] = df[col].astype(object)
+    else:
+        df = train.arrow_batches_to_frame(batches, train.CATEGORICAL_COLS)
+    loaded_mb = df.memory_usage(deep=True).sum() / 1e6
+
+    df, _ = train.engineer_features(df)
+    df, _ = train.encode_categoricals(df)
+    print(f"RESULT {mode} frame={loaded_mb:.0f}MB peak_rss={peak_rss_mb():.0f}MB "
+          f"time={time.perf_counter() - started:.1f}s")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--mode", choices=["strings", "categorical"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.rows)
+        return
+
+    print(f"{'mode':12} {'loaded frame':>13} {'peak RSS':>10} {'time':>7}")
+    for mode in ["strings", "categorical"]:
+        out = subprocess.run([sys.executable, __file__, "--rows", str(args.rows), "--mode", mode],
+                             capture_output=True, text=True, check=True).stdout
+        result = dict(part.split("=") for part in out.split("RESULT ", 1)[1].split()[1:])
+        print(f"{mode:12} {result['frame']:>13} {result['peak_rss']:>10} {result['time']:>7}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,218 @@
+# =============================================================================
+# compact_trees.py — Array-based tree ensembles for fast load and inference
+#
+# A fitted RandomForestRegressor / RandomForestClassifier / XGBRegressor
+# (including multi-quantile ones) is flattened into one set of contiguous node arrays shared by all its trees.
+# Nodes are laid out level by level so the two children of a node are always
+# adjacent (right = left + 1):
+#
+#   feature    int32    split feature
+#   threshold  float32  split value; NaN at leaves, so no comparison moves past them
+#   left       int32    left child (absolute index); a leaf points at itself
+#   default    bool     whether a missing value goes left (always at leaves)
+#   value      float64  leaf value, one column per output (class probabilities,
+#                       quantiles; an XGBoost tree fills only its own column)
+#   roots      int32    root node of each tree
+#
+# Each array is saved as its own .npy so load() can memory-map it. predict()
+# walks every tree for a batch of rows at once with NumPy fancy indexing.
+# =============================================================================
+
+import json
+import os
+
+import numpy as np
+
+ARRAYS = ["feature", "threshold", "left", "default", "value", "roots"]
+# Tree ensembles in the registry's model dict; xgb_quantile has one output per
+# interval bound
+ENSEMBLES = ["rf", "xgb", "xgb_quantile", "clf"]
+
+# Rows per batch are chosen so the (rows × trees × outputs) leaf values stay
+# around this many elements
+BATCH_ELEMENTS = 4_000_000
+
+
+def _float32_floor(threshold):
+    # sklearn splits between float32 values with a float64 threshold; for a
+    # float32 x, x <= t exactly when x <= the largest float32 not above t
+    rounded = threshold.astype(np.float32)
+    too_high = rounded.astype(np.float64) > threshold
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+def _pack(feature, threshold, left, right, default, value, roots):
+    # Renumber nodes level by level (siblings adjacent) and point leaves at themselves
+    order, level, depth = [], np.asarray(roots, dtype=np.int64), 0
+    while len(level):
+        order.append(level)
+        internal = level[left[level] >= 0]
+        level = np.stack([left[internal], right[internal]], axis=1).ravel()
+        depth += bool(len(level))
+    order = np.concatenate(order)
+    new_id = np.empty(len(feature), dtype=np.int64)
+    new_id[order] = np.arange(len(order))
+
+    is_leaf = left[order] < 0
+    arrays = {
+        "feature":   np.where(is_leaf, 0, feature[order]).astype(np.int32),
+        "threshold": np.where(is_leaf, np.float32(np.nan), threshold[order]).astype(np.float32),
+        "left":      np.where(is_leaf, np.arange(len(order)), new_id[np.maximum(left[order], 0)]).astype(np.int32),
+        "default":   np.where(is_leaf, True, default[order]).astype(bool),
+        "value":     value[order].astype(np.float64),
+        "roots":     new_id[roots].astype(np.int32),
+    }
+    return arrays, depth
+
+
+class CompactEnsemble:
+    def __init__(self, arrays, meta):
+        self.__dict__.update(arrays)
+        self.meta = meta
+        # sklearn goes left on x <= threshold, XGBoost on x < threshold
+        self.left_on_equal = meta["left_on_equal"]
+        self.depth = meta["max_depth"]
+
+    # --- Building ---
+    @classmethod
+    def from_sklearn_forest(cls, forest):
+        trees = [est.tree_ for est in forest.estimators_]
+        offsets = np.cumsum([0] + [t.node_count for t in trees])
+        # Children point into the concatenated arrays; leaves keep -1
+        left  = np.concatenate([np.where(t.children_left >= 0, t.children_left + o, -1) for t, o in zip(trees, offsets)])
+        right = np.concatenate([np.where(t.children_right >= 0, t.children_right + o, -1) for t, o in zip(trees, offsets)])
+        values = np.concatenate([t.value[:, 0, :] for t in trees])
+        if hasattr(forest, "classes_"):
+            # Leaf class weights → probabilities (already fractions on recent sklearn)
+            values = values / values.sum(axis=1, keepdims=True)
+        arrays, depth = _pack(
+            np.concatenate([t.feature for t in trees]),
+            _float32_floor(np.concatenate([t.threshold for t in trees])),
+            left, right,
+            np.concatenate([t.missing_go_to_left for t in trees]).astype(bool),
+            values, offsets[:-1],
+        )
+        meta = {
+            "kind": "mean", "base_score": 0.0, "left_on_equal": True, "max_depth": depth,
+            "classes": [c.item() for c in getattr(forest, "classes_", [])],
+        }
+        return cls(arrays, meta)
+
+    @classmethod
+    def from_xgboost(cls, model):
+        # Exact float32 splits come from the raw JSON model, not the text dump
+        booster = model.get_booster()
+        learner = json.loads(booster.save_raw(raw_format="json"))["learner"]
+        trees = learner["gradient_booster"]["model"]["trees"]
+        # Output each tree adds to; a multi-quantile booster grows one tree per
+        # quantile every round
+        outputs = np.asarray(learner["gradient_booster"]["model"]["tree_info"], dtype=np.int64)
+        try:
+            # predict() stops at the best round when the model was early-stopped
+            kept = (model.best_iteration + 1) * (len(trees) // booster.num_boosted_rounds())
+            trees, outputs = trees[:kept], outputs[:kept]
+        except AttributeError:
+            pass
+
+        sizes = [len(tree["left_children"]) for tree in trees]
+        offsets = np.cumsum([0] + sizes)
+        left  = np.concatenate([np.asarray(t["left_children"]) for t in trees])
+        right = np.concatenate([np.asarray(t["right_children"]) for t in trees])
+        shift = np.repeat(offsets[:-1], sizes)
+        # Leaf split_conditions hold the leaf weight (learning rate applied)
+        split = np.concatenate([np.asarray(t["split_conditions"], dtype=np.float32) for t in trees])
+        # One base score per output, e.g. "[-3.78E-1,4.06E-1]" for two quantiles
+        base_score = [float(v) for v in learner["learner_model_param"]["base_score"].strip("[]").split(",")]
+        value = np.zeros((len(split), len(base_score)))
+        value[np.arange(len(split)), np.repeat(outputs, sizes)] = np.where(left < 0, split, 0.0)
+        arrays, depth = _pack(
+            np.concatenate([np.asarray(t["split_indices"]) for t in trees]),
+            split,
+            np.where(left >= 0, left + shift, -1), np.where(right >= 0, right + shift, -1),
+            np.concatenate([np.asarray(t["default_left"], dtype=bool) for t in trees]),
+            value, offsets[:-1],
+        )
+        meta = {"kind": "sum", "base_score": base_score[0] if len(base_score) == 1 else base_score,
+                "left_on_equal": False, "max_depth": depth, "classes": []}
+        return cls(arrays, meta)
+
+    # --- Persistence ---
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(self.meta, f, indent=1)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode) for name in ARRAYS}
+        return cls(arrays, meta)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+    # --- Inference ---
+    def _raw(self, X, has_missing):
+        # Sum (or mean) of leaf values over trees for one batch of rows
+        n_rows, n_features = X.shape
+        nodes = np.broadcast_to(np.asarray(self.roots), (n_rows, len(self.roots))).copy()
+        row_start = (np.arange(n_rows) * n_features)[:, None]
+        flat = X.ravel()
+        for _ in range(self.depth):
+            x = flat[row_start + self.feature[nodes]]
+            threshold = self.threshold[nodes]
+            # NaN thresholds (leaves) compare False, so leaves stay put
+            go_right = x > threshold if self.left_on_equal else x >= threshold
+            if has_missing:
+                go_right |= np.isnan(x) & ~self.default[nodes]
+            nodes = self.left[nodes] + go_right
+        leaves = self.value[nodes]                     # (rows, trees, outputs)
+        total = leaves.mean(axis=1) if self.meta["kind"] == "mean" else leaves.sum(axis=1)
+        return total + np.asarray(self.meta["base_score"])
+
+    def _batched(self, X):
+        # Both libraries compare float32 features against the split values
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if not len(X):
+            return np.zeros((0, self.value.shape[1]))
+        has_missing = bool(np.isnan(X).any())
+        step = max(1, BATCH_ELEMENTS // (len(self.roots) * self.value.shape[1]))
+        return np.concatenate([self._raw(X[i:i + step], has_missing) for i in range(0, len(X), step)])
+
+    def predict(self, X):
+        # Like the native models: classes, one value per row, or one column
+        # per output (the quantile booster's lower and upper bounds)
+        raw = self._batched(X)
+        if self.meta["classes"]:
+            return np.asarray(self.meta["classes"])[raw.argmax(axis=1)]
+        return raw[:, 0] if raw.shape[1] == 1 else raw
+
+    def predict_proba(self, X):
+        return self._batched(X)
+
+
+def export_ensemble(models, directory):
+    # One compact model per fitted tree ensemble in the registry's model dict
+    for name in ENSEMBLES:
+        model = models.get(name)
+        if model is None:
+            continue
+        compact = (CompactEnsemble.from_xgboost(model) if name.startswith("xgb")
+                   else CompactEnsemble.from_sklearn_forest(model))
+        compact.save(os.path.join(directory, name))
+    with open(os.path.join(directory, "features.json"), "w") as f:
+        json.dump({"yield_features": models["yield_features"], "clf_features": models["clf_features"],
+                   "interval_offset": models.get("interval_offset", 0.0),
+                   "reason_classes": [] if models.get("le_reason") is None
+                   else [str(c) for c in models["le_reason"].classes_]}, f, indent=1)
+
+
+def load_ensemble(directory, mmap=True):
+    return {name: CompactEnsemble.load(os.path.join(directory, name), mmap)
+            for name in ENSEMBLES if os.path.isdir(os.path.join(directory, name))}
@@ -19,12 +19,29 @@ TABLE_REJECTION     = f"{BQ_PROJECT_ID}.{BQ_DATASET}.rejection_analysis"
 
 # --- Destination (write forecast results to) ---
 TABLE_FORECAST      = f"{BQ_PROJECT_ID}.{BQ_DATASET}.forecast_7day"
+# One row per (forecast row, rank) of the top predicted rejection reasons
+TABLE_FORECAST_REASONS = f"{BQ_PROJECT_ID}.{BQ_DATASET}.forecast_7day_reasons"
+# Local Parquet copy of both tables, loadable by the backend's forecast store.
+# Set to None to skip writing it.
+FORECAST_ARTIFACT_DIR  = "forecast_artifact"
 
 # --- Training Date Range ---
 # Only use data from this window to train the models
 TRAIN_START_DATE    = "2025-12-01"
 TRAIN_END_DATE      = "2026-02-19"
 
+# --- Training Data ---
+# "aggregated": pull per combo-day unit and rejection-reason counts from BigQuery
+#               and weight the classifier by them (scales with combos, not units)
+# "rows"      : pull every unit row of master_station_data in the training window
+TRAINING_MODE       = "aggregated"
+
+# --- Feature Store ---
+# Local Parquet copy of the aggregated extracts, partitioned by event_date.
+# Each run only re-extracts days that are new or changed (by last_updated_at)
+# and extends the rolling stats from there. Set to None to pull the full window.
+FEATURE_STORE_DIR   = "feature_store"
+
 # --- Forecast Horizon ---
 FORECAST_DAYS       = 7   # How many days ahead to forecast
 
@@ -43,11 +60,57 @@ XGB_LEARNING_RATE   = 0.03
 XGB_MAX_DEPTH       = 8
 XGB_RANDOM_STATE    = 42
 
+# Rejection reason classifier (Random Forest)
+CLF_N_ESTIMATORS    = 1000
+CLF_MAX_DEPTH       = 12
+
+# --- Tuned Profile ---
+# tune.py writes the settings it picks to this JSON file; when it exists,
+# train.py applies them over the values in this file (--profile to override)
+TUNED_PROFILE       = "tuned_profile.json"
+
 # Ensemble weight: final_pred = RF_WEIGHT * rf_pred + XGB_WEIGHT * xgb_pred
 # Must sum to 1.0
 RF_WEIGHT           = 0.5
 XGB_WEIGHT          = 0.5
 
+# --- Training Orchestration ---
+# The final RF, XGB and classifier fits and every CV fold run concurrently in a
+# process pool, each with an equal share of TRAIN_CORES threads (None = all cores)
+TRAIN_CORES         = None
+
+# "fast": time-ordered folds over event_date (train on earlier days, test on the
+#         next block), histogram XGB with early stopping, and smaller forests
+# "full": 5-fold KFold/StratifiedKFold of the full-size models
+CV_MODE             = "fast"
+CV_FOLDS            = 5
+CV_RF_N_ESTIMATORS  = 200   # Forest size for CV folds in fast mode
+CV_EARLY_STOPPING_ROUNDS = 50
+
+# --- Model Registry & Incremental Updates ---
+# Each run fingerprints its training data per day. Unchanged data reuses the
+# registered models; new days warm-start them; changed past days, new model
+# settings, the schedule, or drift past the tolerance force a full retrain.
+MODEL_REGISTRY_DIR       = "model_registry"
+MODEL_REGISTRY_KEEP      = 10    # Versions kept for rollback
+FULL_RETRAIN_EVERY_DAYS  = 7
+MODEL_DRIFT_TOLERANCE    = 0.25  # Retrain if MAE on new days > reference MAE × (1 + this)
+WARM_START_WINDOW_DAYS   = 14    # Days before the new ones included in a warm start
+WARM_START_XGB_TREES     = 100   # Boosting rounds appended per warm start
+WARM_START_RF_TREES      = 100   # Forest trees replaced per warm start
+# Also write each version's trees as flat NumPy arrays (compact_trees.py)
+EXPORT_COMPACT_MODELS    = True
+
+# Central coverage of the forecast yield interval (0.8 → 10th to 90th percentile)
+PREDICTION_INTERVAL = 0.8
+# Boosting rounds of the quantile model behind the interval. Separate from
+# XGB_N_ESTIMATORS, which tune.py sets to the point model's early-stopped count.
+XGB_QUANTILE_N_ESTIMATORS = 500
+# The interval is calibrated on the last N training days: a second quantile
+# model is fit without them and its bounds are widened (or narrowed) until
+# PREDICTION_INTERVAL of those days' yields fall inside
+INTERVAL_CALIBRATION_DAYS = 14
+
 # Top N rejection reasons to surface per SKU+Vendor combo in the forecast
 TOP_N_REJECTION_REASONS = 3
 
@@ -0,0 +1,90 @@
+# =============================================================================
+# feature_store.py — Local Parquet copy of the aggregated training extracts
+#
+# Layout under FEATURE_STORE_DIR:
+#   <name>/event_date=YYYY-MM-DD/part.parquet   one partition per day and extract
+#   <name>.parquet                              unpartitioned tables (daily stats)
+#   versions.json                               per-day (max last_updated_at, row count)
+#                                               as of the last extraction
+# =============================================================================
+
+import json
+import os
+import shutil
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+class FeatureStore:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def _versions_path(self):
+        return os.path.join(self.directory, "versions.json")
+
+    def _partition_dir(self, name, day):
+        return os.path.join(self.directory, name, f"event_date={day.isoformat()}")
+
+    # --- Day versions ---
+    def versions(self):
+        if not os.path.exists(self._versions_path):
+            return {}
+        with open(self._versions_path) as f:
+            return {date.fromisoformat(day): tuple(v) for day, v in json.load(f).items()}
+
+    def save_versions(self, versions):
+        tmp = self._versions_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({day.isoformat(): list(v) for day, v in sorted(versions.items())}, f, indent=1)
+        os.replace(tmp, self._versions_path)
+
+    def stale_days(self, remote_versions, start, end):
+        # Days in [start, end] that are new, changed, or gone from the source
+        stored = self.versions()
+        changed = {day for day, v in remote_versions.items() if stored.get(day) != v}
+        removed = {day for day in stored if start <= day <= end and day not in remote_versions}
+        return sorted(changed | removed)
+
+    # --- Day-partitioned extracts ---
+    def write_days(self, name, table, days):
+        # Replace the partitions for `days`; a day without rows in `table` is removed
+        by_day = {}
+        if table.num_rows:
+            day_values = table.column("event_date").to_pylist()
+            for i, value in enumerate(day_values):
+                by_day.setdefault(value.date() if hasattr(value, "date") else value, []).append(i)
+
+        for day in days:
+            path = self._partition_dir(name, day)
+            shutil.rmtree(path, ignore_errors=True)
+            rows = by_day.get(day)
+            if rows:
+                os.makedirs(path)
+                pq.write_table(table.take(pa.array(rows)), os.path.join(path, "part.parquet"))
+
+    def read_days(self, name, start, end):
+        root = os.path.join(self.directory, name)
+        if not os.path.isdir(root):
+            return None
+        parts = []
+        for entry in sorted(os.listdir(root)):
+            day = date.fromisoformat(entry.split("=", 1)[1])
+            if start <= day <= end:
+                parts.append(pq.read_table(os.path.join(root, entry, "part.parquet")))
+        if not parts:
+            return None
+        return pa.concat_tables(parts, promote_options="permissive")
+
+    # --- Small unpartitioned tables ---
+    def read_table(self, name):
+        path = os.path.join(self.directory, f"{name}.parquet")
+        return pq.read_table(path) if os.path.exists(path) else None
+
+    def write_table(self, name, table):
+        path = os.path.join(self.directory, f"{name}.parquet")
+        pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
@@ -0,0 +1,86 @@
+# =============================================================================
+# model_registry.py — Versioned local store of trained models
+#
+# Layout under MODEL_REGISTRY_DIR:
+#   v0001/models.joblib   fitted estimators + label encoder + feature lists
+#   v0001/meta.json       how the version was trained (full / warm), per-day
+#                         data fingerprints, reference validation error
+#   CURRENT               name of the version the pipeline forecasts with
+# =============================================================================
+
+import json
+import os
+import shutil
+from datetime import datetime
+
+import joblib
+
+
+class ModelRegistry:
+    def __init__(self, directory, keep=None):
+        self.directory = directory
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def _current_path(self):
+        return os.path.join(self.directory, "CURRENT")
+
+    def versions(self):
+        return sorted(v for v in os.listdir(self.directory) if v.startswith("v") and
+                      os.path.exists(os.path.join(self.directory, v, "meta.json")))
+
+    def current(self):
+        # (version, meta) the pipeline is using, or (None, None) before the first run
+        if not os.path.exists(self._current_path):
+            return None, None
+        with open(self._current_path) as f:
+            version = f.read().strip()
+        return version, self.meta(version)
+
+    def meta(self, version):
+        with open(os.path.join(self.directory, version, "meta.json")) as f:
+            return json.load(f)
+
+    def load(self, version):
+        return joblib.load(os.path.join(self.directory, version, "models.joblib"))
+
+    def save(self, models, meta):
+        versions = self.versions()
+        version = f"v{int(versions[-1][1:]) + 1 if versions else 1:04d}"
+        path = os.path.join(self.directory, version)
+        os.makedirs(path)
+        joblib.dump(models, os.path.join(path, "models.joblib"))
+        meta = dict(meta, version=version, created_at=datetime.now().isoformat(timespec="seconds"))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=1)
+        self._set_current(version)
+        self._prune()
+        return version
+
+    def rollback(self, version=None):
+        # Point CURRENT at `version`, or the one before the current version
+        versions = self.versions()
+        current, _ = self.current()
+        if version is None:
+            older = [v for v in versions if current is None or v < current]
+            if not older:
+                raise ValueError("No earlier model version to roll back to.")
+            version = older[-1]
+        if version not in versions:
+            raise ValueError(f"Unknown model version: {version}")
+        self._set_current(version)
+        return version
+
+    def _set_current(self, version):
+        with open(self._current_path + ".tmp", "w") as f:
+            f.write(version)
+        os.replace(self._current_path + ".tmp", self._current_path)
+
+    def _prune(self):
+        if not self.keep:
+            return
+        current, _ = self.current()
+        for version in self.versions()[:-self.keep]:
+            if version != current:
+                shutil.rmtree(os.path.join(self.directory, version))
@@ -0,0 +1,107 @@
+# =============================================================================
+# orchestrator.py — Runs independent model fits concurrently
+#
+# A FitJob is either a final fit (no train/test indices → returns the fitted
+# estimator) or one cross-validation fold (→ returns the fold's score). Jobs
+# share nothing, so they run in a process pool and each gets an equal share
+# of the core budget as its estimator's n_jobs.
+# =============================================================================
+
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, mean_absolute_error
+
+SCORERS = {
+    "mae":      mean_absolute_error,
+    "accuracy": accuracy_score,
+}
+
+FitJob = namedtuple(
+    "FitJob",
+    "name estimator X y sample_weight train test eval scoring",
+    defaults=(None, None, None, None, None),
+)
+
+
+def _take(values, idx):
+    if values is None or idx is None:
+        return values
+    return values.iloc[idx] if hasattr(values, "iloc") else values[idx]
+
+
+def run_job(job, threads):
+    started = time.perf_counter()
+    estimator = clone(job.estimator).set_params(n_jobs=threads)
+
+    fit_params = {}
+    train = job.train
+    if job.eval is not None:
+        # Early stopping watches a held-out tail of the training days, never the test fold
+        fit_params["eval_set"] = [(_take(job.X, job.eval), _take(job.y, job.eval))]
+        fit_params["verbose"] = False
+    if job.sample_weight is not None:
+        fit_params["sample_weight"] = _take(job.sample_weight, train)
+    estimator.fit(_take(job.X, train), _take(job.y, train), **fit_params)
+
+    if job.test is None:
+        result = estimator
+    else:
+        # Folds are scored with the same weights the model was fit with
+        predicted = estimator.predict(_take(job.X, job.test))
+        result = SCORERS[job.scoring](_take(job.y, job.test), predicted,
+                                      sample_weight=_take(job.sample_weight, job.test))
+    return job.name, result, time.perf_counter() - started
+
+
+def run_jobs(jobs, cores=None):
+    # Returns ({name: estimator or score}, {name: seconds}). Jobs are submitted
+    # in the given order, so put the largest fits first.
+    cores = cores or os.cpu_count() or 1
+    workers = max(1, min(len(jobs), cores))
+    threads = max(1, cores // workers)
+    print(f"  └─ Running {len(jobs)} fits on {workers} worker(s) × {threads} thread(s)...")
+
+    results, seconds = {}, {}
+    if workers == 1:
+        for job in jobs:
+            name, result, took = run_job(job, threads)
+            results[name], seconds[name] = result, took
+        return results, seconds
+
+    # spawn, not fork: forking after OpenMP has started in the parent can hang the workers
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [pool.submit(run_job, job, threads) for job in jobs]
+        for future in as_completed(futures):
+            name, result, took = future.result()
+            results[name], seconds[name] = result, took
+    return results, seconds
+
+
+def fold_scores(results, name):
+    return np.array([score for key, score in results.items() if key.startswith(f"{name}/cv")])
+
+
+class StageTimer:
+    def __init__(self):
+        self.seconds = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - started
+
+    def report(self):
+        print("\n[TIME] Wall-clock per stage:")
+        for name, took in self.seconds.items():
+            print(f"  └─ {name:<20} {took:8.1f}s")
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+import config
+import train
+
+
+# Reference implementations: the row-wise / per-group versions the vectorized
+# code in train.py replaced.
+def reference_engineer_features(df):
+    df = df.copy()
+    df['event_date'] = pd.to_datetime(df['event_date'])
+    df['is_accepted'] = (df['cs_status'] == 'ACCEPTED').astype(int)
+    df['is_rejected'] = (
+        df['vqc_status'].str.upper().isin(config.VQC_REJECTED_STATUSES) |
+        df['ft_status'].str.upper().isin(config.FT_REJECTED_STATUSES) |
+        df['cs_status'].str.upper().isin(config.CS_REJECTED_STATUSES)
+    ).astype(int)
+
+    df['day_of_week']  = df['event_date'].dt.dayofweek
+    df['week_of_year'] = df['event_date'].dt.isocalendar().week.astype(int)
+    df['month']        = df['event_date'].dt.month
+    df['day_of_month'] = df['event_date'].dt.day
+
+    batch_daily = (
+        df.groupby(['event_date', 'sku', 'vendor'])
+        .size()
+        .reset_index(name='batch_size')
+    )
+    df = df.merge(batch_daily, on=['event_date', 'sku', 'vendor'], how='left')
+
+    daily_yield = (
+        df.groupby(['event_date', 'sku', 'vendor'])['is_accepted']
+        .mean()
+        .reset_index(name='daily_yield')
+    )
+    daily_yield = daily_yield.sort_values('event_date')
+    daily_yield['roll7_yield'] = (
+        daily_yield.groupby(['sku', 'vendor'])['daily_yield']
+        .transform(lambda x: x.shift(1).rolling(7, min_periods=1).mean())
+    )
+    daily_yield['roll14_yield'] = (
+        daily_yield.groupby(['sku', 'vendor'])['daily_yield']
+        .transform(lambda x: x.shift(1).rolling(14, min_periods=1).mean())
+    )
+    df = df.merge(daily_yield[['event_date', 'sku', 'vendor', 'roll7_yield', 'roll14_yield']],
+                  on=['event_date', 'sku', 'vendor'], how='left')
+
+    batch_daily['roll14_batch'] = (
+        batch_daily.sort_values('event_date')
+        .groupby(['sku', 'vendor'])['batch_size']
+        .transform(lambda x: x.shift(1).rolling(14, min_periods=1).mean())
+    )
+    df = df.merge(
+        batch_daily[['event_date', 'sku', 'vendor', 'roll14_batch']],
+        on=['event_date', 'sku', 'vendor'], how='left'
+    )
+
+    df['roll7_yield']   = df['roll7_yield'].fillna(df['is_accepted'].mean())
+    df['roll14_yield']  = df['roll14_yield'].fillna(df['is_accepted'].mean())
+    df['roll14_batch']  = df['roll14_batch'].fillna(df['batch_size'])
+    return df
+
+
+def reference_primary_reason(row):
+    if pd.notna(row['vqc_reason']) and str(row['vqc_status']).upper() in config.VQC_REJECTED_STATUSES:
+        return str(row['vqc_reason']).strip()
+    if pd.notna(row['ft_reason']) and str(row['ft_status']).upper() in config.FT_REJECTED_STATUSES:
+        return str(row['ft_reason']).strip()
+    if pd.notna(row['cs_reason']) and str(row['cs_status']).upper() in config.CS_REJECTED_STATUSES:
+        return str(row['cs_reason']).strip()
+    return 'UNKNOWN'
+
+
+def reference_latest_stats(df):
+    return (
+        df.groupby(['sku', 'vendor'])[['event_date', 'roll7_yield', 'roll14_yield', 'roll14_batch']]
+        .apply(lambda g: g.sort_values('event_date').iloc[-1])
+        .reset_index()
+        [['sku', 'vendor', 'roll7_yield', 'roll14_yield', 'roll14_batch']]
+    )
+
+
+@pytest.fixture
+def units():
+    # A few SKU+Vendor pairs over 40 days, with gaps, mixed-case statuses and
+    # padded or missing reasons
+    rng = np.random.default_rng(7)
+    n = 3000
+    ft_rejected = sorted(config.FT_REJECTED_STATUSES)
+    return pd.DataFrame({
+        'event_date': pd.Timestamp('2026-01-01') + pd.to_timedelta(rng.integers(0, 40, n), unit='D'),
+        'sku':        rng.choice(['SKU-A', 'SKU-B', 'SKU-C'], n),
+        'vendor':     rng.choice(['IHC', '3DE TECH'], n),
+        'size':       rng.choice(['8', '9', '10'], n),
+        'line':       rng.choice(['PRODUCTION', 'RT'], n),
+        'vqc_status': rng.choice(['ACCEPTED', 'scrap', 'WABI SABI', None], n, p=[0.7, 0.1, 0.1, 0.1]),
+        'ft_status':  rng.choice(['ACCEPTED', ft_rejected[0].lower(), None], n, p=[0.75, 0.15, 0.1]),
+        'cs_status':  rng.choice(['ACCEPTED', 'REJECTED', 'rejected', None], n, p=[0.6, 0.15, 0.05, 0.2]),
+        'vqc_reason': rng.choice([' DENT ON SHELL', 'MICRO BUBBLES ', None], n),
+        'ft_reason':  rng.choice(['NOT CHARGING', None], n),
+        'cs_reason':  rng.choice(['SIDE SCRATCH', '  BATTERY ISSUE', None], n),
+    })
+
+
+def test_engineer_features_matches_reference(units):
+    expected = reference_engineer_features(units)
+    actual, _ = train.engineer_features(units.copy())
+    assert_frame_equal(actual.reset_index(drop=True), expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('categorical', [False, True])
+def test_primary_reasons_match_reference(units, categorical):
+    if categorical:
+        units = units.astype({col: 'category' for col in train.CATEGORICAL_COLS if col in units.columns})
+    expected = units.apply(reference_primary_reason, axis=1).tolist()
+    assert list(train.primary_reasons(units)) == expected
+
+
+def test_latest_daily_stats_match_reference(units):
+    features, _ = train.engineer_features(units.copy())
+    expected = reference_latest_stats(features)
+    actual = train.latest_daily_stats(features).sort_values(['sku', 'vendor']).reset_index(drop=True)
+    assert_frame_equal(actual, expected, check_dtype=False)
@@ -3,22 +3,32 @@
 # Run: python train_and_forecast.py
 # =============================================================================
 
+import argparse
+import json
+import os
 import warnings
 warnings.filterwarnings("ignore")
 
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 from datetime import datetime, timedelta, date
 
 from google.cloud import bigquery
 
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
 from sklearn.preprocessing import LabelEncoder
-from sklearn.model_selection import cross_val_score
+from sklearn.base import is_classifier
+from sklearn.model_selection import check_cv
 from sklearn.metrics import mean_absolute_error
 import xgboost as xgb
 
 import config
+from compact_trees import export_ensemble
+from feature_store import FeatureStore
+from model_registry import ModelRegistry
+from orchestrator import FitJob, StageTimer, fold_scores, run_jobs
 
 # =============================================================================
 # STEP 0 — BigQuery Connection
@@ -30,9 +40,57 @@ def get_bq_client():
     return client
 
 
+def get_bqstorage_client():
+    # The Storage Read API streams results as Arrow record batches instead of
+    # paging JSON rows; fall back to the REST path when it isn't installed
+    try:
+        from google.cloud import bigquery_storage
+    except ImportError:
+        print("[BQ] google-cloud-bigquery-storage not installed; using the REST API.")
+        return None
+    return bigquery_storage.BigQueryReadClient()
+
+
+def arrow_batches_to_frame(batches, categorical_cols):
+    # Dictionary-encode low-cardinality string columns batch by batch so the
+    # full result never exists as Python string objects, then build the frame
+    # with one categorical per column
+    encoded = []
+    for batch in batches:
+        columns = [
+            pc.dictionary_encode(column)
+            if name in categorical_cols and (pa.types.is_string(column.type) or pa.types.is_large_string(column.type))
+            else column
+            for name, column in zip(batch.schema.names, batch.columns)
+        ]
+        encoded.append(pa.RecordBatch.from_arrays(columns, names=batch.schema.names))
+    if not encoded:
+        return pd.DataFrame()
+    table = pa.Table.from_batches(encoded).unify_dictionaries()
+    del encoded
+    return table.to_pandas(date_as_object=False, self_destruct=True, split_blocks=True)
+
+
+def read_query(client, query, categorical_cols=(), query_parameters=()):
+    job_config = bigquery.QueryJobConfig(query_parameters=list(query_parameters))
+    rows = client.query(query, job_config=job_config).result()
+    frame = arrow_batches_to_frame(rows.to_arrow_iterable(bqstorage_client=get_bqstorage_client()), categorical_cols)
+    if not len(frame.columns):
+        # No rows (e.g. an incremental extract of deleted days): keep the columns
+        frame = pd.DataFrame(columns=[field.name for field in rows.schema])
+    return frame
+
+
 # =============================================================================
 # STEP 1 — Load Training Data from BigQuery
 # =============================================================================
+# Low-cardinality string columns, kept as pandas categoricals from load onwards
+CATEGORICAL_COLS = {
+    'line', 'sku', 'size', 'vendor',
+    'vqc_status', 'ft_status', 'cs_status',
+    'vqc_reason', 'ft_reason', 'cs_reason', 'primary_reason',
+}
+
 def load_data(client):
     print(f"\n[DATA] Loading master data from {config.TRAIN_START_DATE} to {config.TRAIN_END_DATE}...")
 
@@ -57,80 +115,315 @@ def load_data(client):
           AND NOT (line = 'WABI SABI')
         ORDER BY vqc_inward_date
     """
-    df = client.query(query).to_dataframe()
-    print(f"[DATA] Loaded {len(df):,} records.")
+    df = read_query(client, query, CATEGORICAL_COLS)
+    print(f"[DATA] Loaded {len(df):,} records ({df.memory_usage(deep=True).sum() / 1e6:,.0f} MB).")
     return df
 
 
+def sql_in_list(values):
+    return ", ".join(f"'{v}'" for v in sorted(values))
+
+
+def training_window_filter():
+    return f"""
+        vqc_inward_date BETWEEN '{config.TRAIN_START_DATE}' AND '{config.TRAIN_END_DATE}'
+        AND vqc_inward_date IS NOT NULL
+        AND NOT (line = 'WABI SABI')
+    """
+
+
+def load_aggregated_data(client, days=None):
+    # The whole training window, or only `days` when refreshing the feature store
+    window = training_window_filter()
+    query_parameters = []
+    if days is None:
+        print(f"\n[DATA] Loading aggregated master data from {config.TRAIN_START_DATE} to {config.TRAIN_END_DATE}...")
+    else:
+        print(f"\n[DATA] Loading aggregated master data for {len(days)} day(s)...")
+        window += " AND vqc_inward_date IN UNNEST(@days)"
+        query_parameters.append(bigquery.ArrayQueryParameter("days", "DATE", days))
+
+    # One row per combo-day: the yield model is fit at this grain anyway
+    units_query = f"""
+        SELECT
+            vqc_inward_date                     AS event_date,
+            line,
+            sku,
+            size,
+            vendor,
+            COUNT(*)                            AS total_units,
+            COUNTIF(cs_status = 'ACCEPTED')     AS accepted_units
+        FROM `{config.TABLE_MASTER}`
+        WHERE {window}
+        GROUP BY 1, 2, 3, 4, 5
+        ORDER BY event_date
+    """
+
+    # Rejected units per combo-day and primary reason (first stage that rejected)
+    vqc = sql_in_list(config.VQC_REJECTED_STATUSES)
+    ft  = sql_in_list(config.FT_REJECTED_STATUSES)
+    cs  = sql_in_list(config.CS_REJECTED_STATUSES)
+    reasons_query = f"""
+        SELECT
+            vqc_inward_date AS event_date,
+            line,
+            sku,
+            size,
+            vendor,
+            CASE
+                WHEN vqc_reason IS NOT NULL AND UPPER(vqc_status) IN ({vqc}) THEN TRIM(vqc_reason)
+                WHEN ft_reason  IS NOT NULL AND UPPER(ft_status)  IN ({ft})  THEN TRIM(ft_reason)
+                WHEN cs_reason  IS NOT NULL AND UPPER(cs_status)  IN ({cs})  THEN TRIM(cs_reason)
+                ELSE 'UNKNOWN'
+            END AS primary_reason,
+            COUNT(*) AS reason_count
+        FROM `{config.TABLE_MASTER}`
+        WHERE {window}
+          AND (UPPER(vqc_status) IN ({vqc}) OR UPPER(ft_status) IN ({ft}) OR UPPER(cs_status) IN ({cs}))
+        GROUP BY 1, 2, 3, 4, 5, 6
+    """
+
+    units   = read_query(client, units_query, CATEGORICAL_COLS, query_parameters)
+    reasons = read_query(client, reasons_query, CATEGORICAL_COLS, query_parameters)
+    print(f"[DATA] Loaded {len(units):,} combo-days ({units['total_units'].sum():,} units) "
+          f"and {len(reasons):,} reason groups.")
+    return units, reasons
+
+
+def fetch_day_versions(client):
+    # Per-day (latest last_updated_at, row count) in the window; cheap, as it
+    # only reads two columns. A day whose pair moved has to be re-extracted.
+    query = f"""
+        SELECT
+            vqc_inward_date                             AS event_date,
+            FORMAT_DATETIME('%FT%T', MAX(last_updated_at)) AS last_updated_at,
+            COUNT(*)                                    AS row_count
+        FROM `{config.TABLE_MASTER}`
+        WHERE {training_window_filter()}
+        GROUP BY 1
+    """
+    rows = client.query(query).result()
+    return {row['event_date']: (row['last_updated_at'], row['row_count']) for row in rows}
+
+
+def load_from_feature_store(client, store):
+    # Re-extract only the days that are new or changed since the last run, then
+    # serve the whole window (and the rolling daily stats) from local Parquet
+    start = pd.to_datetime(config.TRAIN_START_DATE).date()
+    end   = pd.to_datetime(config.TRAIN_END_DATE).date()
+
+    print(f"\n[STORE] Checking feature store `{store.directory}` against BigQuery...")
+    remote_versions = fetch_day_versions(client)
+    stale = store.stale_days(remote_versions, start, end)
+    daily_stats = store.read_table('daily')
+
+    if stale or daily_stats is None:
+        print(f"[STORE] {len(stale)} day(s) to extract.")
+        if stale:
+            units, reasons = load_aggregated_data(client, days=stale)
+            store.write_days('units', pa.Table.from_pandas(units, preserve_index=False), stale)
+            store.write_days('reasons', pa.Table.from_pandas(reasons, preserve_index=False), stale)
+
+        # Extend the rolling stats from the first changed day onwards
+        from_day = stale[0] if stale and daily_stats is not None else start
+        changed_units = store.read_days('units', from_day, date.max)
+        previous = None if daily_stats is None else arrow_batches_to_frame(daily_stats.to_batches(), CATEGORICAL_COLS)
+        daily = extend_daily_stats(previous, table_to_frame(changed_units), pd.Timestamp(from_day))
+        store.write_table('daily', pa.Table.from_pandas(daily, preserve_index=False))
+        store.save_versions(remote_versions)
+    else:
+        print("[STORE] Feature store is up to date.")
+        daily = arrow_batches_to_frame(daily_stats.to_batches(), CATEGORICAL_COLS)
+
+    units   = table_to_frame(store.read_days('units', start, end))
+    reasons = table_to_frame(store.read_days('reasons', start, end))
+    daily   = daily[(daily['event_date'] >= pd.Timestamp(start)) & (daily['event_date'] <= pd.Timestamp(end))]
+    print(f"[STORE] Loaded {len(units):,} combo-days and {len(reasons):,} reason groups from the store.")
+    return units, reasons, daily.reset_index(drop=True)
+
+
+def table_to_frame(table):
+    if table is None:
+        return pd.DataFrame()
+    return arrow_batches_to_frame(table.to_batches(), CATEGORICAL_COLS)
+
+
 # =============================================================================
 # STEP 2 — Feature Engineering
 # =============================================================================
+def lagged_rolling_mean(daily, col, window):
+    # Mean of the previous `window` days per SKU+Vendor, excluding the current day.
+    # `daily` must already be sorted by event_date.
+    keys = [daily['sku'], daily['vendor']]
+    lagged = daily[col].groupby(keys, observed=True).shift(1)
+    return (
+        lagged.groupby(keys, observed=True)
+        .rolling(window, min_periods=1)
+        .mean()
+        .droplevel([0, 1])
+    )
+
+
+def add_time_features(df):
+    # Small calendar values, stored as int8 to keep row-level frames compact
+    df['day_of_week']  = df['event_date'].dt.dayofweek.astype(np.int8)   # 0=Mon, 6=Sun
+    df['week_of_year'] = df['event_date'].dt.isocalendar().week.astype(np.int8)
+    df['month']        = df['event_date'].dt.month.astype(np.int8)
+    df['day_of_month'] = df['event_date'].dt.day.astype(np.int8)
+
+
+def daily_groups(df):
+    # SKU+Vendor day groups in first-seen order
+    return df.groupby(['event_date', 'sku', 'vendor'], observed=True, sort=False)
+
+
+DAILY_STAT_COLS = ['batch_size', 'roll7_yield', 'roll14_yield', 'roll14_batch']
+
+
+def add_rolling_stats(batch_daily):
+    # Rolling 7-day & 14-day yield and 14-day batch size per SKU+Vendor.
+    # Each value only uses days before the current one (batch size is used for future batch estimation)
+    batch_daily = batch_daily.sort_values('event_date', kind='stable')
+    batch_daily['roll7_yield']  = lagged_rolling_mean(batch_daily, 'daily_yield', 7)
+    batch_daily['roll14_yield'] = lagged_rolling_mean(batch_daily, 'daily_yield', 14)
+    batch_daily['roll14_batch'] = lagged_rolling_mean(batch_daily, 'batch_size', 14)
+    return batch_daily
+
+
+def add_rolling_features(df, batch_daily, groups):
+    # `batch_daily` row i holds group i of `groups`; rows with a missing key belong to none (-1).
+    group_ids = groups.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    batch_daily = add_rolling_stats(batch_daily)
+
+    # Broadcast back by group id rather than merging, which would copy the whole frame
+    by_group = batch_daily.sort_index()
+    for col in DAILY_STAT_COLS:
+        df[col] = np.append(by_group[col].to_numpy(dtype=float), np.nan)[group_ids]
+    return df, batch_daily
+
+
+def status_in(col, statuses):
+    # Case-insensitive membership test; for categoricals only the categories are compared
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        hits = col.cat.categories.astype(str).str.upper().isin(statuses)
+        return pd.Series(np.append(hits, False)[col.cat.codes], index=col.index)
+    return col.str.upper().isin(statuses)
+
+
+def unit_counts(df):
+    # Units each row stands for: one per unit row, total_units per aggregated combo-day
+    return df['total_units'] if 'total_units' in df.columns else pd.Series(1, index=df.index)
+
+
+def overall_yield(df):
+    accepted = df['accepted_units'] if 'accepted_units' in df.columns else df['is_accepted']
+    return accepted.sum() / unit_counts(df).sum()
+
+
 def engineer_features(df):
+    # Adds the feature columns to `df` in place (no full-frame copies)
     print("\n[FEAT] Engineering features...")
 
-    df = df.copy()
     df['event_date'] = pd.to_datetime(df['event_date'])
 
     # --- Target: was this unit ultimately accepted? ---
-    df['is_accepted'] = (df['cs_status'] == 'ACCEPTED').astype(int)
+    df['is_accepted'] = (df['cs_status'] == 'ACCEPTED').astype(np.int8)
 
     # --- Was this unit rejected at any stage? ---
     df['is_rejected'] = (
-        df['vqc_status'].str.upper().isin(config.VQC_REJECTED_STATUSES) |
-        df['ft_status'].str.upper().isin(config.FT_REJECTED_STATUSES) |
-        df['cs_status'].str.upper().isin(config.CS_REJECTED_STATUSES)
-    ).astype(int)
+        status_in(df['vqc_status'], config.VQC_REJECTED_STATUSES) |
+        status_in(df['ft_status'], config.FT_REJECTED_STATUSES) |
+        status_in(df['cs_status'], config.CS_REJECTED_STATUSES)
+    ).astype(np.int8)
 
     # --- Time features ---
-    df['day_of_week']  = df['event_date'].dt.dayofweek   # 0=Mon, 6=Sun
-    df['week_of_year'] = df['event_date'].dt.isocalendar().week.astype(int)
-    df['month']        = df['event_date'].dt.month
-    df['day_of_month'] = df['event_date'].dt.day
+    add_time_features(df)
 
-    # --- Daily batch size per SKU+Vendor ---
+    # --- Daily batch size and yield per SKU+Vendor, in one pass ---
+    groups = daily_groups(df)
     batch_daily = (
-        df.groupby(['event_date', 'sku', 'vendor'])
-        .size()
-        .reset_index(name='batch_size')
+        groups.agg(batch_size=('is_accepted', 'size'), daily_yield=('is_accepted', 'mean'))
+        .reset_index()
     )
-    df = df.merge(batch_daily, on=['event_date', 'sku', 'vendor'], how='left')
+    df, batch_daily = add_rolling_features(df, batch_daily, groups)
 
-    # --- Daily yield per SKU+Vendor (for rolling calc) ---
-    daily_yield = (
-        df.groupby(['event_date', 'sku', 'vendor'])['is_accepted']
-        .mean()
-        .reset_index(name='daily_yield')
-    )
+    # Fill NaN rolling values with the global mean (cold start safety)
+    df['roll7_yield']   = df['roll7_yield'].fillna(df['is_accepted'].mean())
+    df['roll14_yield']  = df['roll14_yield'].fillna(df['is_accepted'].mean())
+    df['roll14_batch']  = df['roll14_batch'].fillna(df['batch_size'])
 
-    # --- Rolling 7-day & 14-day yield per SKU+Vendor ---
-    daily_yield = daily_yield.sort_values('event_date')
-    daily_yield['roll7_yield'] = (
-        daily_yield.groupby(['sku', 'vendor'])['daily_yield']
-        .transform(lambda x: x.shift(1).rolling(7, min_periods=1).mean())
-    )
-    daily_yield['roll14_yield'] = (
-        daily_yield.groupby(['sku', 'vendor'])['daily_yield']
-        .transform(lambda x: x.shift(1).rolling(14, min_periods=1).mean())
-    )
+    print(f"[FEAT] Feature engineering complete. Shape: {df.shape}")
+    return df, batch_daily
 
-    df = df.merge(daily_yield[['event_date', 'sku', 'vendor', 'roll7_yield', 'roll14_yield']],
-                  on=['event_date', 'sku', 'vendor'], how='left')
 
-    # --- Rolling 14-day batch size per SKU+Vendor (used for future batch estimation) ---
-    batch_rolling = (
-        batch_daily.sort_values('event_date')
-        .groupby(['sku', 'vendor'])['batch_size']
-        .transform(lambda x: x.shift(1).rolling(14, min_periods=1).mean())
+def aggregate_daily(groups):
+    batch_daily = (
+        groups.agg(batch_size=('total_units', 'sum'), accepted=('accepted_units', 'sum'))
+        .reset_index()
     )
-    batch_daily['roll14_batch'] = batch_rolling
-    df = df.merge(
-        batch_daily[['event_date', 'sku', 'vendor', 'roll14_batch']],
-        on=['event_date', 'sku', 'vendor'], how='left'
+    batch_daily['daily_yield'] = batch_daily['accepted'] / batch_daily['batch_size']
+    return batch_daily.drop(columns='accepted')
+
+
+def empty_daily_stats():
+    # Per-day stats of a window without units
+    stats = ['batch_size', 'daily_yield', 'roll7_yield', 'roll14_yield', 'roll14_batch']
+    return pd.DataFrame(columns=['event_date', 'sku', 'vendor'] + stats).astype(
+        {'event_date': 'datetime64[ns]', **{col: float for col in stats}}
     )
 
+
+def extend_daily_stats(previous, units, from_day):
+    # Recompute the per-day stats from `from_day` onwards. The 14 stored days
+    # before it per SKU+Vendor are enough history for the lagged rolling means,
+    # so earlier rows are kept as they are.
+    if previous is not None and len(previous):
+        previous = previous.sort_values('event_date', kind='stable')
+        kept = previous[previous['event_date'] < from_day]
+    else:
+        kept = None
+
+    if not len(units):
+        # No units from `from_day` on (those days are gone from the source)
+        return kept.reset_index(drop=True) if kept is not None else empty_daily_stats()
+
+    units = units.copy()
+    units['event_date'] = pd.to_datetime(units['event_date'])
+    fresh = aggregate_daily(daily_groups(units))
+    if kept is None:
+        return add_rolling_stats(fresh).reset_index(drop=True)
+
+    context  = kept.groupby(['sku', 'vendor'], observed=True).tail(14)
+    combined = pd.concat([context[['event_date', 'sku', 'vendor', 'batch_size', 'daily_yield']], fresh],
+                         ignore_index=True)
+    for col in ['sku', 'vendor']:
+        combined[col] = combined[col].astype(object)
+    combined = add_rolling_stats(combined)
+    extended = combined[combined['event_date'] >= from_day]
+    return pd.concat([kept, extended], ignore_index=True)
+
+
+def engineer_aggregated_features(units, batch_daily=None):
+    # Same features as engineer_features, computed from per combo-day counts.
+    # `batch_daily` can come precomputed (rolling stats included) from the feature store.
+    print("\n[FEAT] Engineering features from aggregated counts...")
+
+    df = units.copy()
+    df['event_date'] = pd.to_datetime(df['event_date'])
+    df['total_units']    = df['total_units'].astype(int)
+    df['accepted_units'] = df['accepted_units'].astype(int)
+    add_time_features(df)
+
+    if batch_daily is None:
+        groups = daily_groups(df)
+        df, batch_daily = add_rolling_features(df, aggregate_daily(groups), groups)
+    else:
+        df = df.merge(batch_daily[['event_date', 'sku', 'vendor'] + DAILY_STAT_COLS],
+                      on=['event_date', 'sku', 'vendor'], how='left')
+
     # Fill NaN rolling values with the global mean (cold start safety)
-    df['roll7_yield']   = df['roll7_yield'].fillna(df['is_accepted'].mean())
-    df['roll14_yield']  = df['roll14_yield'].fillna(df['is_accepted'].mean())
+    df['roll7_yield']   = df['roll7_yield'].fillna(overall_yield(df))
+    df['roll14_yield']  = df['roll14_yield'].fillna(overall_yield(df))
     df['roll14_batch']  = df['roll14_batch'].fillna(df['batch_size'])
 
     print(f"[FEAT] Feature engineering complete. Shape: {df.shape}")
@@ -148,7 +441,15 @@ def encode_categoricals(df):
 
     for col in cat_cols:
         le = LabelEncoder()
-        df[col + '_enc'] = le.fit_transform(df[col].fillna('UNKNOWN').astype(str))
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Encode the categories once and index by code instead of materialising strings
+            # (missing values have code -1, which picks the trailing UNKNOWN label)
+            values = values.cat.remove_unused_categories()
+            labels = values.cat.categories.astype(str).tolist() + (['UNKNOWN'] if values.isna().any() else [])
+            df[col + '_enc'] = le.fit_transform(labels)[values.cat.codes]
+        else:
+            df[col + '_enc'] = le.fit_transform(values.fillna('UNKNOWN').astype(str))
         encoders[col] = le
         print(f"  └─ {col}: {le.classes_.tolist()}")
 
@@ -158,21 +459,128 @@ def encode_categoricals(df):
 # =============================================================================
 # STEP 4A — Train Yield Forecasting Models (Ensemble)
 # =============================================================================
-def train_yield_models(df):
-    print("\n[MODEL-YIELD] Training yield forecasting ensemble...")
+def make_rf_regressor(n_estimators=None):
+    return RandomForestRegressor(
+        n_estimators = n_estimators or config.RF_N_ESTIMATORS,
+        max_depth    = config.RF_MAX_DEPTH,
+        random_state = config.RF_RANDOM_STATE,
+        n_jobs       = -1
+    )
+
+
+def make_xgb_regressor(**overrides):
+    params = dict(
+        n_estimators  = config.XGB_N_ESTIMATORS,
+        learning_rate = config.XGB_LEARNING_RATE,
+        max_depth     = config.XGB_MAX_DEPTH,
+        random_state  = config.XGB_RANDOM_STATE,
+        n_jobs        = -1,
+        verbosity     = 0
+    )
+    params.update(overrides)
+    return xgb.XGBRegressor(**params)
 
-    # Aggregate to daily level for yield model
+
+def interval_quantiles():
+    # Lower/upper quantiles of the central PREDICTION_INTERVAL
+    tail = (1.0 - config.PREDICTION_INTERVAL) / 2
+    return [tail, 1.0 - tail]
+
+
+def make_xgb_quantile_regressor(**overrides):
+    # One booster predicting both interval quantiles
+    params = dict(n_estimators=config.XGB_QUANTILE_N_ESTIMATORS)
+    params.update(overrides)
+    return make_xgb_regressor(objective='reg:quantileerror',
+                              quantile_alpha=np.array(interval_quantiles()), **params)
+
+
+def calibration_split(daily):
+    # True for the rows the calibration quantile model is fit on (all but the
+    # last INTERVAL_CALIBRATION_DAYS days)
+    cut = daily['event_date'].max() - timedelta(days=config.INTERVAL_CALIBRATION_DAYS)
+    return daily['event_date'] <= cut
+
+
+def quantile_bounds(xgb_quantile, X):
+    # (rows × 2) lower/upper predictions; the two quantiles are fit jointly but
+    # can still cross, so each row is sorted
+    return np.sort(xgb_quantile.predict(X).astype(float).reshape(len(X), 2), axis=1)
+
+
+def interval_offset(cal_model, daily, features):
+    # Conformalized quantile regression: how far the quantile bounds must move
+    # outwards (inwards when negative) to cover PREDICTION_INTERVAL of the
+    # held-out days, scored with the model fit without them
+    if cal_model is None:
+        return 0.0
+    held = ~calibration_split(daily)
+    bounds = quantile_bounds(cal_model, daily.loc[held, features])
+    actual = daily.loc[held, 'yield_rate'].to_numpy(dtype=float)
+    scores = np.maximum(bounds[:, 0] - actual, actual - bounds[:, 1])
+    n = len(scores)
+    level = min(1.0, np.ceil((n + 1) * config.PREDICTION_INTERVAL) / n)
+    return float(np.quantile(scores, level, method='higher'))
+
+
+def make_rf_classifier(n_estimators=None):
+    return RandomForestClassifier(
+        n_estimators = n_estimators or config.CLF_N_ESTIMATORS,
+        max_depth    = config.CLF_MAX_DEPTH,
+        random_state = config.RF_RANDOM_STATE,
+        n_jobs       = -1
+    )
+
+
+def time_ordered_folds(dates, n_splits):
+    # Expanding-window folds over whole days: each test block is scored by a
+    # model trained on the days before it. The block just before the test
+    # block is held out for early stopping.
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    blocks = [b for b in np.array_split(np.unique(dates), n_splits + 2) if len(b)]
+    for eval_days, test_days in zip(blocks[1:], blocks[2:]):
+        train = np.flatnonzero(dates < eval_days[0])
+        eval_ = np.flatnonzero((dates >= eval_days[0]) & (dates <= eval_days[-1]))
+        test  = np.flatnonzero((dates >= test_days[0]) & (dates <= test_days[-1]))
+        yield train, eval_, test
+
+
+def cv_jobs(name, estimator, X, y, dates, scoring, sample_weight=None):
+    # "full": the KFold / StratifiedKFold splits cross_val_score(cv=5) used.
+    # "fast": time-ordered folds; early stopping only where the estimator has it.
+    if config.CV_MODE == "fast":
+        folds = time_ordered_folds(dates, config.CV_FOLDS)
+        stops_early = estimator.get_params().get('early_stopping_rounds') is not None
+    else:
+        splitter = check_cv(config.CV_FOLDS, y, classifier=is_classifier(estimator))
+        folds = ((train, None, test) for train, test in splitter.split(X, y))
+        stops_early = False
+
+    jobs = []
+    for i, (train, eval_, test) in enumerate(folds):
+        if not stops_early and eval_ is not None:
+            train, eval_ = np.sort(np.concatenate([train, eval_])), None
+        jobs.append(FitJob(f"{name}/cv{i}", estimator, X, y, sample_weight,
+                           train=train, test=test, eval=eval_, scoring=scoring))
+    return jobs
+
+
+def yield_training_data(df):
+    # Aggregate to daily level for yield model (aggregated data already is)
     # Target = daily yield rate (0.0 to 1.0)
-    daily = (
-        df.groupby(['event_date', 'sku_enc', 'vendor_enc', 'size_enc', 'line_enc',
-                    'day_of_week', 'week_of_year', 'month', 'day_of_month',
-                    'roll7_yield', 'roll14_yield', 'roll14_batch'])
-        .agg(
-            total_units   = ('is_accepted', 'count'),
-            accepted_units= ('is_accepted', 'sum')
+    if 'total_units' in df.columns:
+        daily = df.copy()
+    else:
+        daily = (
+            df.groupby(['event_date', 'sku_enc', 'vendor_enc', 'size_enc', 'line_enc',
+                        'day_of_week', 'week_of_year', 'month', 'day_of_month',
+                        'roll7_yield', 'roll14_yield', 'roll14_batch'])
+            .agg(
+                total_units   = ('is_accepted', 'count'),
+                accepted_units= ('is_accepted', 'sum')
+            )
+            .reset_index()
         )
-        .reset_index()
-    )
     daily['yield_rate'] = daily['accepted_units'] / daily['total_units']
 
     FEATURE_COLS = [
@@ -180,75 +588,87 @@ def train_yield_models(df):
         'day_of_week', 'week_of_year', 'month', 'day_of_month',
         'roll7_yield', 'roll14_yield', 'roll14_batch', 'total_units'
     ]
+    return daily, FEATURE_COLS
+
 
+def train_yield_models(df):
+    # Returns the fit jobs for the yield ensemble; train_models runs them
+    print("\n[MODEL-YIELD] Preparing yield forecasting ensemble...")
+
+    daily, FEATURE_COLS = yield_training_data(df)
     X = daily[FEATURE_COLS]
     y = daily['yield_rate']
+    dates = daily['event_date']
 
     print(f"  └─ Training on {len(X):,} daily aggregated records...")
 
-    # --- Random Forest ---
-    rf = RandomForestRegressor(
-        n_estimators = config.RF_N_ESTIMATORS,
-        max_depth    = config.RF_MAX_DEPTH,
-        random_state = config.RF_RANDOM_STATE,
-        n_jobs       = -1
-    )
-    rf.fit(X, y)
-    rf_cv = cross_val_score(rf, X, y, cv=5, scoring='neg_mean_absolute_error')
-    print(f"  └─ Random Forest | MAE (CV): {-rf_cv.mean():.4f} ± {rf_cv.std():.4f}")
-
-    # --- XGBoost ---
-    xgb_model = xgb.XGBRegressor(
-        n_estimators  = config.XGB_N_ESTIMATORS,
-        learning_rate = config.XGB_LEARNING_RATE,
-        max_depth     = config.XGB_MAX_DEPTH,
-        random_state  = config.XGB_RANDOM_STATE,
-        n_jobs        = -1,
-        verbosity     = 0
-    )
-    xgb_model.fit(X, y)
-    xgb_cv = cross_val_score(xgb_model, X, y, cv=5, scoring='neg_mean_absolute_error')
-    print(f"  └─ XGBoost       | MAE (CV): {-xgb_cv.mean():.4f} ± {xgb_cv.std():.4f}")
-
-    print(f"  └─ Ensemble weights: RF={config.RF_WEIGHT} | XGB={config.XGB_WEIGHT}")
-
-    return rf, xgb_model, FEATURE_COLS, daily
+    if config.CV_MODE == "fast":
+        rf_cv  = make_rf_regressor(config.CV_RF_N_ESTIMATORS)
+        xgb_cv = make_xgb_regressor(tree_method='hist',
+                                    early_stopping_rounds=config.CV_EARLY_STOPPING_ROUNDS)
+    else:
+        rf_cv, xgb_cv = make_rf_regressor(), make_xgb_regressor()
+
+    final = [
+        FitJob('rf', make_rf_regressor(), X, y),
+        FitJob('xgb', make_xgb_regressor(), X, y),
+        FitJob('xgb_quantile', make_xgb_quantile_regressor(), X, y),
+    ]
+    fit_part = calibration_split(daily)
+    if fit_part.any() and not fit_part.all():
+        final.append(FitJob('xgb_quantile_cal', make_xgb_quantile_regressor(), X[fit_part], y[fit_part]))
+    folds = cv_jobs('rf', rf_cv, X, y, dates, 'mae') + cv_jobs('xgb', xgb_cv, X, y, dates, 'mae')
+    return final, folds, FEATURE_COLS, daily
 
 
 # =============================================================================
 # STEP 4B — Train Rejection Reason Classifier
 # =============================================================================
-def train_rejection_classifier(df):
-    print("\n[MODEL-REJECTION] Training rejection reason classifier...")
+def primary_reasons(rej):
+    # The first stage that rejected the unit supplies the reason
+    stages = [
+        ('vqc_reason', 'vqc_status', config.VQC_REJECTED_STATUSES),
+        ('ft_reason',  'ft_status',  config.FT_REJECTED_STATUSES),
+        ('cs_reason',  'cs_status',  config.CS_REJECTED_STATUSES),
+    ]
+    return np.select(
+        [rej[reason].notna() & status_in(rej[status], rejected) for reason, status, rejected in stages],
+        [rej[reason].astype(str).str.strip() for reason, _, _ in stages],
+        default='UNKNOWN'
+    )
+
 
-    # Only rows with a rejection reason at any stage
-    # Build a unified "rejection_reason" column from whichever stage rejected
-    rej = df[df['is_rejected'] == 1].copy()
+def train_rejection_classifier(df, reasons=None):
+    # Returns the fit jobs for the classifier (none when there is too little data)
+    print("\n[MODEL-REJECTION] Preparing rejection reason classifier...")
 
-    def get_primary_reason(row):
-        if pd.notna(row['vqc_reason']) and str(row['vqc_status']).upper() in config.VQC_REJECTED_STATUSES:
-            return str(row['vqc_reason']).strip()
-        if pd.notna(row['ft_reason']) and str(row['ft_status']).upper() in config.FT_REJECTED_STATUSES:
-            return str(row['ft_reason']).strip()
-        if pd.notna(row['cs_reason']) and str(row['cs_status']).upper() in config.CS_REJECTED_STATUSES:
-            return str(row['cs_reason']).strip()
-        return 'UNKNOWN'
+    FEATURE_COLS_CLF = [
+        'sku_enc', 'vendor_enc', 'size_enc', 'line_enc',
+        'day_of_week', 'month', 'roll14_yield'
+    ]
 
-    rej['primary_reason'] = rej.apply(get_primary_reason, axis=1)
+    if reasons is None:
+        # Only rows with a rejection reason at any stage
+        # Build a unified "rejection_reason" column from whichever stage rejected
+        rej = df[df['is_rejected'] == 1].copy()
+
+        rej['primary_reason'] = primary_reasons(rej)
+        rej['reason_count'] = 1
+    else:
+        # Aggregated mode: one row per combo-day and reason, weighted by its unit count
+        keys = ['event_date', 'line', 'sku', 'size', 'vendor']
+        rej = reasons.assign(event_date=pd.to_datetime(reasons['event_date'])).merge(
+            df[keys + FEATURE_COLS_CLF], on=keys, how='inner'
+        )
 
     # Drop rare reasons (< 5 occurrences) — too sparse to learn from
-    reason_counts = rej['primary_reason'].value_counts()
+    reason_counts = rej.groupby('primary_reason')['reason_count'].sum()
     valid_reasons = reason_counts[reason_counts >= 5].index
     rej = rej[rej['primary_reason'].isin(valid_reasons)]
 
-    if len(rej) < 50:
+    if rej['reason_count'].sum() < 50:
         print("  └─ Not enough rejection data to train classifier. Skipping.")
-        return None, None, None
-
-    FEATURE_COLS_CLF = [
-        'sku_enc', 'vendor_enc', 'size_enc', 'line_enc',
-        'day_of_week', 'month', 'roll14_yield'
-    ]
+        return [], [], None, None
 
     X_clf = rej[FEATURE_COLS_CLF]
     y_clf = rej['primary_reason']
@@ -256,39 +676,220 @@ def train_rejection_classifier(df):
     le_reason = LabelEncoder()
     y_enc = le_reason.fit_transform(y_clf)
 
-    clf = RandomForestClassifier(
-        n_estimators = config.RF_N_ESTIMATORS,
-        max_depth    = config.RF_MAX_DEPTH,
-        random_state = config.RF_RANDOM_STATE,
-        n_jobs       = -1
-    )
-    clf.fit(X_clf, y_enc)
+    # Row-level data needs no weights; aggregated rows count as reason_count units
+    weights = None if reasons is None else rej['reason_count'].to_numpy()
+    clf_cv = make_rf_classifier(config.CV_RF_N_ESTIMATORS if config.CV_MODE == "fast" else None)
 
-    clf_cv = cross_val_score(clf, X_clf, y_enc, cv=5, scoring='accuracy')
-    print(f"  └─ Classifier Accuracy (CV): {clf_cv.mean():.2%} ± {clf_cv.std():.2%}")
+    final = [FitJob('clf', make_rf_classifier(), X_clf, y_enc, weights)]
+    folds = cv_jobs('clf', clf_cv, X_clf, y_enc, rej['event_date'], 'accuracy', weights)
     print(f"  └─ Rejection reason classes: {len(le_reason.classes_)}")
+    return final, folds, le_reason, FEATURE_COLS_CLF
 
-    return clf, le_reason, FEATURE_COLS_CLF
+
+# =============================================================================
+# STEP 4C — Fit Everything
+# =============================================================================
+def train_models(df, reasons=None):
+    # The three final fits and every CV fold are independent; run them together
+    yield_final, yield_folds, yield_features, daily = train_yield_models(df)
+    clf_final, clf_folds, le_reason, clf_features = train_rejection_classifier(df, reasons)
+
+    print(f"\n[MODEL] Fitting models ({config.CV_MODE} CV)...")
+    results, seconds = run_jobs(yield_final + clf_final + yield_folds + clf_folds, config.TRAIN_CORES)
+
+    cv_mae = {}
+    for name, label in [('rf', 'Random Forest'), ('xgb', 'XGBoost      ')]:
+        cv = fold_scores(results, name)
+        cv_mae[name] = cv.mean()
+        print(f"  └─ {label} | MAE (CV): {cv.mean():.4f} ± {cv.std():.4f} "
+              f"| fit {seconds[name]:.1f}s, folds {sum(v for k, v in seconds.items() if k.startswith(name + '/')):.1f}s")
+    print(f"  └─ Ensemble weights: RF={config.RF_WEIGHT} | XGB={config.XGB_WEIGHT}")
+    offset = interval_offset(results.get('xgb_quantile_cal'), daily, yield_features)
+    print(f"  └─ Interval calibration offset: {offset:+.4f}")
+
+    clf = results.get('clf')
+    if clf is not None:
+        cv = fold_scores(results, 'clf')
+        print(f"  └─ Classifier Accuracy (CV): {cv.mean():.2%} ± {cv.std():.2%} "
+              f"| fit {seconds['clf']:.1f}s, folds {sum(v for k, v in seconds.items() if k.startswith('clf/')):.1f}s")
+
+    return {
+        'rf': results['rf'], 'xgb': results['xgb'], 'xgb_quantile': results['xgb_quantile'],
+        'interval_offset': offset,
+        'clf': clf, 'le_reason': le_reason,
+        'yield_features': yield_features, 'clf_features': clf_features,
+        # Expected ensemble error on unseen days; warm updates are checked against it
+        'reference_mae': float(config.RF_WEIGHT * cv_mae['rf'] + config.XGB_WEIGHT * cv_mae['xgb']),
+    }
+
+
+# =============================================================================
+# STEP 4D — Incremental Updates (model registry)
+# =============================================================================
+def model_settings():
+    # A change to any of these invalidates the registered models
+    names = ['TRAINING_MODE', 'RF_N_ESTIMATORS', 'RF_MAX_DEPTH', 'RF_RANDOM_STATE',
+             'XGB_N_ESTIMATORS', 'XGB_LEARNING_RATE', 'XGB_MAX_DEPTH', 'XGB_RANDOM_STATE',
+             'CLF_N_ESTIMATORS', 'CLF_MAX_DEPTH', 'PREDICTION_INTERVAL',
+             'XGB_QUANTILE_N_ESTIMATORS', 'INTERVAL_CALIBRATION_DAYS']
+    return {name: getattr(config, name) for name in names}
+
+
+def day_fingerprints(*frames):
+    # One hash per event_date over every row and column of the loaded data
+    # (before feature engineering): a day whose rows change in any way differs
+    prints = {}
+    for i, frame in enumerate(frames):
+        if frame is None or not len(frame):
+            continue
+        hashes = pd.Series(pd.util.hash_pandas_object(frame, index=False).to_numpy())
+        days = pd.to_datetime(frame['event_date']).dt.normalize().to_numpy()
+        for day, value in hashes.groupby(days).sum().items():
+            key = day.date().isoformat()
+            prints[key] = prints.get(key, '') + f"{i}:{value:016x};"
+    return prints
+
+
+def encoder_classes(encoders):
+    return {col: [str(c) for c in le.classes_] for col, le in encoders.items()}
+
+
+def plan_update(meta, prints, classes, force_full=False):
+    # ("full" | "warm" | "skip", reason, new days) from the registered version's
+    # fingerprints; the drift check for "warm" needs the models and happens later
+    if force_full:
+        return 'full', 'full retrain requested', []
+    if meta is None:
+        return 'full', 'no registered model', []
+    if meta['settings'] != model_settings():
+        return 'full', 'model settings changed', []
+    # New categories are fine as long as every known one keeps its code
+    if any(classes.get(col, [])[:len(known)] != known for col, known in meta['encoder_classes'].items()):
+        return 'full', 'category encoding changed', []
+
+    stored = meta.get('day_fingerprints')
+    if not stored:
+        return 'full', 'no fingerprints', []
+    trained_through = max(stored)
+    changed = [day for day, value in prints.items() if day <= trained_through and stored.get(day) != value]
+    if changed:
+        return 'full', f'{len(changed)} already-trained day(s) changed', []
+
+    new_days = sorted(day for day in prints if day > trained_through)
+    if not new_days:
+        return 'skip', 'training data unchanged', []
+
+    age = datetime.now() - datetime.fromisoformat(meta['last_full_at'])
+    if age >= timedelta(days=config.FULL_RETRAIN_EVERY_DAYS):
+        return 'full', f'scheduled (last full retrain {age.days}d ago)', []
+    return 'warm', f'{len(new_days)} new day(s)', new_days
+
+
+def ensemble_mae(models, daily):
+    X = daily[models['yield_features']]
+    predicted = config.RF_WEIGHT * models['rf'].predict(X) + config.XGB_WEIGHT * models['xgb'].predict(X)
+    return float(mean_absolute_error(daily['yield_rate'], predicted))
+
+
+def warm_start_models(models, daily, new_days):
+    # Fit on the new days plus the WARM_START_WINDOW_DAYS before them
+    window_start = pd.Timestamp(new_days[0]) - timedelta(days=config.WARM_START_WINDOW_DAYS)
+    recent = daily[daily['event_date'] >= window_start]
+    X, y = recent[models['yield_features']], recent['yield_rate']
+    print(f"  └─ Warm-starting on {len(recent):,} daily records since {window_start.date()}...")
+
+    # XGBoost (point and quantile): append boosting rounds to the registered boosters.
+    # The interval's calibration offset is kept until the next full retrain.
+    for name, make in [('xgb', make_xgb_regressor), ('xgb_quantile', make_xgb_quantile_regressor)]:
+        booster = make(n_estimators=config.WARM_START_XGB_TREES)
+        booster.fit(X, y, xgb_model=models[name].get_booster())
+        models[name] = booster
+
+    # Random Forest: grow fresh trees on the recent window and retire as many of the oldest
+    rf = models['rf']
+    added = config.WARM_START_RF_TREES
+    rf.set_params(warm_start=True, n_estimators=len(rf.estimators_) + added, n_jobs=-1)
+    rf.fit(X, y)
+    rf.estimators_ = rf.estimators_[added:]
+    rf.set_params(warm_start=False, n_estimators=len(rf.estimators_))
+
+    # The rejection classifier is kept until the next full retrain
+    return models
+
+
+def update_models(df, reasons, encoders, prints, force_full=False):
+    # Retrain, warm-start, or reuse the registered models depending on what
+    # changed in the training data (`prints`, from day_fingerprints) since they were fit
+    registry = ModelRegistry(config.MODEL_REGISTRY_DIR, keep=config.MODEL_REGISTRY_KEEP)
+    version, meta = registry.current()
+    classes = encoder_classes(encoders)
+    plan, why, new_days = plan_update(meta, prints, classes, force_full)
+
+    if plan != 'full':
+        models = registry.load(version)
+    if plan == 'warm':
+        daily, _ = yield_training_data(df)
+        unseen = daily[daily['event_date'].dt.strftime('%Y-%m-%d').isin(new_days)]
+        mae = ensemble_mae(models, unseen)
+        if mae > meta['reference_mae'] * (1 + config.MODEL_DRIFT_TOLERANCE):
+            plan, why = 'full', f"MAE on new days {mae:.4f} drifted past reference {meta['reference_mae']:.4f}"
+
+    print(f"\n[MODEL] Update plan: {plan} ({why})")
+    if plan == 'skip':
+        print(f"  └─ Reusing model version {version}")
+        return models
+
+    if plan == 'warm':
+        models = warm_start_models(models, daily, new_days)
+        meta = dict(meta, kind='warm', base_version=version, new_days_mae=mae)
+    else:
+        models = train_models(df, reasons)
+        meta = {
+            'kind': 'full', 'base_version': None, 'settings': model_settings(),
+            'last_full_at': datetime.now().isoformat(timespec='seconds'),
+            'reference_mae': models['reference_mae'],
+        }
+    meta['day_fingerprints'] = prints
+    meta['encoder_classes'] = classes
+    new_version = registry.save(models, meta)
+    print(f"  └─ Registered model version {new_version}")
+    if config.EXPORT_COMPACT_MODELS:
+        # Array-based copy for serving: memory-mappable, no unpickling
+        export_ensemble(models, os.path.join(registry.directory, new_version, 'compact'))
+    return models
 
 
 # =============================================================================
 # STEP 5 — Build Forecast Rows for Next 7 Days
 # =============================================================================
-def build_forecast(df, batch_daily, rf, xgb_model, clf, le_reason,
+def rf_tree_predictions(rf, X):
+    # (rows × trees) matrix of every tree's prediction; its row mean is rf.predict(X)
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    return np.column_stack([tree.predict(X, check_input=False) for tree in rf.estimators_])
+
+
+def latest_daily_stats(df):
+    # Rolling stats of each SKU+Vendor's last day; they are per day, so any row
+    # of that day will do
+    latest_rows = df.groupby(['sku', 'vendor'], observed=True)['event_date'].idxmax()
+    return df.loc[latest_rows, ['sku', 'vendor', 'roll7_yield', 'roll14_yield', 'roll14_batch']]
+
+
+def build_forecast(df, batch_daily, rf, xgb_model, xgb_quantile, interval_offset, clf, le_reason,
                    yield_features, clf_features, encoders):
     print(f"\n[FORECAST] Generating {config.FORECAST_DAYS}-day forecast...")
 
     # 1. Filter combos: Suppress rare/inactive SKUs
     # Calculate total frequency per combo
     freq = (
-        df.groupby(['sku', 'vendor', 'size', 'line'])
-        .size()
+        unit_counts(df).groupby([df['sku'], df['vendor'], df['size'], df['line']], observed=True)
+        .sum()
         .reset_index(name='total_freq')
     )
     
     # Calculate recency per combo (last seen date)
     recency = (
-        df.groupby(['sku', 'vendor', 'size', 'line'])['event_date']
+        df.groupby(['sku', 'vendor', 'size', 'line'], observed=True)['event_date']
         .max()
         .reset_index(name='last_seen')
     )
@@ -320,12 +921,7 @@ def build_forecast(df, batch_daily, rf, xgb_model, clf, le_reason,
     print(f"  └─ (Thresholds: Recency >= {config.SUPPRESS_RARE_THRESHOLD_DAYS}d, Freq >= {config.MIN_FREQUENCY_TOTAL})")
 
     # Latest rolling stats per SKU+Vendor (from the last day in training data)
-    latest_stats = (
-        df.groupby(['sku', 'vendor'])
-        .apply(lambda g: g.sort_values('event_date').iloc[-1])
-        .reset_index(drop=True)
-        [['sku', 'vendor', 'roll7_yield', 'roll14_yield', 'roll14_batch']]
-    )
+    latest_stats = latest_daily_stats(df)
 
     # Estimate batch qty per SKU+Vendor: rolling 14-day average
     last_14 = batch_daily[
@@ -334,7 +930,7 @@ def build_forecast(df, batch_daily, rf, xgb_model, clf, le_reason,
         )
     ]
     avg_batch = (
-        last_14.groupby(['sku', 'vendor'])['batch_size']
+        last_14.groupby(['sku', 'vendor'], observed=True)['batch_size']
         .mean()
         .reset_index(name='predicted_batch_qty')
     )
@@ -344,109 +940,118 @@ def build_forecast(df, batch_daily, rf, xgb_model, clf, le_reason,
     combos = combos.merge(avg_batch, on=['sku', 'vendor'], how='left')
 
     # Fallback fills
-    combos['roll7_yield']         = combos['roll7_yield'].fillna(df['is_accepted'].mean())
-    combos['roll14_yield']        = combos['roll14_yield'].fillna(df['is_accepted'].mean())
-    combos['roll14_batch']        = combos['roll14_batch'].fillna(df['batch_size'].mean())
+    units      = unit_counts(df)
+    has_batch  = df['batch_size'].notna()
+    mean_batch = (df['batch_size'][has_batch] * units[has_batch]).sum() / units[has_batch].sum()
+    combos['roll7_yield']         = combos['roll7_yield'].fillna(overall_yield(df))
+    combos['roll14_yield']        = combos['roll14_yield'].fillna(overall_yield(df))
+    combos['roll14_batch']        = combos['roll14_batch'].fillna(mean_batch)
     combos['predicted_batch_qty'] = combos['predicted_batch_qty'].fillna(combos['roll14_batch'])
 
-    forecast_rows = []
+    # One feature row per (day, combo), day-major as the table has always been written
     base_date = pd.to_datetime(config.TRAIN_END_DATE) + timedelta(days=1)
+    forecast_dates = pd.date_range(base_date, periods=config.FORECAST_DAYS, freq='D')
+    days = pd.DataFrame({
+        'forecast_date': forecast_dates,
+        'day_of_week'  : forecast_dates.dayofweek,
+        'week_of_year' : forecast_dates.isocalendar().week.astype(int).to_numpy(),
+        'month'        : forecast_dates.month,
+        'day_of_month' : forecast_dates.day,
+    })
+    grid = days.merge(combos, how='cross')
+    grid['total_units'] = grid['predicted_batch_qty']
+
+    # Ensemble yield prediction — one predict call per model for the whole horizon
+    X_yield    = grid[yield_features]
+    rf_pred    = rf_tree_predictions(rf, X_yield).mean(axis=1)
+    xgb_pred   = xgb_model.predict(X_yield).astype(float)
+    ensemble_yield = np.clip(config.RF_WEIGHT * rf_pred + config.XGB_WEIGHT * xgb_pred, 0.0, 1.0)
+
+    # Prediction interval: the quantile booster's bounds, moved by the offset
+    # calibrated on held-out days (interval_offset). The point forecast comes
+    # from other models, so the bounds are widened to contain it.
+    bounds = quantile_bounds(xgb_quantile, X_yield)
+    yield_lower = np.clip(np.minimum(bounds[:, 0] - interval_offset, ensemble_yield), 0.0, 1.0)
+    yield_upper = np.clip(np.maximum(bounds[:, 1] + interval_offset, ensemble_yield), 0.0, 1.0)
+
+    # Confidence: the narrower the calibrated interval, the more confident
+    confidence = 1.0 - (yield_upper - yield_lower)
+
+    # Rejection reason prediction, padded with N/A when there are fewer classes than TOP_N
+    top_n = config.TOP_N_REJECTION_REASONS
+    reason_names = np.full((len(grid), top_n), "N/A", dtype=object)
+    reason_probs = np.zeros((len(grid), top_n))
+
+    if clf is not None:
+        # The classifier's only time-varying inputs are day_of_week and month, so
+        # each distinct (combo, day_of_week, month) row is scored once
+        X_clf = grid[clf_features]
+        group_ids = X_clf.groupby(clf_features, sort=False).ngroup().to_numpy()
+        proba = clf.predict_proba(X_clf.drop_duplicates())[group_ids]
+
+        k = min(top_n, proba.shape[1])
+        top_idx = np.argpartition(-proba, k - 1, axis=1)[:, :k]
+        top_proba = np.take_along_axis(proba, top_idx, axis=1)
+        order = np.argsort(-top_proba, axis=1, kind='stable')
+        top_idx = np.take_along_axis(top_idx, order, axis=1)
+
+        reason_names[:, :k] = le_reason.classes_[top_idx]
+        reason_probs[:, :k] = np.take_along_axis(top_proba, order, axis=1).round(4)
+
+    forecast_df = pd.DataFrame({
+        "forecast_date"          : grid['forecast_date'].dt.date,
+        "sku"                    : grid['sku'].astype(object),
+        "vendor"                 : grid['vendor'].astype(object),
+        "size"                   : grid['size'].astype(object),
+        "line"                   : grid['line'].astype(object),
+        "predicted_batch_qty"    : grid['predicted_batch_qty'].round().astype(int),
+        "forecasted_yield_rate"  : ensemble_yield.round(4),
+        "forecasted_good_units"  : np.round(ensemble_yield * grid['predicted_batch_qty']).astype(int),
+        "yield_lower"            : yield_lower.round(4),
+        "yield_upper"            : yield_upper.round(4),
+        "good_units_lower"       : np.round(yield_lower * grid['predicted_batch_qty']).astype(int),
+        "good_units_upper"       : np.round(yield_upper * grid['predicted_batch_qty']).astype(int),
+        "rf_yield_prediction"    : np.clip(rf_pred, 0, 1).round(4),
+        "xgb_yield_prediction"   : np.clip(xgb_pred, 0, 1).round(4),
+        "model_confidence"       : confidence.round(4),
+        "top_rejection_reason_1" : reason_names[:, 0],
+        "rejection_prob_1"       : reason_probs[:, 0],
+        "top_rejection_reason_2" : reason_names[:, 1],
+        "rejection_prob_2"       : reason_probs[:, 1],
+        "top_rejection_reason_3" : reason_names[:, 2],
+        "rejection_prob_3"       : reason_probs[:, 2],
+        "generated_at"           : datetime.utcnow()
+    })
 
-    for day_offset in range(config.FORECAST_DAYS):
-        forecast_date = base_date + timedelta(days=day_offset)
-        dow  = forecast_date.dayofweek
-        week = forecast_date.isocalendar()[1]
-        mon  = forecast_date.month
-        dom  = forecast_date.day
-
-        for _, combo in combos.iterrows():
-            feat_yield = pd.DataFrame([{
-                'sku_enc'       : combo['sku_enc'],
-                'vendor_enc'    : combo['vendor_enc'],
-                'size_enc'      : combo['size_enc'],
-                'line_enc'      : combo['line_enc'],
-                'day_of_week'   : dow,
-                'week_of_year'  : week,
-                'month'         : mon,
-                'day_of_month'  : dom,
-                'roll7_yield'   : combo['roll7_yield'],
-                'roll14_yield'  : combo['roll14_yield'],
-                'roll14_batch'  : combo['roll14_batch'],
-                'total_units'   : combo['predicted_batch_qty']
-            }])
-
-            # Ensemble yield prediction
-            rf_pred  = rf.predict(feat_yield)[0]
-            xgb_pred = xgb_model.predict(feat_yield)[0]
-            ensemble_yield = (
-                config.RF_WEIGHT * rf_pred +
-                config.XGB_WEIGHT * xgb_pred
-            )
-            # Clamp to [0, 1]
-            ensemble_yield = float(np.clip(ensemble_yield, 0.0, 1.0))
-            predicted_good_units = round(ensemble_yield * combo['predicted_batch_qty'])
-
-            # Confidence: how close are RF and XGB? Closer = more confident
-            model_agreement = 1.0 - abs(rf_pred - xgb_pred)
-            confidence = round(float(np.clip(model_agreement, 0.0, 1.0)), 4)
-
-            # Rejection reason prediction
-            top_reasons = [{
-                "reason": "N/A", "probability": 0.0
-            }] * config.TOP_N_REJECTION_REASONS
-
-            if clf is not None:
-                feat_clf = pd.DataFrame([{
-                    'sku_enc'     : combo['sku_enc'],
-                    'vendor_enc'  : combo['vendor_enc'],
-                    'size_enc'    : combo['size_enc'],
-                    'line_enc'    : combo['line_enc'],
-                    'day_of_week' : dow,
-                    'month'       : mon,
-                    'roll14_yield': combo['roll14_yield']
-                }])
-                proba = clf.predict_proba(feat_clf)[0]
-                top_idx = np.argsort(proba)[::-1][:config.TOP_N_REJECTION_REASONS]
-                top_reasons = [
-                    {"reason": le_reason.classes_[i], "probability": round(float(proba[i]), 4)}
-                    for i in top_idx
-                ]
-                # Pad if fewer reasons than TOP_N
-                while len(top_reasons) < config.TOP_N_REJECTION_REASONS:
-                    top_reasons.append({"reason": "N/A", "probability": 0.0})
-
-            row = {
-                "forecast_date"          : forecast_date.date(),
-                "sku"                    : combo['sku'],
-                "vendor"                 : combo['vendor'],
-                "size"                   : combo['size'],
-                "line"                   : combo['line'],
-                "predicted_batch_qty"    : int(round(combo['predicted_batch_qty'])),
-                "forecasted_yield_rate"  : round(ensemble_yield, 4),
-                "forecasted_good_units"  : int(predicted_good_units),
-                "rf_yield_prediction"    : round(float(np.clip(rf_pred, 0, 1)), 4),
-                "xgb_yield_prediction"   : round(float(np.clip(xgb_pred, 0, 1)), 4),
-                "model_confidence"       : confidence,
-                "top_rejection_reason_1" : top_reasons[0]["reason"],
-                "rejection_prob_1"       : top_reasons[0]["probability"],
-                "top_rejection_reason_2" : top_reasons[1]["reason"],
-                "rejection_prob_2"       : top_reasons[1]["probability"],
-                "top_rejection_reason_3" : top_reasons[2]["reason"],
-                "rejection_prob_3"       : top_reasons[2]["probability"],
-                "generated_at"           : datetime.utcnow()
-            }
-            forecast_rows.append(row)
-
-    forecast_df = pd.DataFrame(forecast_rows)
     print(f"  └─ Generated {len(forecast_df):,} forecast rows "
           f"({config.FORECAST_DAYS} days × {len(combos)} combos).")
     return forecast_df
 
 
+FORECAST_KEY_COLS = ["forecast_date", "sku", "vendor", "size", "line"]
+
+
+def forecast_reasons(forecast_df):
+    # Long format of the top_rejection_reason_N / rejection_prob_N columns:
+    # one row per predicted reason, N/A padding dropped
+    top_n = config.TOP_N_REJECTION_REASONS
+    reasons = pd.concat([
+        forecast_df[FORECAST_KEY_COLS].assign(
+            reason_rank=rank,
+            reason=forecast_df[f"top_rejection_reason_{rank}"],
+            probability=forecast_df[f"rejection_prob_{rank}"],
+        )
+        for rank in range(1, top_n + 1)
+    ], ignore_index=True)
+    reasons = reasons[reasons['reason'] != "N/A"].reset_index(drop=True)
+    reasons['generated_at'] = forecast_df['generated_at'].iloc[0] if len(forecast_df) else datetime.utcnow()
+    return reasons
+
+
 # =============================================================================
 # STEP 6 — Write Forecast to BigQuery
 # =============================================================================
-def write_to_bigquery(client, forecast_df):
+def write_to_bigquery(client, forecast_df, reasons_df):
     print(f"\n[BQ] Writing forecast to `{config.TABLE_FORECAST}`...")
 
     schema = [
@@ -458,6 +1063,10 @@ def write_to_bigquery(client, forecast_df):
         bigquery.SchemaField("predicted_batch_qty",    "INTEGER"),
         bigquery.SchemaField("forecasted_yield_rate",  "FLOAT"),
         bigquery.SchemaField("forecasted_good_units",  "INTEGER"),
+        bigquery.SchemaField("yield_lower",            "FLOAT"),
+        bigquery.SchemaField("yield_upper",            "FLOAT"),
+        bigquery.SchemaField("good_units_lower",       "INTEGER"),
+        bigquery.SchemaField("good_units_upper",       "INTEGER"),
         bigquery.SchemaField("rf_yield_prediction",    "FLOAT"),
         bigquery.SchemaField("xgb_yield_prediction",   "FLOAT"),
         bigquery.SchemaField("model_confidence",       "FLOAT"),
@@ -483,6 +1092,39 @@ def write_to_bigquery(client, forecast_df):
     job.result()  # Wait for job to finish
     print(f"  └─ Successfully written {len(forecast_df):,} rows to BigQuery.")
 
+    reasons_schema = [
+        bigquery.SchemaField("forecast_date", "DATE"),
+        bigquery.SchemaField("sku",           "STRING"),
+        bigquery.SchemaField("vendor",        "STRING"),
+        bigquery.SchemaField("size",          "STRING"),
+        bigquery.SchemaField("line",          "STRING"),
+        bigquery.SchemaField("reason_rank",   "INTEGER"),
+        bigquery.SchemaField("reason",        "STRING"),
+        bigquery.SchemaField("probability",   "FLOAT"),
+        bigquery.SchemaField("generated_at",  "DATETIME"),
+    ]
+    job = client.load_table_from_dataframe(
+        reasons_df,
+        config.TABLE_FORECAST_REASONS,
+        job_config=bigquery.LoadJobConfig(
+            schema=reasons_schema,
+            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+        ),
+    )
+    job.result()
+    print(f"  └─ Successfully written {len(reasons_df):,} rows to `{config.TABLE_FORECAST_REASONS}`.")
+
+
+def write_forecast_artifact(forecast_df, reasons_df, directory):
+    # Parquet copies of both tables. Each file is written under a temporary
+    # name and renamed, so a reader never sees a half-written forecast.
+    os.makedirs(directory, exist_ok=True)
+    for name, frame in [("forecast", forecast_df), ("forecast_reasons", reasons_df)]:
+        path = os.path.join(directory, f"{name}.parquet")
+        frame.to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+    print(f"  └─ Forecast artifact written to {directory}/")
+
 
 # =============================================================================
 # STEP 7 — Create BigQuery View for Dashboard
@@ -502,6 +1144,10 @@ def create_dashboard_view(client):
             ROUND(forecasted_yield_rate * 100, 2)   AS forecasted_yield_pct,
             forecasted_good_units,
             predicted_batch_qty - forecasted_good_units AS forecasted_rejection_units,
+            ROUND(yield_lower * 100, 2)             AS yield_lower_pct,
+            ROUND(yield_upper * 100, 2)             AS yield_upper_pct,
+            good_units_lower,
+            good_units_upper,
             ROUND(rf_yield_prediction * 100, 2)     AS rf_yield_pct,
             ROUND(xgb_yield_prediction * 100, 2)    AS xgb_yield_pct,
             ROUND(model_confidence * 100, 2)        AS model_confidence_pct,
@@ -513,7 +1159,6 @@ def create_dashboard_view(client):
             ROUND(rejection_prob_3 * 100, 2)        AS rejection_prob_3_pct,
             generated_at
         FROM `{config.TABLE_FORECAST}`
-        ORDER BY forecast_date, sku, vendor
     """
 
     view = bigquery.Table(view_id)
@@ -530,48 +1175,85 @@ def create_dashboard_view(client):
 # =============================================================================
 # MAIN — Orchestrator
 # =============================================================================
-def main():
+def load_training_data(client, timer):
+    # Load + feature-engineer for the configured TRAINING_MODE. Also returns the
+    # per-day fingerprints of the loaded data (taken before engineering, which
+    # works in place).
+    df_reasons = None
+    if config.TRAINING_MODE == "aggregated":
+        with timer.stage("load"):
+            if config.FEATURE_STORE_DIR:
+                df_units, df_reasons, daily_stats = load_from_feature_store(client, FeatureStore(config.FEATURE_STORE_DIR))
+            else:
+                df_units, df_reasons = load_aggregated_data(client)
+                daily_stats = None
+            prints = day_fingerprints(df_units, df_reasons)
+        with timer.stage("features"):
+            df, batch_daily = engineer_aggregated_features(df_units, daily_stats)
+    else:
+        with timer.stage("load"):
+            df_raw = load_data(client)
+            prints = day_fingerprints(df_raw)
+        with timer.stage("features"):
+            df, batch_daily = engineer_features(df_raw)
+    return df, batch_daily, df_reasons, prints
+
+
+def load_tuned_profile(path):
+    # Settings chosen by tune.py override the values in config.py
+    with open(path) as f:
+        settings = json.load(f)['settings']
+    for name, value in settings.items():
+        if not hasattr(config, name):
+            raise ValueError(f"Tuned profile {path} sets unknown config setting {name}")
+        setattr(config, name, value)
+    print(f"[CONFIG] Loaded tuned profile {path}: {settings}")
+
+
+def main(force_full=False):
     print("=" * 65)
     print("  PRODUCTION FORECAST PIPELINE")
     print(f"  Training window : {config.TRAIN_START_DATE} → {config.TRAIN_END_DATE}")
     print(f"  Forecast horizon: Next {config.FORECAST_DAYS} days")
+    print(f"  Training mode   : {config.TRAINING_MODE}")
     print("=" * 65)
 
     start_time = datetime.now()
+    timer = StageTimer()
 
     # 0. Connect
     client = get_bq_client()
 
-    # 1. Load
-    df_raw = load_data(client)
-
-    # 2. Feature engineering
-    df, batch_daily = engineer_features(df_raw)
+    # 1. Load + 2. Feature engineering
+    df, batch_daily, df_reasons, prints = load_training_data(client, timer)
 
     # 3. Encode
-    df, encoders = encode_categoricals(df)
-
-    # 4a. Train yield ensemble
-    rf, xgb_model, yield_features, daily_agg = train_yield_models(df)
+    with timer.stage("encode"):
+        df, encoders = encode_categoricals(df)
 
-    # 4b. Train rejection classifier
-    clf, le_reason, clf_features = train_rejection_classifier(df)
+    # 4. Train (or warm-start / reuse) yield ensemble + rejection classifier
+    with timer.stage("train"):
+        models = update_models(df, df_reasons, encoders, prints, force_full)
 
     # 5. Build 7-day forecast
-    forecast_df = build_forecast(
-        df, batch_daily,
-        rf, xgb_model,
-        clf, le_reason,
-        yield_features, clf_features,
-        encoders
-    )
-
-    # 6. Write to BigQuery
-    write_to_bigquery(client, forecast_df)
+    with timer.stage("forecast"):
+        forecast_df = build_forecast(
+            df, batch_daily,
+            models['rf'], models['xgb'], models['xgb_quantile'], models.get('interval_offset', 0.0),
+            models['clf'], models['le_reason'],
+            models['yield_features'], models['clf_features'],
+            encoders
+        )
 
-    # 7. Create/replace dashboard view
-    create_dashboard_view(client)
+    # 6. Write to BigQuery + 7. Create/replace dashboard view
+    with timer.stage("write"):
+        reasons_df = forecast_reasons(forecast_df)
+        write_to_bigquery(client, forecast_df, reasons_df)
+        create_dashboard_view(client)
+        if config.FORECAST_ARTIFACT_DIR:
+            write_forecast_artifact(forecast_df, reasons_df, config.FORECAST_ARTIFACT_DIR)
 
+    timer.report()
     elapsed = (datetime.now() - start_time).total_seconds()
     print(f"\n{'=' * 65}")
     print(f"  Pipeline complete in {elapsed:.1f}s")
@@ -580,4 +1262,19 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the forecast models and write the 7-day forecast.")
+    parser.add_argument("--full-retrain", action="store_true", help="retrain from scratch even if the data is unchanged")
+    parser.add_argument("--rollback", nargs="?", const="", metavar="VERSION",
+                        help="point the registry back at VERSION (default: the previous one) and exit")
+    parser.add_argument("--profile", default=config.TUNED_PROFILE, metavar="PATH",
+                        help="tuned settings written by tune.py (default: config.TUNED_PROFILE)")
+    args = parser.parse_args()
+
+    if args.profile and os.path.exists(args.profile):
+        load_tuned_profile(args.profile)
+
+    if args.rollback is not None:
+        registry = ModelRegistry(config.MODEL_REGISTRY_DIR)
+        print(f"[MODEL] Registry now at {registry.rollback(args.rollback or None)}")
+    else:
+        main(force_full=args.full_retrain)
\ No newline at end of file
@@ -0,0 +1,224 @@
+# =============================================================================
+# tune.py — Successive-halving search over the model settings in config.py
+# Run: python tune.py                       (training data from BigQuery)
+#      python tune.py --parquet fixture.parquet --candidates 27
+#
+# Each model (yield RF, yield XGB, reason classifier) gets a random sample of
+# settings plus the current config. Every round scores the survivors on the
+# time-ordered CV folds, using a growing share of the training rows. Only the
+# best 1/ETA of them go on to the next round. XGB candidates stop early, and
+# the winner's tree count is the round it stopped at.
+#
+# Candidates are ranked by a combined objective against the current config:
+#   error / base_error + LATENCY_WEIGHT × latency / base_latency
+#                      + SIZE_WEIGHT × size / base_size
+# The winners are written to config.TUNED_PROFILE, which train.py applies
+# over config.py.
+# =============================================================================
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import pickle
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+import config
+import train
+from orchestrator import SCORERS, StageTimer
+
+SEARCH_SPACE = {
+    "rf": {
+        "RF_N_ESTIMATORS": [50, 100, 200, 400, 1000],
+        "RF_MAX_DEPTH":    [6, 8, 10, 12, 16],
+    },
+    "xgb": {
+        "XGB_N_ESTIMATORS":  [2000],   # cap; early stopping picks the count
+        "XGB_LEARNING_RATE": [0.01, 0.03, 0.05, 0.1, 0.2],
+        "XGB_MAX_DEPTH":     [3, 4, 6, 8, 10],
+    },
+    "clf": {
+        "CLF_N_ESTIMATORS": [50, 100, 200, 400, 1000],
+        "CLF_MAX_DEPTH":    [6, 8, 10, 12, 16],
+    },
+}
+
+ETA = 3
+
+
+def make_estimator(family, settings):
+    if family == "rf":
+        return train.RandomForestRegressor(
+            n_estimators=settings["RF_N_ESTIMATORS"], max_depth=settings["RF_MAX_DEPTH"],
+            random_state=config.RF_RANDOM_STATE)
+    if family == "xgb":
+        return train.make_xgb_regressor(
+            n_estimators=settings["XGB_N_ESTIMATORS"], learning_rate=settings["XGB_LEARNING_RATE"],
+            max_depth=settings["XGB_MAX_DEPTH"], tree_method="hist",
+            early_stopping_rounds=config.CV_EARLY_STOPPING_ROUNDS)
+    return train.RandomForestClassifier(
+        n_estimators=settings["CLF_N_ESTIMATORS"], max_depth=settings["CLF_MAX_DEPTH"],
+        random_state=config.RF_RANDOM_STATE)
+
+
+def evaluate(family, settings, fold, fraction, threads):
+    # Fit one candidate on `fraction` of a fold's training rows; returns its
+    # error, predict latency (ms per 1k rows), pickled size and tree count
+    estimator = make_estimator(family, settings).set_params(n_jobs=threads)
+    rng = np.random.default_rng(0)
+    rows = fold.train if fraction >= 1 else np.sort(
+        rng.choice(fold.train, max(1, int(len(fold.train) * fraction)), replace=False))
+
+    y = np.asarray(fold.y)
+    fit_params = {}
+    if family == "xgb":
+        fit_params = {"eval_set": [(fold.X.iloc[fold.eval], y[fold.eval])], "verbose": False}
+    if fold.sample_weight is not None:
+        fit_params["sample_weight"] = fold.sample_weight[rows]
+    estimator.fit(fold.X.iloc[rows], y[rows], **fit_params)
+
+    X_test = fold.X.iloc[fold.test]
+    started = time.perf_counter()
+    predicted = estimator.predict(X_test)
+    latency = (time.perf_counter() - started) * 1000 / max(1, len(X_test)) * 1000
+
+    score = SCORERS[fold.scoring](y[fold.test], predicted)
+    error = score if fold.scoring == "mae" else 1.0 - score
+    trees = estimator.best_iteration + 1 if family == "xgb" else len(estimator.estimators_)
+    return error, latency, len(pickle.dumps(estimator)), trees
+
+
+def sample_candidates(family, n, rng):
+    space = SEARCH_SPACE[family]
+    baseline = {name: getattr(config, name) for name in space}
+    candidates = [baseline]
+    seen = {tuple(baseline.items())}
+    # Sample without repeats, up to the size of the grid
+    grid_size = math.prod(len(values) for values in space.values())
+    while len(candidates) < min(n, grid_size + 1):
+        candidate = {name: values[rng.integers(len(values))] for name, values in space.items()}
+        if tuple(candidate.items()) not in seen:
+            seen.add(tuple(candidate.items()))
+            candidates.append(candidate)
+    return candidates
+
+
+def successive_halving(pool, family, folds, candidates, latency_weight, size_weight):
+    rounds = max(1, math.ceil(math.log(len(candidates), ETA)))
+    survivors = list(range(len(candidates)))
+    for r in range(rounds):
+        fraction = ETA ** (r - rounds + 1)
+        futures = {(i, k): pool.submit(evaluate, family, candidates[i], fold, fraction, 1)
+                   for i in survivors for k, fold in enumerate(folds)}
+        # error, latency, size, trees averaged over folds
+        results = {i: np.mean([futures[(i, k)].result() for k in range(len(folds))], axis=0)
+                   for i in survivors}
+
+        base_error, base_latency, base_size, _ = results[0]
+        objective = {
+            i: error / base_error + latency_weight * latency / base_latency + size_weight * size / base_size
+            for i, (error, latency, size, _) in results.items()
+        }
+        ranked = sorted(survivors, key=objective.get)
+        print(f"  └─ {family} round {r + 1}/{rounds}: {len(survivors)} candidates on "
+              f"{fraction:.0%} of the rows, best objective {objective[ranked[0]]:.3f} "
+              f"(current config {objective[0]:.3f})")
+        # The current config always stays in as the reference
+        keep = max(1, len(survivors) // ETA)
+        survivors = ranked[:keep] + ([0] if 0 not in ranked[:keep] else [])
+
+    best = ranked[0]
+    error, latency, size, trees = results[best]
+    settings = dict(candidates[best])
+    if family == "xgb":
+        settings["XGB_N_ESTIMATORS"] = int(math.ceil(trees))
+    return settings, {
+        "error": float(error), "latency_ms_per_1k": float(latency), "size_mb": float(size) / 1e6,
+        "baseline_error": float(results[0][0]), "baseline_latency_ms_per_1k": float(results[0][1]),
+        "baseline_size_mb": float(results[0][2]) / 1e6, "objective": float(objective[best]),
+    }
+
+
+def load_frames(args):
+    timer = StageTimer()
+    if args.parquet or args.rows:
+        import backtest
+        with tempfile.TemporaryDirectory() as tmp:
+            path = args.parquet
+            if path is None:
+                path = os.path.join(tmp, "synthetic.parquet")
+                backtest.write_synthetic(args.rows, path)
+            rows = backtest.read_rows(path, datetime.fromisoformat(config.TRAIN_START_DATE).date(),
+                                      datetime.fromisoformat(config.TRAIN_END_DATE).date())
+        df, _ = train.engineer_features(rows)
+        reasons = None
+    else:
+        df, _, reasons, _ = train.load_training_data(train.get_bq_client(), timer)
+    df, _ = train.encode_categoricals(df)
+    return df, reasons
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Successive-halving search over the model settings.")
+    parser.add_argument("--parquet", help="unit-row fixture instead of BigQuery")
+    parser.add_argument("--rows", type=int, help="synthetic unit rows instead of BigQuery")
+    parser.add_argument("--candidates", type=int, default=27, help="settings sampled per model")
+    parser.add_argument("--folds", type=int, default=3, help="time-ordered CV folds")
+    parser.add_argument("--latency-weight", type=float, default=0.1)
+    parser.add_argument("--size-weight", type=float, default=0.05)
+    parser.add_argument("--models", default="rf,xgb,clf")
+    parser.add_argument("--out", default=config.TUNED_PROFILE)
+    args = parser.parse_args()
+
+    # Tuning always scores on time-ordered folds
+    config.CV_MODE, config.CV_FOLDS = "fast", args.folds
+    df, reasons = load_frames(args)
+
+    _, yield_folds, _, _ = train.train_yield_models(df)
+    _, clf_folds, _, _ = train.train_rejection_classifier(df, reasons)
+    folds = {
+        "rf":  [job for job in yield_folds if job.name.startswith("rf/")],
+        "xgb": [job for job in yield_folds if job.name.startswith("xgb/")],
+        "clf": clf_folds,
+    }
+
+    rng = np.random.default_rng(config.RF_RANDOM_STATE)
+    workers = os.cpu_count() or 1
+    settings, scores = {}, {}
+    # One single-threaded fit per core
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        for family in args.models.split(","):
+            if not folds[family]:
+                print(f"\n[TUNE] {family}: no training data, skipped.")
+                continue
+            candidates = sample_candidates(family, args.candidates, rng)
+            print(f"\n[TUNE] {family}: {len(candidates)} candidates × {len(folds[family])} folds on {workers} worker(s)")
+            best, score = successive_halving(pool, family, folds[family], candidates,
+                                             args.latency_weight, args.size_weight)
+            settings.update(best)
+            scores[family] = score
+            print(f"  └─ Picked {best}: error {score['error']:.4f} (current {score['baseline_error']:.4f}), "
+                  f"{score['latency_ms_per_1k']:.2f}ms/1k rows (current {score['baseline_latency_ms_per_1k']:.2f}), "
+                  f"{score['size_mb']:.1f}MB (current {score['baseline_size_mb']:.1f})")
+
+    profile = {
+        "settings": settings,
+        "scores": scores,
+        "objective": {"latency_weight": args.latency_weight, "size_weight": args.size_weight},
+        "tuned_at": datetime.now().isoformat(timespec="seconds"),
+        "training_window": [config.TRAIN_START_DATE, config.TRAIN_END_DATE],
+    }
+    with open(args.out, "w") as f:
+        json.dump(profile, f, indent=1)
+    print(f"\n[TUNE] Wrote tuned profile to {args.out}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,86 @@
+CREATE OR REPLACE TABLE `production-dashboard-482014.dashboard_data.mo_summary`
+CLUSTER BY mo_number
+AS
+WITH mo_units AS (
+    -- Each ring counts once under its CTPF MO and once under its AIR MO
+    SELECT
+        mo.mo_number,
+        mo.mo_type,
+        vqc_inward_date,
+        ft_inward_date,
+        cs_comp_date,
+        vqc_status,
+        vqc_reason,
+        ft_status,
+        ft_reason,
+        cs_status,
+        cs_reason,
+        vendor,
+        sku,
+        size,
+        -- Same WIP rules as wip_sku_wise
+        (
+            (UPPER(vqc_status) NOT IN ('SCRAP', 'WABI SABI', 'RT CONVERSION') OR vqc_status IS NULL) AND
+            (UPPER(ft_status) NOT IN ('REJECTED', 'AESTHETIC SCRAP', 'FUNCTIONAL BUT REJECTED', 'SCRAP', 'SHELL RELATED', 'WABI SABI', 'FUNCTIONAL REJECTION') OR ft_status IS NULL) AND
+            (UPPER(cs_status) != 'REJECTED' OR cs_status IS NULL) AND
+            (cs_status != 'ACCEPTED' OR cs_status IS NULL)
+        ) AS is_wip
+    FROM `production-dashboard-482014.dashboard_data.master_station_data`,
+    UNNEST([
+        STRUCT(TRIM(ctpf_mo) AS mo_number, 'CTPF' AS mo_type),
+        STRUCT(TRIM(air_mo) AS mo_number, 'AIR' AS mo_type)
+    ]) AS mo
+    WHERE mo.mo_number IS NOT NULL AND mo.mo_number != ''
+),
+reason_counts AS (
+    SELECT mo_number, mo_type, entry.stage, entry.reason, COUNT(*) AS count
+    FROM mo_units,
+    UNNEST([
+        STRUCT('VQC' AS stage, vqc_reason AS reason),
+        STRUCT('FT' AS stage, ft_reason AS reason),
+        STRUCT('CS' AS stage, cs_reason AS reason)
+    ]) AS entry
+    WHERE entry.reason IS NOT NULL
+    GROUP BY 1, 2, 3, 4
+),
+top_reasons AS (
+    SELECT
+        mo_number,
+        mo_type,
+        ARRAY_AGG(STRUCT(stage, reason, count) ORDER BY count DESC, reason LIMIT 10) AS top_reasons
+    FROM reason_counts
+    GROUP BY 1, 2
+)
+SELECT
+    u.mo_number,
+    u.mo_type,
+    COUNT(*) AS total_units,
+    STRING_AGG(DISTINCT u.vendor, ', ') AS vendors,
+    STRING_AGG(DISTINCT u.sku, ', ') AS skus,
+    STRING_AGG(DISTINCT u.size, ', ') AS sizes,
+
+    -- Date span
+    MIN(u.vqc_inward_date) AS first_inward_date,
+    MAX(COALESCE(u.cs_comp_date, u.ft_inward_date, u.vqc_inward_date)) AS last_activity_date,
+
+    -- VQC
+    COUNTIF(u.vqc_status = 'ACCEPTED') AS vqc_accepted,
+    COUNTIF(UPPER(u.vqc_status) IN ('SCRAP', 'WABI SABI', 'RT CONVERSION')) AS vqc_rejected,
+    COUNTIF(u.is_wip AND u.ft_inward_date IS NULL AND u.cs_comp_date IS NULL) AS vqc_wip,
+
+    -- FT
+    COUNTIF(UPPER(u.ft_status) = 'ACCEPTED') AS ft_accepted,
+    COUNTIF(UPPER(u.ft_status) IN ('REJECTED', 'AESTHETIC SCRAP', 'FUNCTIONAL BUT REJECTED', 'SCRAP', 'SHELL RELATED', 'WABI SABI', 'FUNCTIONAL REJECTION')) AS ft_rejected,
+    COUNTIF(u.is_wip AND u.ft_inward_date IS NOT NULL AND u.cs_comp_date IS NULL) AS ft_wip,
+
+    -- CS
+    COUNTIF(u.cs_status = 'ACCEPTED') AS cs_accepted,
+    COUNTIF(UPPER(u.cs_status) = 'REJECTED') AS cs_rejected,
+    COUNTIF(u.is_wip AND u.cs_comp_date IS NOT NULL) AS cs_wip,
+
+    COUNTIF(u.is_wip) AS work_in_progress,
+    SAFE_DIVIDE(COUNTIF(u.cs_status = 'ACCEPTED'), COUNT(*)) AS yield,
+    ANY_VALUE(r.top_reasons) AS top_reasons
+FROM mo_units u
+LEFT JOIN top_reasons r USING (mo_number, mo_type)
+GROUP BY 1, 2;
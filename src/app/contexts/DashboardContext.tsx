@@ -1,4 +1,4 @@
-import React, { createContext, useContext, useState, useEffect, ReactNode, useCallback } from 'react';
+import React, { createContext, useContext, useState, useEffect, ReactNode, useCallback, useRef } from 'react';
 import { useSearchParams } from 'react-router-dom';
 
 export interface DashboardFilters {
@@ -29,6 +29,7 @@ export interface AnalysisKPIs {
   ihc_rejection: number;
   de_tech_stage_rejection: number;
   ihc_stage_rejection: number;
+  vendor_stage_rejection: Record<string, number>;
   vqc_rejection: number;
   ft_rejection: number;
   cs_rejection: number;
@@ -108,13 +109,19 @@ export interface CategoryReportData {
 export interface ForecastData {
   kpis: {
     forecasted_yield: number;
+    forecasted_yield_lower: number;
+    forecasted_yield_upper: number;
     forecasted_good_units: number;
+    forecasted_good_units_lower: number;
+    forecasted_good_units_upper: number;
     forecasted_rejection_units: number;
     model_confidence: number;
   };
   yieldTrend: Array<{ 
     day: string; 
     predicted_yield: number;
+    yield_lower: number;
+    yield_upper: number;
     good_units: number;
     rejection_units: number;
     rf_yield: number;
@@ -127,7 +134,11 @@ export interface ForecastData {
     size: string;
     line: string;
     forecasted_yield_pct: number;
+    yield_lower_pct: number;
+    yield_upper_pct: number;
     forecasted_good_units: number;
+    good_units_lower: number;
+    good_units_upper: number;
     forecasted_rejection_units: number;
     model_confidence_pct: number;
     top_rejection_reason_1: string;
@@ -149,6 +160,7 @@ export interface AnalysisData {
   topCsRejections: AnalysisChartData[];
   deTechVendorRejections: AnalysisChartData[];
   ihcVendorRejections: AnalysisChartData[];
+  vendorRejections: Record<string, AnalysisChartData[]>;
 }
 
 export interface ReportFilters {
@@ -215,6 +227,8 @@ interface DashboardContextType {
   lines: string[];
   loading: boolean;
   error: string | null;
+  dataVersion: string | null;
+  staleSeconds: number | null;
 }
 
 const DashboardContext = createContext<DashboardContextType | undefined>(undefined);
@@ -322,6 +336,10 @@ export const DashboardProvider: React.FC<{ children: ReactNode }> = ({ children
   const [lines, setLines] = useState<string[]>([]);
   const [loading, setLoading] = useState<boolean>(true);
   const [error, setError] = useState<string | null>(null);
+  const [dataVersion, setDataVersion] = useState<string | null>(null);
+  const [staleSeconds, setStaleSeconds] = useState<number | null>(null);
+  const dataVersionRef = useRef<string | null>(null);
+  const appliedFiltersRef = useRef<DashboardFilters>(filters);
 
   const toggleDarkMode = () => {
     setDarkMode((prev) => !prev);
@@ -339,9 +357,12 @@ export const DashboardProvider: React.FC<{ children: ReactNode }> = ({ children
     return `${year}-${month}-${day}`;
   }
 
-  const fetchData = useCallback(async (currentFilters: DashboardFilters) => {
-    setLoading(true);
+  // `since` asks the backend for only what changed after that data version
+  const fetchData = useCallback(async (currentFilters: DashboardFilters, background = false, since: string | null = null) => {
+    // Background refreshes keep the current data on screen until sections arrive
+    if (!background) setLoading(true);
     setError(null);
+    appliedFiltersRef.current = currentFilters;
     
     const params = new URLSearchParams();
     if (currentFilters.dateRange.from) {
@@ -370,20 +391,81 @@ export const DashboardProvider: React.FC<{ children: ReactNode }> = ({ children
       // WABI SABI logic for date column is now handled backend side or default
       params.append('date_column', date_column);
     }
+    if (since) {
+      params.append('since', since);
+    }
     const queryString = params.toString();
 
     try {
-      const response = await fetch(`${BACKEND_URL}/home-summary?${queryString}`);
-      if (!response.ok) throw new Error(`HTTP error! status: ${response.status} for Home Summary`);
-
-      const data = await response.json();
+      // Sections arrive as NDJSON lines as soon as each query finishes
+      const response = await fetch(`${BACKEND_URL}/home-summary?${queryString}&stream=true`);
+      if (!response.ok || !response.body) throw new Error(`HTTP error! status: ${response.status} for Home Summary`);
+      // Set when the backend answered from its cache while it refreshes (or BigQuery is down)
+      const stale = response.headers.get('X-Data-Stale-Seconds');
+      setStaleSeconds(stale === null ? null : Number(stale));
+
+      const analysis: Record<string, unknown> = {};
+      let deltaDays: string[] | null = null;
+      const handleSection = (message: { key: string; data?: any; error?: string }) => {
+        if (message.error) throw new Error(`${message.key}: ${message.error}`);
+        if (message.key.startsWith('analysis.')) {
+          analysis[message.key.slice('analysis.'.length)] = message.data;
+          return;
+        }
+        switch (message.key) {
+          case 'kpis':
+            setKpis(message.data);
+            // The KPI cards can render while the slower sections load
+            setLoading(false);
+            break;
+          case 'comparison_kpis':
+            setComparisonKpis(message.data);
+            break;
+          case 'comparison_analysis_kpis':
+            setComparisonAnalysisKpis(message.data);
+            break;
+          case 'charts':
+            setVqcWipChart(message.data.vqc_wip_sku_wise);
+            setFtWipChart(message.data.ft_wip_sku_wise);
+            break;
+          case 'delta':
+            // null: the backend did not know our version and sends everything
+            deltaDays = message.data.delta ? message.data.delta.days : null;
+            break;
+          case 'done': {
+            if (deltaDays === null) {
+              setAnalysisData(analysis as unknown as AnalysisData);
+              break;
+            }
+            // rejectionTrend only holds the changed days; the rest are whole sections
+            const changedDays = deltaDays;
+            setAnalysisData(prev => {
+              if (!prev) return analysis as unknown as AnalysisData;
+              const merged = { ...prev, ...analysis } as AnalysisData;
+              if (analysis.rejectionTrend) {
+                merged.rejectionTrend = [
+                  ...prev.rejectionTrend.filter(point => !changedDays.includes(point.day)),
+                  ...(analysis.rejectionTrend as AnalysisTrendData[]),
+                ].sort((a, b) => a.day.localeCompare(b.day));
+              }
+              return merged;
+            });
+            break;
+          }
+        }
+      };
 
-      setKpis(data.kpis);
-      setComparisonKpis(data.comparison_kpis);
-      setComparisonAnalysisKpis(data.comparison_analysis_kpis);
-      setVqcWipChart(data.charts.vqc_wip_sku_wise);
-      setFtWipChart(data.charts.ft_wip_sku_wise);
-      setAnalysisData(data.analysis);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered = '';
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split('\n');
+        buffered = lines.pop() ?? '';
+        lines.filter(line => line.trim()).forEach(line => handleSection(JSON.parse(line)));
+      }
     } catch (err) {
       console.error("Failed to fetch dashboard data from URL:", BACKEND_URL, err);
       setError(`Failed to load data: ${err instanceof Error ? err.message : String(err)}`);
@@ -429,6 +511,24 @@ export const DashboardProvider: React.FC<{ children: ReactNode }> = ({ children
     fetchData(filters);
   };
 
+  // The backend pushes the etl_metadata version over SSE; a new one means an
+  // ETL run finished, so what changed since our version is fetched in the background
+  useEffect(() => {
+    const events = new EventSource(`${BACKEND_URL}/events`);
+    const handleVersion = (event: MessageEvent) => {
+      const { version } = JSON.parse(event.data);
+      if (!version) return;
+      if (dataVersionRef.current && version !== dataVersionRef.current) {
+        fetchData(appliedFiltersRef.current, true, dataVersionRef.current);
+      }
+      dataVersionRef.current = version;
+      setDataVersion(version);
+    };
+    events.addEventListener('data-version', handleVersion);
+    events.addEventListener('data-updated', handleVersion);
+    return () => events.close();
+  }, [fetchData]);
+
   useEffect(() => {
     const handleFullScreenChange = () => {
       if (!document.fullscreenElement && isFullScreen) {
@@ -497,6 +597,8 @@ export const DashboardProvider: React.FC<{ children: ReactNode }> = ({ children
         lines,
         loading,
         error,
+        dataVersion,
+        staleSeconds,
       }}
     >
       {children}
@@ -20,7 +20,8 @@ import { Skeleton } from '@/app/components/ui/skeleton';
 const Analysis: React.FC = () => {
   const { darkMode, analysisData, comparisonAnalysisKpis, loading, error, filters } = useDashboard();
 
-  if (loading) {
+  // Analysis sections stream in after the KPIs, so keep the skeleton until they land
+  if (loading || (!analysisData && !error)) {
     return (
       <div className="p-8">
         <div className="grid grid-cols-6 gap-4 mb-8">
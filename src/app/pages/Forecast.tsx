@@ -162,6 +162,8 @@ const Forecast: React.FC = () => {
                       <Line type="monotone" dataKey="predicted_yield" name="Ensemble Yield %" stroke="#10b981" strokeWidth={4} dot={{ r: 4, fill: '#10b981', strokeWidth: 2, stroke: '#fff' }} activeDot={{ r: 8 }} />
                       <Line type="monotone" dataKey="rf_yield" name="RF Model %" stroke="#3b82f6" strokeWidth={2} strokeDasharray="5 5" dot={false} />
                       <Line type="monotone" dataKey="xgb_yield" name="XGB Model %" stroke="#f59e0b" strokeWidth={2} strokeDasharray="5 5" dot={false} />
+                      <Line type="monotone" dataKey="yield_lower" name="Lower Bound %" stroke="#94a3b8" strokeWidth={1} strokeDasharray="2 4" dot={false} />
+                      <Line type="monotone" dataKey="yield_upper" name="Upper Bound %" stroke="#94a3b8" strokeWidth={1} strokeDasharray="2 4" dot={false} />
                     </LineChart>
                   </ResponsiveContainer>
                 ) : (
@@ -374,6 +376,7 @@ const Forecast: React.FC = () => {
                           <span className={row.forecasted_yield_pct > 90 ? 'text-emerald-500' : row.forecasted_yield_pct > 70 ? 'text-amber-500' : 'text-rose-500'}>
                             {row.forecasted_yield_pct}%
                           </span>
+                          <span className="text-xs opacity-60">{row.yield_lower_pct}–{row.yield_upper_pct}%</span>
                         </div>
                       </td>
                       <td className="p-3">{row.forecasted_good_units} / {row.forecasted_good_units + row.forecasted_rejection_units}</td>
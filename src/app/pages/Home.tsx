@@ -21,7 +21,7 @@ export const Home: React.FC = () => {
   const [modalTitle, setModalTitle] = useState('');
   const [selectedKpi, setSelectedKpi] = useState('');
   const [lastUpdatedAt, setLastUpdatedAt] = useState<string | null>(null);
-  const { kpis, comparisonKpis, loading, error, darkMode, filters } = useDashboard();
+  const { kpis, comparisonKpis, loading, error, darkMode, filters, dataVersion, staleSeconds } = useDashboard();
 
   useEffect(() => {
     const fetchLastUpdated = async () => {
@@ -48,7 +48,7 @@ export const Home: React.FC = () => {
     };
 
     fetchLastUpdated();
-  }, []);
+  }, [dataVersion]);
 
   const handleKPIClick = (title: string, kpiKey: string) => {
     setModalTitle(title);
@@ -160,6 +160,11 @@ export const Home: React.FC = () => {
                 Last data sync: {lastUpdatedAt}
             </p>
         )}
+        {staleSeconds !== null && (
+            <p className="text-sm mt-1 text-amber-500">
+                Showing data cached {Math.max(1, Math.round(staleSeconds / 60))} min ago while it refreshes
+            </p>
+        )}
       </motion.div>
 
       <DashboardFilters />